@@ -1,27 +1,142 @@
 """Temporal Activities - Search execution via MCP."""
 
 import json
-from typing import Any, Dict, List
+import time
+from functools import lru_cache
+from typing import Any, Dict, List, Optional
 
 from temporalio import activity
 
+from activities.mcp_pool import get_mcp_pool
+from config import ContextConfig
+
+
+@lru_cache(maxsize=1)
+def get_context_config() -> ContextConfig:
+    context_config = ContextConfig.from_env()
+    context_config.validate()
+    return context_config
+
+
+def pack_results(
+    documents: List[Dict[str, Any]], token_budget: Optional[int] = None
+) -> List[Dict[str, Any]]:
+    """Deduplicates search results and trims them to the context token budget."""
+    # Imported here: this module is also loaded by the workflow sandbox, which can't load numpy
+    from search.context import pack_context
+
+    context = get_context_config()
+    return pack_context(
+        documents,
+        token_budget or context.token_budget,
+        context.dedup_threshold,
+        context.encoding,
+    )
+
+
+async def call_mcp_tool(name: str, arguments: Dict[str, Any]) -> Any:
+    """Calls a tool on a pooled MCP session and decodes its JSON result.
+
+    Records the round trip (mcp_round_trip_seconds) and failures
+    (mcp_tool_errors) on the activity's metric meter, labelled by tool.
+    """
+    meter = activity.metric_meter().with_additional_attributes({"tool": name})
+    start = time.perf_counter()
+    try:
+        async with get_mcp_pool().session() as client:
+            resp = await client.call_tool(name, arguments)
+            return json.loads(resp.content[0].text)
+    except Exception:
+        meter.create_counter("mcp_tool_errors", "Failed MCP tool calls").add(1)
+        raise
+    finally:
+        meter.create_histogram_float(
+            "mcp_round_trip_seconds", "MCP tool call round trip, including pool checkout", "s"
+        ).record(time.perf_counter() - start)
+
+
 @activity.defn
-async def mcp_search_activity(query: str, top_k: int = 3) -> List[Dict[str, Any]]:
-    """Activity that connects to MCP Server and executes semantic search.
+async def mcp_search_activity(
+    query: str,
+    top_k: int = 3,
+    mode: str = "vector",
+    filters: Optional[Dict[str, Any]] = None,
+) -> List[Dict[str, Any]]:
+    """Activity that executes semantic search on a pooled MCP session.
     
     Args:
         query: Search text
         top_k: Number of results to return
+        mode: "vector" (semantic, default), "lexical" (exact keywords such as
+            library names or error codes) or "hybrid" (both)
+        filters: Only search documents whose metadata matches, e.g.
+            {"language": "python", "version": ["3.11", "3.12"]}
         
     Returns:
-        List of found documents with id, score and chunk
+        List of found documents with id, score, chunk and citation number
+        (ref), near-duplicates removed and trimmed to CONTEXT_TOKEN_BUDGET
     """
-    from fastmcp import Client
+    arguments: Dict[str, Any] = {"query": query, "top_k": top_k, "mode": mode}
+    if filters:
+        arguments["filters"] = filters
+    return pack_results(await call_mcp_tool("azure_ai_search", arguments))
 
-    MCP_CMD = "mcp_server.py"
-    
-    async with Client(MCP_CMD) as client:
-        resp = await client.call_tool(
-            "azure_ai_search", {"query": query, "top_k": top_k}
-        )
-        return json.loads(resp.content[0].text)
\ No newline at end of file
+
+@activity.defn
+async def mcp_batch_search_activity(
+    queries: List[str], top_k: int = 3, fuse: bool = True
+) -> Dict[str, Any]:
+    """Activity that searches several rephrasings of a question in one MCP call.
+
+    Args:
+        queries: Search texts
+        top_k: Number of results to return per query
+        fuse: Also return a single ranking fused with reciprocal rank fusion
+
+    Returns:
+        Dictionary with per-query "results" and, if fuse is set, a "fused"
+        ranking; only one of them carries chunks (the fused ranking if any),
+        packed like mcp_search_activity's
+    """
+    response = await call_mcp_tool(
+        "azure_ai_search_batch", {"queries": queries, "top_k": top_k, "fuse": fuse}
+    )
+    results = response["results"]
+    if "fused" in response:
+        response["fused"] = pack_results(response["fused"])
+        # The chunks are in the fused ranking; these only say which query found what
+        response["results"] = [
+            [{"id": doc["id"], "score": doc["score"]} for doc in ranking] for ranking in results
+        ]
+    elif results:
+        budget = max(1, get_context_config().token_budget // len(results))
+        response["results"] = [pack_results(ranking, budget) for ranking in results]
+    return response
+
+
+@activity.defn
+async def answer_cache_lookup_activity(query: str, top_k: int = 3) -> Dict[str, Any]:
+    """Activity that looks up a cached answer to a question.
+
+    Args:
+        query: User question
+        top_k: Number of retrieved documents the cached answer must match
+
+    Returns:
+        Dictionary with "hit" and, on a hit, the cached "answer"
+    """
+    return await call_mcp_tool("answer_cache_lookup", {"query": query, "top_k": top_k})
+
+
+@activity.defn
+async def answer_cache_store_activity(query: str, answer: str, top_k: int = 3) -> None:
+    """Activity that stores the agent's answer in the answer cache.
+
+    Args:
+        query: User question
+        answer: Answer given by the agent
+        top_k: Number of retrieved documents the answer is tied to
+    """
+    await call_mcp_tool(
+        "answer_cache_store", {"query": query, "answer": answer, "top_k": top_k}
+    )
@@ -0,0 +1,129 @@
+"""Worker-scoped pool of warm MCP client sessions."""
+
+import asyncio
+import time
+from contextlib import asynccontextmanager
+from typing import Any, AsyncIterator, Optional
+
+from config import MCPConfig
+
+
+class _PooledClient:
+    """An open MCP client plus the time it was last known to be healthy."""
+
+    def __init__(self, client: Any):
+        self.client = client
+        self.last_ok = time.monotonic()
+
+
+class MCPClientPool:
+    """Keeps up to `size` MCP sessions open and lends them to activities.
+
+    Sessions are opened lazily (or eagerly via warm_up), health-checked with a
+    ping when they have been idle for longer than `health_check_interval`, and
+    discarded and replaced when a call fails at the transport level.
+    """
+
+    def __init__(self, server: str, size: int = 4, health_check_interval: float = 30.0):
+        self.server = server
+        self.size = size
+        self.health_check_interval = health_check_interval
+        self._idle: "asyncio.LifoQueue[_PooledClient]" = asyncio.LifoQueue()
+        self._slots = asyncio.Semaphore(size)
+        self._open_clients: set[_PooledClient] = set()
+        self._closed = False
+
+    @classmethod
+    def from_config(cls, mcp_config: MCPConfig) -> "MCPClientPool":
+        """Creates a pool from the MCP configuration."""
+        return cls(
+            server=mcp_config.server,
+            size=mcp_config.pool_size,
+            health_check_interval=mcp_config.health_check_interval,
+        )
+
+    async def _open(self) -> _PooledClient:
+        from fastmcp import Client
+
+        # A script path is spawned over stdio; a URL talks to a running HTTP/SSE server
+        client = Client(self.server)
+        await client.__aenter__()
+        pooled = _PooledClient(client)
+        self._open_clients.add(pooled)
+        return pooled
+
+    async def _discard(self, pooled: _PooledClient) -> None:
+        self._open_clients.discard(pooled)
+        try:
+            await pooled.client.close()
+        except Exception:
+            # The session is already broken; there is nothing left to release
+            pass
+
+    async def _is_healthy(self, pooled: _PooledClient) -> bool:
+        if time.monotonic() - pooled.last_ok < self.health_check_interval:
+            return True
+        try:
+            return pooled.client.is_connected() and await pooled.client.ping()
+        except Exception:
+            return False
+
+    async def _acquire(self) -> _PooledClient:
+        while not self._idle.empty():
+            pooled = self._idle.get_nowait()
+            if await self._is_healthy(pooled):
+                return pooled
+            await self._discard(pooled)
+        return await self._open()
+
+    async def warm_up(self) -> None:
+        """Opens every session up front so the first searches don't pay the cold start."""
+        missing = self.size - len(self._open_clients)
+        opened = await asyncio.gather(*(self._open() for _ in range(missing)))
+        for pooled in opened:
+            self._idle.put_nowait(pooled)
+
+    @asynccontextmanager
+    async def session(self) -> AsyncIterator[Any]:
+        """Borrows a connected fastmcp Client for the duration of the block."""
+        from fastmcp.exceptions import ToolError
+
+        if self._closed:
+            raise RuntimeError("MCP client pool is closed")
+
+        async with self._slots:
+            pooled = await self._acquire()
+            try:
+                yield pooled.client
+            except ToolError:
+                # The tool failed but the session itself is fine
+                pooled.last_ok = time.monotonic()
+                self._idle.put_nowait(pooled)
+                raise
+            except BaseException:
+                await self._discard(pooled)
+                raise
+            else:
+                pooled.last_ok = time.monotonic()
+                self._idle.put_nowait(pooled)
+
+    async def close(self) -> None:
+        """Closes every session; called when the worker shuts down."""
+        self._closed = True
+        while not self._idle.empty():
+            self._idle.get_nowait()
+        for pooled in list(self._open_clients):
+            await self._discard(pooled)
+
+
+_pool: Optional[MCPClientPool] = None
+
+
+def get_mcp_pool() -> MCPClientPool:
+    """Returns the process-wide pool, creating it from the environment on first use."""
+    global _pool
+    if _pool is None:
+        mcp_config = MCPConfig.from_env()
+        mcp_config.validate()
+        _pool = MCPClientPool.from_config(mcp_config)
+    return _pool
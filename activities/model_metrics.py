@@ -0,0 +1,68 @@
+"""Latency metrics of the LLM calls made by the agents plugin's model activity."""
+
+import time
+from typing import Any, AsyncIterator
+
+from agents.models.interface import Model, ModelProvider
+from temporalio import activity
+
+
+def _meter():
+    return activity.metric_meter() if activity.in_activity() else None
+
+
+class InstrumentedModel(Model):
+    """Model wrapper recording llm_response_seconds and llm_time_to_first_token_seconds."""
+
+    def __init__(self, model: Model, model_name: str):
+        self.model = model
+        self.model_name = model_name
+
+    def _record(self, name: str, description: str, seconds: float) -> None:
+        meter = _meter()
+        if meter is not None:
+            meter.with_additional_attributes({"model": self.model_name}).create_histogram_float(
+                name, description, "s"
+            ).record(seconds)
+
+    async def get_response(self, *args: Any, **kwargs: Any):
+        start = time.perf_counter()
+        try:
+            return await self.model.get_response(*args, **kwargs)
+        finally:
+            self._record("llm_response_seconds", "Total LLM call time", time.perf_counter() - start)
+
+    async def stream_response(self, *args: Any, **kwargs: Any) -> AsyncIterator[Any]:
+        start = time.perf_counter()
+        first = True
+        try:
+            async for event in self.model.stream_response(*args, **kwargs):
+                if first:
+                    first = False
+                    self._record(
+                        "llm_time_to_first_token_seconds",
+                        "Time until the first streamed LLM event",
+                        time.perf_counter() - start,
+                    )
+                yield event
+        finally:
+            self._record("llm_response_seconds", "Total LLM call time", time.perf_counter() - start)
+
+    def get_retry_advice(self, request: Any) -> Any:
+        return self.model.get_retry_advice(request)
+
+    async def close(self) -> None:
+        await self.model.close()
+
+
+class InstrumentedModelProvider(ModelProvider):
+    """Provider handing out InstrumentedModel wrappers of another provider's models."""
+
+    def __init__(self, provider: ModelProvider):
+        self.provider = provider
+
+    def get_model(self, model_name: str | None) -> Model:
+        return InstrumentedModel(self.provider.get_model(model_name), model_name or "default")
+
+    async def aclose(self) -> None:
+        await self.provider.aclose()
@@ -1,37 +1,67 @@
-from datetime import timedelta
+import asyncio
+import base64
+import binascii
+import json
 import os
+import re
 import sys
+import time
 import uuid
+from contextlib import asynccontextmanager
+from datetime import datetime, timedelta, timezone
 from pathlib import Path
 from typing import Optional
 
-from contextlib import asynccontextmanager
-from fastapi import FastAPI, HTTPException, Query
+from fastapi import FastAPI, HTTPException, Query, Request
+from fastapi.responses import Response, StreamingResponse
+from prometheus_client import CONTENT_TYPE_LATEST, Histogram, generate_latest
 from pydantic import BaseModel
-
-from temporalio.client import Client
-from temporalio.exceptions import WorkflowAlreadyStartedError
+from temporalio.client import Client, WithStartWorkflowOperation, WorkflowUpdateFailedError
+from temporalio.common import WorkflowIDConflictPolicy
+from temporalio.contrib.workflow_streams import WorkflowStreamClient
+from temporalio.exceptions import ApplicationError, WorkflowAlreadyStartedError
 from temporalio.service import RPCError, RPCStatusCode
 
 # Add the project root to sys.path so that the "workflows" package is recognized
 PROJECT_ROOT = Path(__file__).resolve().parent.parent
 sys.path.append(str(PROJECT_ROOT))
 
-# Import workflow definitions/types
-from workflows.workflow import QnAInput, QnAWorkflow
+# Project modules (workflow definitions/types, configuration), found via the root above
+from config import TemporalConfig  # noqa: E402
+from metrics import LATENCY_BUCKETS  # noqa: E402
+from workflows.workflow import (  # noqa: E402
+    ANSWERS_TOPIC,
+    ASK_REJECTED_CHAT_ENDED,
+    ASK_REJECTED_CONTINUING_AS_NEW,
+    MAX_STATUS_WAIT_SECONDS,
+    MODEL_EVENTS_TOPIC,
+    RAG_MODES,
+    QnAInput,
+    QnASessionState,
+    QnAWorkflow,
+)
 
 TEMPORAL_ADDRESS = os.getenv("TEMPORAL_ADDRESS", "localhost:7233")
-TASK_QUEUE = os.getenv("TASK_QUEUE", "agent-mcp-queue")
+TEMPORAL_CONFIG = TemporalConfig.from_env()
+# Attempts of POST /ask while the session hands over to a new run (continue-as-new)
+ASK_ATTEMPTS = 3
+ASK_RETRY_DELAY_SECONDS = 0.2
+# Visibility page size of GET /workflows (one ListWorkflowExecutions call per request)
+DEFAULT_PAGE_SIZE = 100
+MAX_PAGE_SIZE = 1000
+_SEARCH_ATTRIBUTE_NAME = re.compile(r"^[A-Za-z_][A-Za-z0-9_]*$")
 
 @asynccontextmanager
 async def lifespan(app: FastAPI):
-    from temporalio.contrib.openai_agents import OpenAIAgentsPlugin, ModelActivityParameters
+    from temporalio.contrib.openai_agents import ModelActivityParameters, OpenAIAgentsPlugin
     app.state.temporal_client = await Client.connect(
         TEMPORAL_ADDRESS,
         plugins=[
             OpenAIAgentsPlugin(
                 model_params=ModelActivityParameters(
-                    start_to_close_timeout=timedelta(seconds=30)
+                    task_queue=TEMPORAL_CONFIG.model_queue,
+                    start_to_close_timeout=timedelta(seconds=TEMPORAL_CONFIG.model_timeout),
+                    streaming_topic=MODEL_EVENTS_TOPIC,
                 )
             ),
         ],
@@ -43,6 +73,25 @@ async def lifespan(app: FastAPI):
 
 app = FastAPI(title="Temporal QnA API", lifespan=lifespan)
 
+REQUEST_SECONDS = Histogram(
+    "api_request_seconds",
+    "Latency of API requests",
+    ["method", "route", "status"],
+    buckets=LATENCY_BUCKETS,
+)
+
+
+@app.middleware("http")
+async def record_request_latency(request: Request, call_next):
+    start = time.perf_counter()
+    response = await call_next(request)
+    # Route template rather than the raw path, so workflow ids don't become labels
+    route = getattr(request.scope.get("route"), "path", "unmatched")
+    REQUEST_SECONDS.labels(
+        method=request.method, route=route, status=response.status_code
+    ).observe(time.perf_counter() - start)
+    return response
+
 
 class StartRequest(BaseModel):
     workflow_id: Optional[str] = None
@@ -50,29 +99,157 @@ class StartRequest(BaseModel):
 
 class PromptRequest(BaseModel):
     prompt: str
+    # "agent" or "fast" (see workflows.workflow.RAG_MODES); None: the session's mode
+    mode: Optional[str] = None
+
+
+class AskRequest(BaseModel):
+    prompt: str
+    workflow_id: Optional[str] = None
+    top_k: int = 3
+    mode: Optional[str] = None
+
+
+def validate_mode(mode: Optional[str]) -> None:
+    if mode is not None and mode not in RAG_MODES:
+        raise HTTPException(status_code=400, detail=f"mode must be one of {', '.join(RAG_MODES)}")
 
 @app.get("/health")
 async def health():
     return {"status": "ok"}
 
-@app.get("/workflows", summary="List running workflow IDs")
-async def list_running_workflows(workflow_type: Optional[str] = Query(default="QnAWorkflow")):
-    client: Client = app.state.temporal_client
-    query_parts = ["ExecutionStatus = 'Running'"]
+
+@app.get("/metrics", include_in_schema=False)
+async def metrics():
+    """Prometheus metrics of the API process."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
+def _query_literal(value: str) -> str:
+    """Quotes a value of a visibility query; quotes and backslashes are refused."""
+    if "'" in value or "\\" in value:
+        raise HTTPException(status_code=400, detail=f"Invalid filter value: {value!r}")
+    return f"'{value}'"
+
+
+def _rfc3339(moment: datetime) -> str:
+    if moment.tzinfo is None:
+        moment = moment.replace(tzinfo=timezone.utc)
+    return moment.astimezone(timezone.utc).isoformat().replace("+00:00", "Z")
+
+
+def build_visibility_query(
+    workflow_type: Optional[str] = None,
+    status: Optional[str] = None,
+    started_after: Optional[datetime] = None,
+    started_before: Optional[datetime] = None,
+    search_attributes: Optional[list[str]] = None,
+) -> str:
+    """Builds a Temporal visibility query from the GET /workflows filters.
+
+    Args:
+        workflow_type: Workflow type name
+        status: Execution status (e.g. "Running", "Completed")
+        started_after: Only workflows started at or after this time
+        started_before: Only workflows started before this time
+        search_attributes: "Name=value" equality filters on (custom) search attributes
+
+    Returns:
+        The query, conditions joined with "and" (empty if there are none)
+    """
+    query_parts = []
+    if status:
+        query_parts.append(f"ExecutionStatus = {_query_literal(status)}")
     if workflow_type:
-        query_parts.append(f"WorkflowType = '{workflow_type}'")
-    query = " and ".join(query_parts)
+        query_parts.append(f"WorkflowType = {_query_literal(workflow_type)}")
+    if started_after:
+        query_parts.append(f"StartTime >= '{_rfc3339(started_after)}'")
+    if started_before:
+        query_parts.append(f"StartTime < '{_rfc3339(started_before)}'")
+    for attribute in search_attributes or []:
+        name, sep, value = attribute.partition("=")
+        name = name.strip()
+        if not sep or not _SEARCH_ATTRIBUTE_NAME.match(name):
+            raise HTTPException(
+                status_code=400, detail=f"Search attribute filter must be Name=value: {attribute!r}"
+            )
+        query_parts.append(f"{name} = {_query_literal(value.strip())}")
+    return " and ".join(query_parts)
 
-    ids: list[str] = []
+
+def _decode_page_token(page_token: Optional[str]) -> Optional[bytes]:
+    if not page_token:
+        return None
     try:
-        async for wf in client.list_workflows(query):
-            wf_id = getattr(wf, "id", None) or getattr(getattr(wf, "execution", None), "id", None)
-            if wf_id:
-                ids.append(wf_id)
+        return base64.urlsafe_b64decode(page_token.encode())
+    except (binascii.Error, ValueError):
+        raise HTTPException(status_code=400, detail="Invalid page_token") from None
+
+
+@app.get("/workflows", summary="List workflows, one page at a time")
+async def list_workflows(
+    workflow_type: Optional[str] = Query(default="QnAWorkflow"),
+    status: Optional[str] = Query(default="Running"),
+    started_after: Optional[datetime] = Query(default=None),
+    started_before: Optional[datetime] = Query(default=None),
+    search_attribute: list[str] = Query(default=[]),
+    page_size: int = Query(default=DEFAULT_PAGE_SIZE, ge=1, le=MAX_PAGE_SIZE),
+    page_token: Optional[str] = Query(default=None),
+    count_only: bool = Query(default=False),
+):
+    """Lists the workflows matching the filters (running QnA sessions by default).
+
+    Returns one page of at most page_size workflows and, if there are more,
+    the next_page_token to pass back as page_token. With count_only, returns
+    only the number of matching workflows. An empty status or workflow_type
+    lifts that filter; search_attribute (repeatable) filters on "Name=value".
+    """
+    client: Client = app.state.temporal_client
+    query = build_visibility_query(
+        workflow_type, status, started_after, started_before, search_attribute
+    )
+
+    try:
+        if count_only:
+            count = await client.count_workflows(query or None)
+            return {"query": query, "count": count.count}
+
+        # A single ListWorkflowExecutions call, never a scan of every page
+        workflows = client.list_workflows(
+            query or None,
+            page_size=page_size,
+            next_page_token=_decode_page_token(page_token),
+        )
+        await workflows.fetch_next_page()
     except RPCError as e:
+        if e.status == RPCStatusCode.INVALID_ARGUMENT:
+            raise HTTPException(status_code=400, detail=f"Invalid visibility query: {e}") from e
         raise HTTPException(status_code=500, detail=f"Temporal visibility query failed: {e}")
 
-    return {"query": query, "workflow_ids": ids}
+    page = workflows.current_page or []
+    next_token = workflows.next_page_token
+    return {
+        "query": query,
+        "workflow_ids": [wf.id for wf in page],
+        "workflows": [
+            {
+                "workflow_id": wf.id,
+                "run_id": wf.run_id,
+                "status": wf.status.name if wf.status else None,
+                "start_time": wf.start_time.isoformat() if wf.start_time else None,
+            }
+            for wf in page
+        ],
+        "next_page_token": base64.urlsafe_b64encode(next_token).decode() if next_token else None,
+    }
+
+def initial_session_state() -> QnASessionState:
+    # Search activities may run on their own workers (see worker.py)
+    return QnASessionState(
+        search_task_queue=TEMPORAL_CONFIG.search_task_queue or None,
+        rag_mode=TEMPORAL_CONFIG.rag_mode,
+        answer_cache=TEMPORAL_CONFIG.answer_cache,
+    )
+
 
 @app.post("/workflows/start")
 async def start_workflow(req: StartRequest):
@@ -82,8 +259,9 @@ async def start_workflow(req: StartRequest):
     try:
         handle = await client.start_workflow(
             QnAWorkflow.run,
+            initial_session_state(),
             id=workflow_id,
-            task_queue=TASK_QUEUE,
+            task_queue=TEMPORAL_CONFIG.task_queue,
         )
     except WorkflowAlreadyStartedError:
         handle = client.get_workflow_handle(workflow_id)
@@ -93,10 +271,11 @@ async def start_workflow(req: StartRequest):
 
 @app.post("/workflows/{workflow_id}/prompt")
 async def send_prompt(workflow_id: str, req: PromptRequest):
+    validate_mode(req.mode)
     client: Client = app.state.temporal_client
     handle = client.get_workflow_handle(workflow_id)
     try:
-        await handle.signal("new_task", QnAInput(query=req.prompt, top_k=3))
+        await handle.signal("new_task", QnAInput(query=req.prompt, top_k=3, mode=req.mode))
     except RPCError as e:
         if e.status == RPCStatusCode.NOT_FOUND:
             raise HTTPException(status_code=404, detail=str(e))
@@ -104,10 +283,67 @@ async def send_prompt(workflow_id: str, req: PromptRequest):
     return {"status": "prompt_sent", "workflow_id": workflow_id}
 
 
+@app.post("/ask", summary="Start or reuse a session, send a prompt and wait for its answer")
+async def ask(req: AskRequest):
+    """Answers a prompt in one call.
+
+    Starts the session workflow if it isn't running (update-with-start) and
+    sends the prompt as the ask update, whose result is the answer: no
+    separate start, signal and status polling round trips.
+    """
+    validate_mode(req.mode)
+    client: Client = app.state.temporal_client
+    workflow_id = req.workflow_id or f"qna-workflow-{uuid.uuid4()}"
+
+    for attempt in range(ASK_ATTEMPTS):
+        start_operation = WithStartWorkflowOperation(
+            QnAWorkflow.run,
+            initial_session_state(),
+            id=workflow_id,
+            task_queue=TEMPORAL_CONFIG.task_queue,
+            id_conflict_policy=WorkflowIDConflictPolicy.USE_EXISTING,
+        )
+        try:
+            result = await client.execute_update_with_start_workflow(
+                QnAWorkflow.ask,
+                QnAInput(query=req.prompt, top_k=req.top_k, mode=req.mode),
+                start_workflow_operation=start_operation,
+            )
+            return {"workflow_id": workflow_id, **result}
+        except WorkflowUpdateFailedError as e:
+            rejection = e.cause.type if isinstance(e.cause, ApplicationError) else None
+            if rejection == ASK_REJECTED_CONTINUING_AS_NEW and attempt + 1 < ASK_ATTEMPTS:
+                # A later attempt reaches the new run
+                await asyncio.sleep(ASK_RETRY_DELAY_SECONDS * (attempt + 1))
+                continue
+            if rejection == ASK_REJECTED_CHAT_ENDED:
+                raise HTTPException(status_code=409, detail=str(e.cause)) from e
+            raise HTTPException(status_code=503, detail=str(e.cause or e)) from e
+
+
 @app.get("/workflows/{workflow_id}/status")
-async def get_status(workflow_id: str):
+async def get_status(
+    workflow_id: str,
+    version: Optional[int] = Query(default=None),
+    timeout: float = Query(default=30.0, gt=0, le=MAX_STATUS_WAIT_SECONDS),
+):
+    """Returns the latest process info of a workflow.
+
+    With version (the "version" of a previous response), holds the request
+    for up to timeout seconds and answers as soon as the state changes,
+    instead of having the client poll.
+    """
     client: Client = app.state.temporal_client
     handle = client.get_workflow_handle(workflow_id)
+    if version is not None:
+        try:
+            latest = await handle.execute_update(
+                QnAWorkflow.wait_for_status, args=[version, timeout]
+            )
+            return {"workflow_id": workflow_id, "latest": latest}
+        except (RPCError, WorkflowUpdateFailedError):
+            # Closed workflows don't take updates; their state can still be queried
+            pass
     try:
         latest = await handle.query("get_latest_process_info")
     except RPCError as e:
@@ -119,6 +355,58 @@ async def get_status(workflow_id: str):
     return {"workflow_id": workflow_id, "latest": latest}
 
 
+def sse_event(event: str, offset: int, data: dict) -> str:
+    return f"event: {event}\nid: {offset}\ndata: {json.dumps(data)}\n\n"
+
+
+@app.get("/workflows/{workflow_id}/stream", summary="Stream answer tokens (Server-Sent Events)")
+async def stream_answers(
+    workflow_id: str, request: Request, from_offset: Optional[int] = Query(default=None)
+):
+    """Streams the answers of a workflow as they are generated.
+
+    Emits a "token" event per text delta of the model and an "answer" event
+    with the full text when a turn ends. Starts at the current end of the
+    stream unless from_offset (or the Last-Event-ID header of a reconnecting
+    EventSource) says otherwise.
+    """
+    client: Client = app.state.temporal_client
+    stream = WorkflowStreamClient.create(client, workflow_id)
+
+    last_event_id = request.headers.get("last-event-id")
+    if from_offset is None and last_event_id is not None:
+        try:
+            from_offset = int(last_event_id) + 1
+        except ValueError:
+            raise HTTPException(
+                status_code=400, detail=f"Invalid Last-Event-ID: {last_event_id!r}"
+            ) from None
+    if from_offset is None:
+        try:
+            from_offset = await stream.get_offset()
+        except RPCError as e:
+            if e.status == RPCStatusCode.NOT_FOUND:
+                raise HTTPException(status_code=404, detail=str(e)) from e
+            raise
+
+    async def events():
+        async for item in stream.subscribe(
+            [MODEL_EVENTS_TOPIC, ANSWERS_TOPIC], from_offset=from_offset
+        ):
+            if await request.is_disconnected():
+                break
+            if item.topic == ANSWERS_TOPIC:
+                yield sse_event("answer", item.offset, item.data)
+            elif item.data.get("type") == "response.output_text.delta":
+                yield sse_event("token", item.offset, {"delta": item.data["delta"]})
+
+    return StreamingResponse(
+        events(),
+        media_type="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
 @app.post("/workflows/{workflow_id}/end")
 async def end_workflow(workflow_id: str):
     client: Client = app.state.temporal_client
@@ -0,0 +1,5 @@
+"""Offline benchmarks of the search engines and of a full workflow turn.
+
+Run with `python -m benchmarks --help`; results are printed (or written) as
+JSON so runs can be diffed across releases.
+"""
@@ -0,0 +1,82 @@
+"""Runs the benchmarks and reports JSON: python -m benchmarks [--output results.json]."""
+
+import argparse
+import asyncio
+import json
+import platform
+import sys
+import time
+
+from benchmarks.search import run_search_benchmark, synthetic_index
+from search.quantization import KINDS
+
+
+async def main(args: argparse.Namespace) -> dict:
+    report: dict = {
+        "started_at": time.strftime("%Y-%m-%dT%H:%M:%SZ", time.gmtime()),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+    }
+    with synthetic_index(args.docs, args.dim, args.queries) as index:
+        report["corpus"] = index.stats
+        report["search"] = await run_search_benchmark(
+            index,
+            concurrency=args.concurrency,
+            top_k=args.top_k,
+            batch_size=args.batch_size,
+            nprobes=tuple(args.nprobe),
+            quantize=tuple(args.quantize),
+            quantized_candidates=args.quantized_candidates,
+        )
+        if not args.skip_workflow:
+            from benchmarks.workflow import run_workflow_benchmark
+
+            report["workflow"] = await run_workflow_benchmark(
+                turns=args.turns,
+                sessions=args.sessions,
+                token_delay=args.token_delay,
+                temporal_address=args.temporal_address,
+            )
+    return report
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Offline search and workflow benchmarks")
+    parser.add_argument("--docs", type=int, default=100000, help="Documents in the corpus")
+    parser.add_argument("--dim", type=int, default=256, help="Embedding dimension")
+    parser.add_argument("--queries", type=int, default=500, help="Queries per engine")
+    parser.add_argument("--concurrency", type=int, default=8, help="Searches in flight")
+    parser.add_argument("--top-k", type=int, default=3)
+    parser.add_argument("--batch-size", type=int, default=8, help="Queries per batch search")
+    parser.add_argument(
+        "--nprobe", type=int, nargs="+", default=[4, 16], help="IVF nprobe values to run"
+    )
+    parser.add_argument(
+        "--quantize",
+        nargs="*",
+        choices=KINDS,
+        default=["int8"],
+        help="Quantized indexes to run (coarse pass + exact re-ranking)",
+    )
+    parser.add_argument(
+        "--quantized-candidates", type=int, default=100, help="Documents re-ranked exactly"
+    )
+    parser.add_argument("--skip-workflow", action="store_true", help="Only run search engines")
+    parser.add_argument("--turns", type=int, default=20, help="Workflow turns per session")
+    parser.add_argument("--sessions", type=int, default=1, help="Concurrent workflows")
+    parser.add_argument(
+        "--token-delay", type=float, default=0.0, help="Seconds between stub LLM tokens"
+    )
+    parser.add_argument(
+        "--temporal-address", help="Use this Temporal server instead of a local dev server"
+    )
+    parser.add_argument("--output", help="Write the JSON report here (default: stdout)")
+    args = parser.parse_args()
+
+    report = asyncio.run(main(args))
+    if args.output:
+        with open(args.output, "w", encoding="utf-8") as f:
+            json.dump(report, f, indent=2)
+    else:
+        json.dump(report, sys.stdout, indent=2)
+        print()
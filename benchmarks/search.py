@@ -0,0 +1,318 @@
+"""Search benchmark: synthetic corpus, fake embeddings endpoint, every search engine."""
+
+import asyncio
+import contextlib
+import hashlib
+import os
+import resource
+import tempfile
+import time
+import tracemalloc
+from dataclasses import dataclass
+from pathlib import Path
+from types import SimpleNamespace
+from typing import Awaitable, Callable, Iterator, Optional
+
+import numpy as np
+
+from search.bm25 import BM25Index
+from search.ivf import IVFIndex, recall_at_k
+from search.quantization import QuantizedIndex
+from search.quantization import recall_at_k as quantized_recall_at_k
+from search.vector_store import ResidentIndex, VectorStore, VectorStoreWriter
+
+# Traced (slow) pass used to measure peak memory of an engine
+MEMORY_SAMPLE_QUERIES = 20
+# Synthetic chunks: words drawn with a Zipf distribution over this vocabulary
+VOCABULARY_SIZE = 50000
+WORDS_PER_CHUNK = 60
+WORDS_PER_QUERY = 4
+
+
+class FakeEmbedder:
+    """Deterministic embeddings: known texts map to given vectors, others to a hash-seeded one."""
+
+    def __init__(self, dim: int, known: Optional[dict[str, np.ndarray]] = None):
+        self.dim = dim
+        self.known = known or {}
+
+    def embed(self, text: str) -> list[float]:
+        vector = self.known.get(text)
+        if vector is None:
+            seed = int.from_bytes(hashlib.sha256(text.encode("utf-8")).digest()[:8], "little")
+            vector = np.random.default_rng(seed).standard_normal(self.dim, dtype=np.float32)
+        return vector.tolist()
+
+
+class FakeEmbeddingsClient:
+    """Stands in for AsyncAzureOpenAI: answers embeddings.create from a FakeEmbedder."""
+
+    def __init__(self, embedder: FakeEmbedder):
+        self.embedder = embedder
+        self.embeddings = self
+        self.calls = 0
+
+    async def create(self, model: str, input):
+        self.calls += 1
+        texts = [input] if isinstance(input, str) else list(input)
+        return SimpleNamespace(
+            data=[
+                SimpleNamespace(index=i, embedding=self.embedder.embed(text))
+                for i, text in enumerate(texts)
+            ]
+        )
+
+
+def synthetic_corpus(
+    path: str, n_docs: int, dim: int, seed: int = 0, batch_size: int = 10000
+) -> VectorStore:
+    """Writes a clustered random corpus straight into the binary store at `path`.
+
+    Documents are drawn around sqrt(n_docs) centres so that approximate
+    search behaves as on real embeddings, and their chunks are Zipf-distributed
+    words so that BM25 sees realistic posting lengths; batches keep memory bounded.
+    """
+    rng = np.random.default_rng(seed)
+    centres = rng.standard_normal((max(1, int(np.sqrt(n_docs))), dim), dtype=np.float32)
+    with VectorStoreWriter(path) as writer:
+        for start in range(0, n_docs, batch_size):
+            count = min(batch_size, n_docs - start)
+            vectors = centres[rng.integers(0, len(centres), count)]
+            vectors = vectors + 0.5 * rng.standard_normal((count, dim), dtype=np.float32)
+            ids = [f"doc-{i}" for i in range(start, start + count)]
+            words = rng.zipf(1.3, (count, WORDS_PER_CHUNK)) % VOCABULARY_SIZE
+            chunks = [" ".join(f"w{word}" for word in row) for row in words]
+            writer.append(ids, chunks, vectors)
+    return VectorStore.load(path)
+
+
+def synthetic_queries(store: VectorStore, n_queries: int, seed: int = 1) -> dict[str, np.ndarray]:
+    """Query texts (a few words of a random document) mapped to a perturbed copy of it."""
+    rng = np.random.default_rng(seed)
+    picks = rng.integers(0, len(store), n_queries)
+    noise = 0.1 * rng.standard_normal((n_queries, store.dim), dtype=np.float32)
+    vectors = np.asarray(store.embeddings[picks]) + noise
+    queries = {}
+    for i, doc in enumerate(picks.tolist()):
+        words = rng.choice(store.chunks[doc].split(), WORDS_PER_QUERY, replace=False)
+        queries[f"q{i} " + " ".join(words)] = vectors[i]
+    return queries
+
+
+def latency_summary(samples: list[float], wall_seconds: float, items: int) -> dict:
+    """Percentiles (milliseconds) of per-call latencies and overall throughput."""
+    latencies = np.asarray(samples) * 1000
+    return {
+        "calls": len(samples),
+        "p50_ms": float(np.percentile(latencies, 50)),
+        "p95_ms": float(np.percentile(latencies, 95)),
+        "p99_ms": float(np.percentile(latencies, 99)),
+        "mean_ms": float(latencies.mean()),
+        "max_ms": float(latencies.max()),
+        "throughput_qps": items / wall_seconds if wall_seconds > 0 else 0.0,
+    }
+
+
+async def measure(
+    calls: list[Callable[[], Awaitable]], concurrency: int, items_per_call: int = 1
+) -> dict:
+    """Runs the calls with at most `concurrency` in flight and summarizes their latency."""
+    semaphore = asyncio.Semaphore(concurrency)
+    samples: list[float] = []
+
+    async def timed(call):
+        async with semaphore:
+            start = time.perf_counter()
+            await call()
+            samples.append(time.perf_counter() - start)
+
+    start = time.perf_counter()
+    await asyncio.gather(*(timed(call) for call in calls))
+    return latency_summary(samples, time.perf_counter() - start, len(calls) * items_per_call)
+
+
+async def peak_memory(calls: list[Callable[[], Awaitable]]) -> int:
+    """Peak bytes allocated (Python and numpy) while running a few of the calls."""
+    tracemalloc.start()
+    try:
+        for call in calls[:MEMORY_SAMPLE_QUERIES]:
+            await call()
+        return tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+
+
+@dataclass
+class SyntheticIndex:
+    """A synthetic corpus installed as the MCP server's resident index."""
+
+    store: VectorStore
+    ivf: IVFIndex
+    queries: dict[str, np.ndarray]
+    stats: dict
+
+
+@contextlib.contextmanager
+def synthetic_index(
+    n_docs: int = 100000, dim: int = 256, n_queries: int = 500
+) -> Iterator[SyntheticIndex]:
+    """Builds a corpus in a temporary directory and serves it from mcp_server.
+
+    The embeddings endpoint is replaced by a FakeEmbeddingsClient for the
+    duration, so searches cover everything but the network call to Azure.
+    """
+    # mcp_server builds its (unused) Azure clients at import
+    os.environ.setdefault("AZURE_API_BASE", "https://benchmark.invalid")
+    os.environ.setdefault("AZURE_API_KEY", "benchmark")
+    import mcp_server
+
+    with tempfile.TemporaryDirectory() as tmp:
+        source = str(Path(tmp) / "search_index.json")
+
+        tracemalloc.start()
+        start = time.perf_counter()
+        store = synthetic_corpus(source, n_docs, dim)
+        build_seconds = time.perf_counter() - start
+        build_peak = tracemalloc.get_traced_memory()[1]
+        tracemalloc.stop()
+
+        start = time.perf_counter()
+        ivf = IVFIndex.build(store.embeddings, store_fingerprint=store.fingerprint)
+        ivf.save(source)
+        ivf_build_seconds = time.perf_counter() - start
+
+        start = time.perf_counter()
+        bm25 = BM25Index.build(store.chunks, store_fingerprint=store.fingerprint)
+        bm25.save(source)
+        bm25_build_seconds = time.perf_counter() - start
+
+        queries = synthetic_queries(store, n_queries)
+        original_index = mcp_server.search_index
+        original_client = mcp_server.async_openai_client
+        mcp_server.search_index = ResidentIndex(source)
+        mcp_server.async_openai_client = FakeEmbeddingsClient(FakeEmbedder(dim, queries))
+        mcp_server.query_cache.clear()
+        try:
+            yield SyntheticIndex(
+                store=mcp_server.search_index.get(),
+                ivf=ivf,
+                queries=queries,
+                stats={
+                    "documents": n_docs,
+                    "dim": dim,
+                    "build_seconds": build_seconds,
+                    "build_peak_memory_bytes": build_peak,
+                    "ivf_lists": ivf.n_lists,
+                    "ivf_build_seconds": ivf_build_seconds,
+                    "bm25_terms": bm25.n_terms,
+                    "bm25_build_seconds": bm25_build_seconds,
+                },
+            )
+        finally:
+            mcp_server.search_index = original_index
+            mcp_server.async_openai_client = original_client
+            mcp_server.query_cache.clear()
+
+
+async def run_search_benchmark(
+    index: SyntheticIndex,
+    concurrency: int = 8,
+    top_k: int = 3,
+    batch_size: int = 8,
+    nprobes: tuple[int, ...] = (4, 16),
+    quantize: tuple[str, ...] = ("int8",),
+    quantized_candidates: int = 100,
+) -> dict:
+    """Benchmarks the MCP search tools and the scoring engines on a synthetic index.
+
+    Each engine runs every query of the index with `concurrency` in flight,
+    from a cold query embedding cache; peak memory comes from a separate
+    traced pass over a few queries. Quantized indexes are built in memory
+    only, so the other engines keep scoring the float32 vectors.
+    """
+    import mcp_server
+
+    texts = list(index.queries)
+    vectors = [index.queries[text].tolist() for text in texts]
+    engines = {
+        # End to end through the MCP tool: embedding, cache, scoring in a thread
+        "azure_ai_search": ([lambda t=t: mcp_server.azure_ai_search(t, top_k) for t in texts], 1),
+        "azure_ai_search_batch": (
+            [
+                lambda b=texts[i : i + batch_size]: mcp_server.azure_ai_search_batch(b, top_k)
+                for i in range(0, len(texts), batch_size)
+            ],
+            batch_size,
+        ),
+        # No embedding call at all
+        "azure_ai_search_lexical": (
+            [lambda t=t: mcp_server.azure_ai_search(t, top_k, mode="lexical") for t in texts],
+            1,
+        ),
+        "azure_ai_search_hybrid": (
+            [lambda t=t: mcp_server.azure_ai_search(t, top_k, mode="hybrid") for t in texts],
+            1,
+        ),
+        "score_query_exact": (
+            [lambda v=v: asyncio.to_thread(mcp_server.score_query, v, top_k) for v in vectors],
+            1,
+        ),
+    }
+    for nprobe in nprobes:
+        engines[f"score_query_ivf_nprobe_{nprobe}"] = (
+            [
+                lambda v=v, n=nprobe: asyncio.to_thread(mcp_server.score_query, v, top_k, n)
+                for v in vectors
+            ],
+            1,
+        )
+    quantized: dict[str, tuple[QuantizedIndex, float]] = {}
+    for kind in quantize:
+        start = time.perf_counter()
+        quantized_index = QuantizedIndex.build(index.store.embeddings, kind)
+        quantized[kind] = (quantized_index, time.perf_counter() - start)
+        engines[f"quantized_{kind}"] = (
+            [
+                lambda v=v, q=quantized_index: asyncio.to_thread(
+                    q.search, index.store.embeddings, v, top_k, quantized_candidates
+                )
+                for v in vectors
+            ],
+            1,
+        )
+
+    results = {}
+    # The tools print their results; keep stdout for the JSON report
+    with open(os.devnull, "w") as devnull, contextlib.redirect_stdout(devnull):
+        for name, (calls, items_per_call) in engines.items():
+            mcp_server.query_cache.clear()
+            result = await measure(calls, concurrency, items_per_call)
+            mcp_server.query_cache.clear()
+            result["peak_memory_bytes"] = await peak_memory(calls)
+            results[name] = result
+    mcp_server.query_cache.clear()
+
+    query_matrix = np.asarray(vectors, dtype=np.float32)
+    for nprobe in nprobes:
+        results[f"score_query_ivf_nprobe_{nprobe}"]["recall_at_k"] = recall_at_k(
+            index.ivf, index.store.embeddings, query_matrix, top_k, nprobe
+        )
+    for kind, (quantized_index, build_seconds) in quantized.items():
+        results[f"quantized_{kind}"].update(
+            recall_at_k=quantized_recall_at_k(
+                quantized_index, index.store.embeddings, query_matrix, top_k, quantized_candidates
+            ),
+            candidates=quantized_candidates,
+            index_bytes=quantized_index.nbytes,
+            float32_bytes=int(index.store.embeddings.nbytes),
+            build_seconds=build_seconds,
+        )
+
+    return {
+        "queries": len(texts),
+        "concurrency": concurrency,
+        "top_k": top_k,
+        "engines": results,
+        # ru_maxrss is in kilobytes on Linux
+        "process_peak_rss_bytes": resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024,
+    }
@@ -0,0 +1,213 @@
+"""Workflow benchmark: full QnA turns against a local Temporal server with a stubbed LLM."""
+
+import asyncio
+import json
+import time
+import uuid
+from datetime import timedelta
+from typing import Any, AsyncIterator, Optional
+
+from agents import ModelResponse
+from agents.models.interface import Model
+from openai.types.responses import (
+    Response,
+    ResponseCompletedEvent,
+    ResponseTextDeltaEvent,
+)
+from temporalio.client import Client
+from temporalio.contrib.openai_agents import ModelActivityParameters, OpenAIAgentsPlugin
+from temporalio.contrib.openai_agents.testing import ResponseBuilders, TestModelProvider
+from temporalio.contrib.workflow_streams import WorkflowStreamClient
+from temporalio.testing import WorkflowEnvironment
+from temporalio.worker import Worker
+
+from benchmarks.search import latency_summary
+
+TASK_QUEUE = "benchmark-task-queue"
+# Words of the stubbed answer; each one is streamed as a text delta
+ANSWER_WORDS = 40
+
+
+def _wants_tool_call(input: Any) -> bool:
+    """The stub searches once per turn: on the first model call, before any tool output."""
+    if isinstance(input, str) or not input:
+        return True
+    last = input[-1]
+    item_type = last.get("type") if isinstance(last, dict) else getattr(last, "type", None)
+    return item_type != "function_call_output"
+
+
+def _last_user_text(input: Any) -> str:
+    if isinstance(input, str):
+        return input
+    for item in reversed(input):
+        if isinstance(item, dict) and item.get("role") == "user":
+            content = item.get("content")
+            return content if isinstance(content, str) else json.dumps(content)
+    return ""
+
+
+class StubStreamingModel(Model):
+    """LLM stand-in: calls mcp_search_activity once, then streams a fixed answer.
+
+    Token deltas are spaced by `token_delay` seconds to model generation speed.
+    """
+
+    def __init__(self, token_delay: float = 0.0):
+        self.token_delay = token_delay
+
+    def _tool_call(self, input: Any) -> ModelResponse:
+        arguments = json.dumps({"query": _last_user_text(input), "top_k": 3})
+        return ResponseBuilders.tool_call(arguments, "mcp_search_activity")
+
+    async def get_response(self, system_instructions, input, *args, **kwargs) -> ModelResponse:
+        if _wants_tool_call(input):
+            return self._tool_call(input)
+        return ResponseBuilders.output_message(" ".join(["word"] * ANSWER_WORDS))
+
+    async def stream_response(
+        self, system_instructions, input, *args, **kwargs
+    ) -> AsyncIterator[Any]:
+        if _wants_tool_call(input):
+            output = self._tool_call(input).output
+        else:
+            words = ["word"] * ANSWER_WORDS
+            for sequence_number, word in enumerate(words):
+                if self.token_delay:
+                    await asyncio.sleep(self.token_delay)
+                yield ResponseTextDeltaEvent(
+                    content_index=0,
+                    delta=word if sequence_number == 0 else " " + word,
+                    item_id="msg",
+                    logprobs=[],
+                    output_index=0,
+                    sequence_number=sequence_number,
+                    type="response.output_text.delta",
+                )
+            output = [ResponseBuilders.response_output_message(" ".join(words))]
+        yield ResponseCompletedEvent(
+            response=Response(
+                id="benchmark",
+                created_at=time.time(),
+                model="stub",
+                object="response",
+                output=output,
+                parallel_tool_calls=False,
+                tool_choice="auto",
+                tools=[],
+            ),
+            sequence_number=ANSWER_WORDS,
+            type="response.completed",
+        )
+
+
+async def run_turn(client: Client, workflow_id: str, question: str) -> dict:
+    """Sends one prompt and times its first token and its answer."""
+    from workflows.workflow import ANSWERS_TOPIC, MODEL_EVENTS_TOPIC, QnAInput, QnAWorkflow
+
+    stream = WorkflowStreamClient.create(client, workflow_id)
+    from_offset = await stream.get_offset()
+    start = time.perf_counter()
+    handle = client.get_workflow_handle(workflow_id)
+    await handle.signal(QnAWorkflow.new_task, QnAInput(question))
+
+    first_token: Optional[float] = None
+    topics = [MODEL_EVENTS_TOPIC, ANSWERS_TOPIC]
+    async for item in stream.subscribe(topics, from_offset=from_offset):
+        if item.topic == ANSWERS_TOPIC:
+            break
+        if first_token is None and item.data.get("type") == "response.output_text.delta":
+            first_token = time.perf_counter() - start
+    return {"first_token": first_token, "answer": time.perf_counter() - start}
+
+
+async def run_workflow_benchmark(
+    turns: int = 20,
+    sessions: int = 1,
+    token_delay: float = 0.0,
+    temporal_address: Optional[str] = None,
+) -> dict:
+    """Drives full workflow turns (agent, search activity over MCP, streaming).
+
+    The LLM is a StubStreamingModel and the embeddings endpoint is faked, so
+    the numbers measure the orchestration overhead of a turn. Searches go to
+    the in-process MCP server, so run inside benchmarks.search.synthetic_index.
+
+    Args:
+        turns: Prompts sent per session
+        sessions: Concurrent workflows
+        token_delay: Seconds between streamed tokens of the stub model
+        temporal_address: Existing Temporal server; a local dev server is
+            started when None (downloads the server binary on first use)
+    """
+    import mcp_server
+    from activities import activities, mcp_pool
+    from workflows.workflow import MODEL_EVENTS_TOPIC, QnASessionState, QnAWorkflow
+
+    # In-memory MCP sessions to this process's server
+    original_pool = mcp_pool._pool
+    mcp_pool._pool = mcp_pool.MCPClientPool(mcp_server.mcp, size=4)
+
+    plugin = OpenAIAgentsPlugin(
+        model_params=ModelActivityParameters(
+            start_to_close_timeout=timedelta(seconds=30),
+            streaming_topic=MODEL_EVENTS_TOPIC,
+        ),
+        model_provider=TestModelProvider(StubStreamingModel(token_delay)),
+    )
+    env = (
+        None if temporal_address else await WorkflowEnvironment.start_local(plugins=[plugin])
+    )
+    try:
+        client = env.client if env else await Client.connect(temporal_address, plugins=[plugin])
+        worker = Worker(
+            client,
+            task_queue=TASK_QUEUE,
+            workflows=[QnAWorkflow],
+            activities=[
+                activities.mcp_search_activity,
+                activities.mcp_batch_search_activity,
+                activities.answer_cache_lookup_activity,
+                activities.answer_cache_store_activity,
+            ],
+        )
+        async with worker:
+            workflow_ids = []
+            for _ in range(sessions):
+                handle = await client.start_workflow(
+                    QnAWorkflow.run,
+                    QnASessionState(),
+                    id=f"benchmark-{uuid.uuid4()}",
+                    task_queue=TASK_QUEUE,
+                )
+                workflow_ids.append(handle.id)
+
+            async def session(workflow_id: str) -> list[dict]:
+                return [
+                    await run_turn(client, workflow_id, f"benchmark question {turn}")
+                    for turn in range(turns)
+                ]
+
+            start = time.perf_counter()
+            results = await asyncio.gather(*(session(wid) for wid in workflow_ids))
+            wall_seconds = time.perf_counter() - start
+
+            for workflow_id in workflow_ids:
+                await client.get_workflow_handle(workflow_id).terminate("benchmark done")
+    finally:
+        if env is not None:
+            await env.shutdown()
+        await mcp_pool._pool.close()
+        mcp_pool._pool = original_pool
+
+    samples = [turn for session_turns in results for turn in session_turns]
+    first_tokens = [turn["first_token"] for turn in samples if turn["first_token"] is not None]
+    return {
+        "sessions": sessions,
+        "turns": len(samples),
+        "token_delay_seconds": token_delay,
+        "answer": latency_summary([turn["answer"] for turn in samples], wall_seconds, len(samples)),
+        "first_token": (
+            latency_summary(first_tokens, wall_seconds, len(first_tokens)) if first_tokens else None
+        ),
+    }
@@ -65,6 +65,11 @@ class AzureEmbeddingsConfig:
             raise ValueError("AZURE_EMBEDDINGS_API_KEY not configured")
 
 
+def _optional_int(name: str) -> Optional[int]:
+    value = os.getenv(name)
+    return int(value) if value else None
+
+
 @dataclass
 class TemporalConfig:
     """Temporal configuration."""
@@ -72,6 +77,31 @@ class TemporalConfig:
     address: str = "localhost:7233"
     namespace: str = "default"
     task_queue: str = "agent-mcp-queue"
+    # Queues of the LLM (model) and search activities; empty means task_queue
+    model_task_queue: str = ""
+    search_task_queue: str = ""
+    # Start-to-close timeout of one model call, in seconds
+    model_timeout: float = 30.0
+    # How new sessions answer: "agent" (the model calls the search tools) or
+    # "fast" (search up front, then a single model call)
+    rag_mode: str = "agent"
+    # Whether sessions look up and store answers in the MCP server's answer
+    # cache (on when ANSWER_CACHE is set)
+    answer_cache: bool = False
+    # Worker limits; None keeps the SDK defaults
+    max_concurrent_workflow_tasks: Optional[int] = None
+    max_concurrent_activities: Optional[int] = None
+    max_concurrent_model_activities: Optional[int] = None
+    max_concurrent_workflow_task_polls: Optional[int] = None
+    max_concurrent_activity_task_polls: Optional[int] = None
+    # Threads of the executor running synchronous activities
+    activity_executor_workers: Optional[int] = None
+    # "fixed" (slot counts above) or "resource" (slots follow CPU/memory usage)
+    tuner: str = "fixed"
+    tuner_target_memory: float = 0.8
+    tuner_target_cpu: float = 0.9
+    # host:port where workers serve Prometheus metrics (SDK runtime and activity metrics)
+    metrics_bind_address: str = ""
     
     @classmethod
     def from_env(cls) -> "TemporalConfig":
@@ -80,8 +110,56 @@ class TemporalConfig:
             address=os.getenv("TEMPORAL_ADDRESS", "localhost:7233"),
             namespace=os.getenv("TEMPORAL_NAMESPACE", "default"),
             task_queue=os.getenv("TEMPORAL_TASK_QUEUE", "agent-mcp-queue"),
+            model_task_queue=os.getenv("TEMPORAL_MODEL_TASK_QUEUE", ""),
+            search_task_queue=os.getenv("TEMPORAL_SEARCH_TASK_QUEUE", ""),
+            model_timeout=float(os.getenv("TEMPORAL_MODEL_TIMEOUT", "30")),
+            rag_mode=os.getenv("TEMPORAL_RAG_MODE", "agent"),
+            answer_cache=bool(os.getenv("ANSWER_CACHE")),
+            max_concurrent_workflow_tasks=_optional_int("TEMPORAL_MAX_CONCURRENT_WORKFLOW_TASKS"),
+            max_concurrent_activities=_optional_int("TEMPORAL_MAX_CONCURRENT_ACTIVITIES"),
+            max_concurrent_model_activities=_optional_int(
+                "TEMPORAL_MAX_CONCURRENT_MODEL_ACTIVITIES"
+            ),
+            max_concurrent_workflow_task_polls=_optional_int(
+                "TEMPORAL_MAX_CONCURRENT_WORKFLOW_TASK_POLLS"
+            ),
+            max_concurrent_activity_task_polls=_optional_int(
+                "TEMPORAL_MAX_CONCURRENT_ACTIVITY_TASK_POLLS"
+            ),
+            activity_executor_workers=_optional_int("TEMPORAL_ACTIVITY_EXECUTOR_WORKERS"),
+            tuner=os.getenv("TEMPORAL_TUNER", "fixed"),
+            tuner_target_memory=float(os.getenv("TEMPORAL_TUNER_TARGET_MEMORY", "0.8")),
+            tuner_target_cpu=float(os.getenv("TEMPORAL_TUNER_TARGET_CPU", "0.9")),
+            metrics_bind_address=os.getenv("TEMPORAL_METRICS_BIND_ADDRESS", ""),
         )
 
+    def validate(self) -> None:
+        """Validates that all required configurations are present."""
+        if self.tuner not in ("fixed", "resource"):
+            raise ValueError("TEMPORAL_TUNER must be one of: fixed, resource")
+        if self.tuner == "resource" and (
+            self.max_concurrent_workflow_tasks
+            or self.max_concurrent_activities
+            or self.max_concurrent_model_activities
+        ):
+            raise ValueError(
+                "TEMPORAL_MAX_CONCURRENT_* slot limits can't be combined with TEMPORAL_TUNER=resource"
+            )
+        if not (0 < self.tuner_target_memory <= 1 and 0 < self.tuner_target_cpu <= 1):
+            raise ValueError("TEMPORAL_TUNER_TARGET_* must be between 0 and 1")
+        if self.model_timeout <= 0:
+            raise ValueError("TEMPORAL_MODEL_TIMEOUT must be positive")
+        if self.rag_mode not in ("agent", "fast"):
+            raise ValueError("TEMPORAL_RAG_MODE must be one of: agent, fast")
+
+    @property
+    def model_queue(self) -> str:
+        return self.model_task_queue or self.task_queue
+
+    @property
+    def search_queue(self) -> str:
+        return self.search_task_queue or self.task_queue
+
 
 @dataclass
 class SearchConfig:
@@ -97,6 +175,66 @@ class SearchConfig:
         )
 
 
+@dataclass
+class MCPConfig:
+    """MCP server/client configuration."""
+
+    # Script path (stdio) or URL of a long-running server (http://host:port/mcp, .../sse)
+    server: str = "mcp_server.py"
+    pool_size: int = 4
+    health_check_interval: float = 30.0
+    transport: str = "stdio"
+    host: str = "127.0.0.1"
+    port: int = 8765
+
+    @classmethod
+    def from_env(cls) -> "MCPConfig":
+        """Loads configuration from environment variables."""
+        return cls(
+            server=os.getenv("MCP_SERVER", "mcp_server.py"),
+            pool_size=int(os.getenv("MCP_POOL_SIZE", "4")),
+            health_check_interval=float(os.getenv("MCP_HEALTH_CHECK_INTERVAL", "30")),
+            transport=os.getenv("MCP_TRANSPORT", "stdio"),
+            host=os.getenv("MCP_HOST", "127.0.0.1"),
+            port=int(os.getenv("MCP_PORT", "8765")),
+        )
+
+    def validate(self) -> None:
+        """Validates that all required configurations are present."""
+        if self.pool_size < 1:
+            raise ValueError("MCP_POOL_SIZE must be at least 1")
+        if self.transport not in ("stdio", "http", "sse"):
+            raise ValueError("MCP_TRANSPORT must be one of: stdio, http, sse")
+
+
+@dataclass
+class ContextConfig:
+    """Packing of search results into the model's context."""
+
+    # Tokens of retrieved chunks handed to the model per search
+    token_budget: int = 2000
+    # Chunks at least this similar (word 3-gram Jaccard) to a better one are dropped
+    dedup_threshold: float = 0.8
+    # tiktoken encoding; a word/punctuation estimate is used without tiktoken
+    encoding: str = "o200k_base"
+
+    @classmethod
+    def from_env(cls) -> "ContextConfig":
+        """Loads configuration from environment variables."""
+        return cls(
+            token_budget=int(os.getenv("CONTEXT_TOKEN_BUDGET", "2000")),
+            dedup_threshold=float(os.getenv("CONTEXT_DEDUP_THRESHOLD", "0.8")),
+            encoding=os.getenv("CONTEXT_ENCODING", "o200k_base"),
+        )
+
+    def validate(self) -> None:
+        """Validates that all required configurations are present."""
+        if self.token_budget < 1:
+            raise ValueError("CONTEXT_TOKEN_BUDGET must be at least 1")
+        if not 0 < self.dedup_threshold <= 1:
+            raise ValueError("CONTEXT_DEDUP_THRESHOLD must be between 0 and 1")
+
+
 @dataclass
 class APIConfig:
     """API configuration."""
@@ -123,12 +261,17 @@ class Config:
         self.azure_embeddings = AzureEmbeddingsConfig.from_env()
         self.temporal = TemporalConfig.from_env()
         self.search = SearchConfig.from_env()
+        self.mcp = MCPConfig.from_env()
+        self.context = ContextConfig.from_env()
         self.api = APIConfig.from_env()
     
     def validate(self) -> None:
         """Validates all configurations."""
         self.azure_openai.validate()
         self.azure_embeddings.validate()
+        self.temporal.validate()
+        self.mcp.validate()
+        self.context.validate()
 
 
 # Global configuration instance
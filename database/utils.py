@@ -1,39 +1,223 @@
-import json
+import argparse
+import asyncio
 import os
-from openai import AzureOpenAI
+import random
+import sys
+from collections import deque
+from pathlib import Path
+from typing import Optional
+
+from openai import APIConnectionError, APIStatusError, AsyncAzureOpenAI
 from dotenv import load_dotenv
 
+# Add the project root to sys.path so that the "search" package is recognized
+PROJECT_ROOT = Path(__file__).resolve().parent.parent
+sys.path.append(str(PROJECT_ROOT))
+
+from search.embedding_cache import EmbeddingCache  # noqa: E402
+from search.ingest import DocumentWriter, iter_batches, iter_documents  # noqa: E402
+from search.quantization import KINDS, build_quantized_index  # noqa: E402
+from search.vector_store import VectorStoreWriter, file_signature  # noqa: E402
+
 load_dotenv()
 
 AZURE_EMBEDDINGS_ENDPOINT = os.getenv("AZURE_EMBEDDINGS_ENDPOINT")
 AZURE_EMBEDDINGS_API_KEY = os.getenv("AZURE_EMBEDDINGS_API_KEY")
-AZURE_EMBEDDINGS_DEPLOYMENT = os.getenv("AZURE_EMBEDDINGS_DEPLOYMENT")
+AZURE_EMBEDDINGS_DEPLOYMENT = os.getenv("AZURE_EMBEDDINGS_DEPLOYMENT", "text-embedding-3-large")
 AZURE_EMBEDDINGS_API_VERSION = os.getenv("AZURE_EMBEDDINGS_API_VERSION", "2024-02-15-preview")
 
-openai_client_async_max = AzureOpenAI(
+INDEX_FILENAME = "database/index.json"
+SEARCH_FILENAME = "database/search_index.json"
+# Embeddings of previous runs, reused for chunks whose text didn't change
+CACHE_FILENAME = os.getenv("EMBEDDINGS_CACHE", "database/embeddings_cache.sqlite")
+
+# Chunks per embeddings.create call and requests in flight
+BATCH_SIZE = int(os.getenv("EMBEDDINGS_BATCH_SIZE", "64"))
+CONCURRENCY = int(os.getenv("EMBEDDINGS_CONCURRENCY", "4"))
+MAX_RETRIES = int(os.getenv("EMBEDDINGS_MAX_RETRIES", "8"))
+
+RETRYABLE_STATUS_CODES = {408, 409, 429, 500, 502, 503, 504}
+
+
+def get_async_client() -> AsyncAzureOpenAI:
+    """Creates the embeddings client; retries are handled by embed_batch."""
+    return AsyncAzureOpenAI(
         azure_endpoint=AZURE_EMBEDDINGS_ENDPOINT,
         api_key=AZURE_EMBEDDINGS_API_KEY,
-        api_version=AZURE_EMBEDDINGS_API_VERSION
-)
-
-def get_embedding(query: str):
-    response = openai_client_async_max.embeddings.create(
-        model=AZURE_EMBEDDINGS_DEPLOYMENT, 
-        input=query,
+        api_version=AZURE_EMBEDDINGS_API_VERSION,
+        max_retries=0,
     )
-    return response.data[0].embedding
 
-def generate_embeddings():
-    with open("database/index.json", "r",encoding='utf-8') as f:
-        documents = json.load(f)
-    for doc in documents:
-        embedding = get_embedding(doc["chunk"])
-        doc["embedding"] = embedding
 
-    with open("database/search_index.json", "w") as f:
-        json.dump(documents, f)
+def retry_delay(error: Exception, attempt: int) -> float:
+    """Seconds to wait before retrying: Retry-After if the server sent one, else backoff."""
+    response = getattr(error, "response", None)
+    if response is not None:
+        retry_after = response.headers.get("retry-after-ms")
+        if retry_after:
+            return float(retry_after) / 1000
+        retry_after = response.headers.get("retry-after")
+        if retry_after:
+            try:
+                return float(retry_after)
+            except ValueError:
+                pass
+    return min(60.0, 2**attempt) * random.uniform(0.5, 1.0)
+
+
+async def embed_batch(
+    client: AsyncAzureOpenAI, texts: list[str], max_retries: int = MAX_RETRIES
+) -> list[list[float]]:
+    """Embeds several texts in one request, retrying throttled or failed calls.
+
+    Args:
+        client: Embeddings client
+        texts: Texts to embed
+        max_retries: Retries before giving up
+
+    Returns:
+        One embedding per text, in input order
+    """
+    for attempt in range(max_retries + 1):
+        try:
+            response = await client.embeddings.create(
+                model=AZURE_EMBEDDINGS_DEPLOYMENT,
+                input=texts,
+            )
+            return [item.embedding for item in sorted(response.data, key=lambda d: d.index)]
+        except (APIStatusError, APIConnectionError) as e:
+            retryable = isinstance(e, APIConnectionError) or e.status_code in RETRYABLE_STATUS_CODES
+            if not retryable or attempt == max_retries:
+                raise
+            delay = retry_delay(e, attempt)
+            print(f"⚠️  Embeddings request failed ({e.__class__.__name__}), retrying in {delay:.1f}s")
+            await asyncio.sleep(delay)
+    raise AssertionError("unreachable")
+
+
+async def generate_embeddings_async(
+    source: str = INDEX_FILENAME,
+    output: str = SEARCH_FILENAME,
+    batch_size: int = BATCH_SIZE,
+    concurrency: int = CONCURRENCY,
+    client: Optional[AsyncAzureOpenAI] = None,
+    cache: Optional[EmbeddingCache] = None,
+    quantize: Optional[str] = None,
+    pq_subvectors: int = 32,
+) -> None:
+    """Embeds every chunk of the source index and writes the search index.
+
+    Documents are streamed from `source` (JSON array or JSONL) in batches of
+    `batch_size`, with at most `concurrency` batches in flight, and written
+    in order to `output` and straight into the binary vector store, so the
+    texts and embeddings in memory are bounded by batch_size * concurrency
+    rather than corpus size. The BM25 postings and metadata columns the
+    store writer builds along the way (compact integer arrays) still grow
+    with the corpus.
+    Both are written to temporary files that replace the previous index only
+    once the run succeeds, so a failed run leaves it untouched.
+
+    Chunks whose text is already in the embedding cache (for the same
+    deployment) are not sent to the API. Without a cache, embeddings are
+    kept in `<output>.checkpoint.sqlite` until the run succeeds, so a
+    crashed run resumes where it stopped.
+
+    Args:
+        source: JSON/JSONL file with {id, chunk} documents
+        output: Search index to write ({id, chunk, embedding} documents)
+        batch_size: Chunks per embeddings request
+        concurrency: Maximum number of requests in flight
+        client: Embeddings client (default: Azure client from the environment)
+        cache: Embedding cache to read from and fill (None disables caching)
+        quantize: Also write a compressed copy of the vectors ("float16",
+            "int8" or "pq") that the MCP server scans before re-ranking exactly
+        pq_subvectors: Bytes per vector with quantize="pq"; must divide the dimension
+    """
+    checkpoint_path = Path(output + ".checkpoint.sqlite")
+    known_store = cache if cache is not None else EmbeddingCache(str(checkpoint_path))
+    client = client or get_async_client()
+    counters = {"reused": 0, "embedded": 0}
+
+    async def embed_documents(batch: list[dict]) -> list[list[float]]:
+        texts = [doc["chunk"] for doc in batch]
+        known = known_store.get_many(AZURE_EMBEDDINGS_DEPLOYMENT, texts)
+        missing = list(dict.fromkeys(text for text in texts if text not in known))
+        if missing:
+            embeddings = await embed_batch(client, missing)
+            pairs = list(zip(missing, embeddings, strict=True))
+            known_store.put_many(AZURE_EMBEDDINGS_DEPLOYMENT, pairs)
+            known.update(pairs)
+        counters["reused"] += len(texts) - len(missing)
+        counters["embedded"] += len(missing)
+        return [known[text] for text in texts]
+
+    in_flight: deque[tuple[list[dict], asyncio.Task]] = deque()
+    try:
+        with VectorStoreWriter(output) as store, DocumentWriter(output) as out:
+
+            async def write_oldest() -> None:
+                batch, task = in_flight.popleft()
+                embeddings = await task
+                for doc, embedding in zip(batch, embeddings, strict=True):
+                    out.write({**doc, "embedding": embedding})
+                store.append(
+                    [doc["id"] for doc in batch],
+                    [doc["chunk"] for doc in batch],
+                    embeddings,
+                    metadata=[doc.get("metadata") for doc in batch],
+                )
+
+            for batch in iter_batches(iter_documents(source), batch_size):
+                in_flight.append((batch, asyncio.create_task(embed_documents(batch))))
+                if len(in_flight) >= concurrency:
+                    await write_oldest()
+            while in_flight:
+                await write_oldest()
+            # The store is swapped in first, recording the finished JSON output:
+            # until that output replaces the previous one, the previous one is
+            # older than the store, so a resident index doesn't rebuild from it
+            store.close(source_signature=file_signature(out.finish()))
+    finally:
+        for _, task in in_flight:
+            task.cancel()
+
+    if quantize:
+        index = build_quantized_index(output, quantize, pq_subvectors)
+        print(f"Quantized index ({index.kind}): {index.nbytes} bytes")
+
+    print(f"Embedding cache: {counters['reused']} chunks reused, {counters['embedded']} embedded")
+    if cache is None:
+        known_store.close()
+        for suffix in ("", "-wal", "-shm"):
+            Path(str(checkpoint_path) + suffix).unlink(missing_ok=True)
+
+
+def generate_embeddings(**kwargs) -> None:
+    asyncio.run(generate_embeddings_async(**kwargs))
+
 
 if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Generate search index embeddings")
+    parser.add_argument("--source", default=INDEX_FILENAME)
+    parser.add_argument("--output", default=SEARCH_FILENAME)
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--concurrency", type=int, default=CONCURRENCY)
+    parser.add_argument("--cache", default=CACHE_FILENAME)
+    parser.add_argument("--no-cache", action="store_true", help="Re-embed every chunk")
+    parser.add_argument(
+        "--quantize", choices=KINDS, help="Also write a compressed copy of the vectors"
+    )
+    parser.add_argument("--pq-subvectors", type=int, default=32, help="Bytes per vector (pq)")
+    args = parser.parse_args()
+
     print("Generating embeddings...")
-    generate_embeddings()
-    print("Embeddings generated successfully!")
\ No newline at end of file
+    generate_embeddings(
+        source=args.source,
+        output=args.output,
+        batch_size=args.batch_size,
+        concurrency=args.concurrency,
+        cache=None if args.no_cache else EmbeddingCache(args.cache),
+        quantize=args.quantize,
+        pq_subvectors=args.pq_subvectors,
+    )
+    print("Embeddings generated successfully!")
@@ -1,4 +1,5 @@
 import os
+import time
 from typing import Dict, Any, List, Optional
 
 import httpx
@@ -7,6 +8,11 @@ import streamlit as st
 
 st.set_page_config(page_title="QnA Agent UI", layout="centered")
 
+# How long one /status long poll is held open by the API
+STATUS_WAIT_SECONDS = 20.0
+# Pause between plain polls when the API cannot long poll (no status version known)
+STATUS_POLL_SECONDS = 2.0
+
 
 def get_base_url() -> str:
     return st.session_state.get("base_url") or os.getenv("API_BASE_URL", "http://localhost:8000")
@@ -25,6 +31,61 @@ def init_session_state():
     st.session_state.setdefault("current_state", [])
     st.session_state.setdefault("history", [])
     st.session_state.setdefault("poll", True)
+    st.session_state.setdefault("status_version", None)
+    st.session_state.setdefault("awaiting_answer", False)
+    st.session_state.setdefault("prompt_version", None)
+
+
+def fetch_status(wait: bool = False) -> bool:
+    """Updates the session with the workflow status.
+
+    With wait, the API holds the request until the status version changes
+    (or STATUS_WAIT_SECONDS pass) instead of answering right away. Returns
+    whether the request was such a long poll and succeeded; otherwise it
+    answered right away and callers looping on it should pause themselves.
+    """
+    params = {}
+    timeout = httpx.Timeout(10.0, read=30.0)
+    long_poll = wait and st.session_state.status_version is not None
+    if long_poll:
+        params = {"version": st.session_state.status_version, "timeout": STATUS_WAIT_SECONDS}
+        timeout = httpx.Timeout(10.0, read=STATUS_WAIT_SECONDS + 10.0)
+    try:
+        with httpx.Client(timeout=timeout) as c:
+            r = c.get(f"{get_base_url()}/workflows/{st.session_state.workflow_id}/status", params=params)
+            if r.status_code != 200:
+                st.warning("Could not get status.")
+                return False
+    except httpx.HTTPError:
+        st.warning("API unavailable for status.")
+        return False
+
+    latest = r.json().get("latest")
+    if not isinstance(latest, dict):
+        return False
+    st.session_state.current_state = latest.get("current_state", [])
+    st.session_state.status_version = latest.get("version")
+
+    message = latest.get("latest_message") or {}
+    if message.get("actor") == "agent" and is_answer_to_last_prompt(latest):
+        st.session_state.awaiting_answer = False
+    return long_poll
+
+
+def is_answer_to_last_prompt(latest: Dict[str, Any]) -> bool:
+    """Tells whether the agent message in latest came after the last prompt was sent.
+
+    Every message bumps the status version, so an agent message with a version
+    above the one seen when the prompt was sent answers it, even when the same
+    question was asked before. Without versions, falls back to matching the
+    prompt being processed against the last one sent.
+    """
+    version = latest.get("version")
+    sent_at = st.session_state.prompt_version
+    if version is not None and sent_at is not None:
+        return version > sent_at
+    states = latest.get("current_state") or []
+    return bool(states) and states[0].get("content") == st.session_state.last_prompt
 
 
 def has_processing_states(states: List[Dict[str, Any]]) -> bool:
@@ -96,18 +157,9 @@ def main():
         st.subheader("Workflow")
         st.write(f"ID: {st.session_state.workflow_id}")
 
-        # Poll status
-        try:
-            with api_client() as c:
-                r = c.get(f"{get_base_url()}/workflows/{st.session_state.workflow_id}/status")
-                if r.status_code == 200:
-                    latest = r.json().get("latest")
-                    if isinstance(latest, dict):
-                        st.session_state.current_state = latest.get("current_state", [])
-                else:
-                    st.warning("Could not get status.")
-        except httpx.HTTPError:
-            st.warning("API unavailable for status.")
+        # Status is already fresh when this run was triggered by the long poll below
+        if not st.session_state.pop("status_fresh", False):
+            fetch_status()
 
         # Render current state
         render_state(st.session_state.current_state, st.session_state.last_prompt)
@@ -135,6 +187,8 @@ def main():
                     )
                     r.raise_for_status()
                     st.session_state.last_prompt = prompt.strip()
+                    st.session_state.prompt_version = st.session_state.status_version
+                    st.session_state.awaiting_answer = True
                     st.success("Prompt sent.")
             except httpx.HTTPError as e:
                 st.error(f"Failed to send prompt: {e}")
@@ -144,6 +198,7 @@ def main():
                 with api_client() as c:
                     r = c.post(f"{get_base_url()}/workflows/{st.session_state.workflow_id}/end")
                     r.raise_for_status()
+                    st.session_state.awaiting_answer = False
                     st.success("Conversation ended.")
             except httpx.HTTPError as e:
                 st.error(f"Failed to end conversation: {e}")
@@ -163,8 +218,11 @@ def main():
             for m in st.session_state.history:
                 st.write(f"[{m.get('actor')}] {m.get('content')}")
 
-    # Auto refresh while running
-    if st.session_state.workflow_id:
+    # While an answer is pending, wait on the API for the next change instead of rerunning in a loop
+    if st.session_state.workflow_id and st.session_state.awaiting_answer:
+        if not fetch_status(wait=True):
+            time.sleep(STATUS_POLL_SECONDS)
+        st.session_state.status_fresh = True
         st.rerun()
 
 
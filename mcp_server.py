@@ -1,12 +1,32 @@
 """MCP Server - Exposes semantic search tools via Model Context Protocol."""
 
-import json
+import asyncio
 import os
+from contextlib import contextmanager
+from typing import Any, Optional
 
 import numpy as np
 from dotenv import load_dotenv
 from fastmcp import FastMCP
-from openai import AzureOpenAI
+from openai import AsyncAzureOpenAI, AzureOpenAI
+from prometheus_client import CONTENT_TYPE_LATEST, Counter, Histogram, generate_latest
+from starlette.requests import Request
+from starlette.responses import Response
+
+from config import MCPConfig
+from metrics import LATENCY_BUCKETS
+from search.answer_cache import AnswerCache
+from search.embedding_cache import EmbeddingCache
+from search.query_cache import QueryEmbeddingCache
+from search.rerank import TermOverlapScorer, load_reranker
+from search.rerank import rerank as rerank_candidates
+from search.scoring import (
+    cosine_top_k,
+    cosine_top_k_batch,
+    reciprocal_rank_fusion,
+    weighted_score_fusion,
+)
+from search.vector_store import ResidentIndex
 
 load_dotenv()
 
@@ -26,9 +46,89 @@ openai_client_async_max = AzureOpenAI(
     api_version=AZURE_EMBEDDINGS_API_VERSION,
 )
 
+# Async client used by the tools; one instance so all searches share its connection pool
+async_openai_client = AsyncAzureOpenAI(
+    azure_endpoint=AZURE_EMBEDDINGS_ENDPOINT,
+    api_key=AZURE_EMBEDDINGS_API_KEY,
+    api_version=AZURE_EMBEDDINGS_API_VERSION,
+)
+
+# Binary, memory-mapped copy of SEARCH_FILENAME; reloaded only when it changes
+search_index = ResidentIndex(SEARCH_FILENAME)
+
+# Query embeddings cache; QUERY_CACHE_SHARED (SQLite file) shares hits across processes
+QUERY_CACHE_SHARED = os.getenv("QUERY_CACHE_SHARED")
+query_cache = QueryEmbeddingCache(
+    max_size=int(os.getenv("QUERY_CACHE_SIZE", "1024")),
+    ttl=float(os.getenv("QUERY_CACHE_TTL", "3600")),
+    deployment=AZURE_EMBEDDINGS_DEPLOYMENT or "",
+    shared=EmbeddingCache(QUERY_CACHE_SHARED) if QUERY_CACHE_SHARED else None,
+)
+
+# Semantic cache of agent answers (SQLite file); disabled unless ANSWER_CACHE is set
+ANSWER_CACHE = os.getenv("ANSWER_CACHE")
+answer_cache = (
+    AnswerCache(
+        ANSWER_CACHE,
+        ttl=float(os.getenv("ANSWER_CACHE_TTL", "86400")),
+        threshold=float(os.getenv("ANSWER_CACHE_THRESHOLD", "0.95")),
+    )
+    if ANSWER_CACHE
+    else None
+)
+
+# Retrieval modes of azure_ai_search and how hybrid mode fuses its two rankings
+SEARCH_MODES = ("vector", "lexical", "hybrid")
+FUSION_METHODS = ("rrf", "weighted")
+# Candidates taken from each ranking before fusing them
+HYBRID_CANDIDATES = int(os.getenv("HYBRID_CANDIDATES", "50"))
+# Candidates of the quantized coarse pass re-ranked against the float32 vectors
+QUANTIZED_CANDIDATES = int(os.getenv("QUANTIZED_CANDIDATES", "100"))
+# Metadata filters matching at most this many documents are searched exactly
+# (only those rows are scored) instead of through the IVF index
+FILTERED_EXACT_MAX = int(os.getenv("FILTERED_EXACT_MAX", "50000"))
+
+# Second-stage re-ranker ("terms" or module:name, see search.rerank); when set,
+# azure_ai_search re-ranks RERANK_CANDIDATES first-stage results by default
+RERANKER = os.getenv("RERANKER", "")
+reranker = load_reranker(RERANKER)
+RERANK_CANDIDATES = int(os.getenv("RERANK_CANDIDATES", "30"))
+# Weight of the first-stage score in the re-ranked score
+RERANK_ALPHA = float(os.getenv("RERANK_ALPHA", "0.3"))
+
+EMBEDDING_SECONDS = Histogram(
+    "search_embedding_seconds",
+    "Latency of embeddings API calls",
+    ["call"],
+    buckets=LATENCY_BUCKETS,
+)
+SCORING_SECONDS = Histogram(
+    "search_scoring_seconds",
+    "Latency of ranking the index for a request",
+    ["mode"],
+    buckets=LATENCY_BUCKETS,
+)
+CACHE_REQUESTS = Counter(
+    "search_cache_requests", "Cache lookups by cache and result", ["cache", "result"]
+)
+EMBEDDING_ERRORS = Counter("search_embedding_errors", "Failed embeddings API calls")
+
+
+@contextmanager
+def _embedding_call(call: str):
+    """Times an embeddings API call and counts its failures."""
+    try:
+        with EMBEDDING_SECONDS.labels(call=call).time():
+            yield
+    except Exception:
+        EMBEDDING_ERRORS.inc()
+        raise
+
 
 def get_embedding(query: str) -> list[float]:
     """Generates embedding for a query using Azure OpenAI.
+
+    Repeated queries are served from query_cache without an API call.
     
     Args:
         query: Text to generate embedding for
@@ -36,15 +136,49 @@ def get_embedding(query: str) -> list[float]:
     Returns:
         List of floats representing the embedding
     """
-    response = openai_client_async_max.embeddings.create(
-        model=AZURE_EMBEDDINGS_DEPLOYMENT,
-        input=query,
-    )
-    return response.data[0].embedding
+    embedding = query_cache.get(query)
+    CACHE_REQUESTS.labels(cache="query_embedding", result="miss" if embedding is None else "hit").inc()
+    if embedding is not None:
+        return embedding
+
+    with _embedding_call("single"):
+        response = openai_client_async_max.embeddings.create(
+            model=AZURE_EMBEDDINGS_DEPLOYMENT,
+            input=query,
+        )
+    embedding = response.data[0].embedding
+    query_cache.put(query, embedding)
+    return embedding
+
+
+async def aget_embedding(query: str) -> list[float]:
+    """Async version of get_embedding; doesn't block the event loop while waiting on Azure.
+
+    Args:
+        query: Text to generate embedding for
+
+    Returns:
+        List of floats representing the embedding
+    """
+    embedding = await query_cache.aget(query)
+    CACHE_REQUESTS.labels(cache="query_embedding", result="miss" if embedding is None else "hit").inc()
+    if embedding is not None:
+        return embedding
+
+    with _embedding_call("single"):
+        response = await async_openai_client.embeddings.create(
+            model=AZURE_EMBEDDINGS_DEPLOYMENT,
+            input=query,
+        )
+    embedding = response.data[0].embedding
+    await query_cache.aput_many([(query, embedding)])
+    return embedding
 
 
 def numpy_cosine_similarity(embedding1: list[float], embedding2: list[float]) -> float:
     """Calculates cosine similarity between two embeddings.
+
+    Reference implementation; searches use the vectorized search.scoring.
     
     Args:
         embedding1: First embedding
@@ -60,43 +194,440 @@ def numpy_cosine_similarity(embedding1: list[float], embedding2: list[float]) ->
 
 mcp = FastMCP("AzureSearchMCP")
 
-@mcp.tool()
-def azure_ai_search(query: str, top_k: int = 3) -> list[dict]:
-    """Searches documents in an index that simulates Azure AI Search.
+async def aget_embeddings(queries: list[str]) -> list[list[float]]:
+    """Embeds several queries, sending the uncached ones in a single API call.
+
+    Args:
+        queries: Texts to generate embeddings for
+
+    Returns:
+        One embedding per query, in input order
+    """
+    embeddings = {query: await query_cache.aget(query) for query in queries}
+    missing = [query for query, embedding in embeddings.items() if embedding is None]
+    CACHE_REQUESTS.labels(cache="query_embedding", result="hit").inc(len(embeddings) - len(missing))
+    CACHE_REQUESTS.labels(cache="query_embedding", result="miss").inc(len(missing))
+    if missing:
+        with _embedding_call("batch"):
+            response = await async_openai_client.embeddings.create(
+                model=AZURE_EMBEDDINGS_DEPLOYMENT,
+                input=missing,
+            )
+        for item in response.data:
+            embeddings[missing[item.index]] = item.embedding
+        await query_cache.aput_many([(query, embeddings[query]) for query in missing])
+    return [embeddings[query] for query in queries]
+
+
+def _to_results(store, indices: np.ndarray, scores: np.ndarray) -> list[dict]:
+    return [
+        {
+            "id": store.ids[i],
+            "score": float(score),
+            "chunk": store.chunks[i],
+        }
+        for i, score in zip(indices.tolist(), scores.tolist(), strict=True)
+    ]
+
+
+def _filter_mask(store, filters: Optional[dict]) -> Optional[np.ndarray]:
+    """Documents matching a metadata filter, or None when there is no filter."""
+    if not filters:
+        return None
+    if store.metadata is None:
+        # Nothing has metadata, so nothing can match
+        return np.zeros(len(store), dtype=bool)
+    return store.metadata.mask(filters)
+
+
+def _vector_mode(store, nprobe: int, mask: Optional[np.ndarray] = None) -> str:
+    """Vector search used for a request: IVF if asked for, else the quantized coarse pass.
+
+    A selective filter is cheaper to search exactly, and IVF could miss its
+    few matches outside the probed clusters.
+    """
+    if mask is not None and mask.sum() <= FILTERED_EXACT_MAX:
+        return "exact"
+    if nprobe > 0 and store.ivf is not None:
+        return "ivf"
+    if store.quantized is not None:
+        return "quantized"
+    return "exact"
+
+
+def _vector_top_k(
+    store,
+    query_embedding,
+    top_k: int,
+    mode: str,
+    nprobe: int = 0,
+    mask: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    if mode == "ivf":
+        return store.ivf.search(store.embeddings, query_embedding, top_k, nprobe, mask)
+    if mode == "quantized":
+        # Only the candidates of the coarse pass are read from the float32 matrix
+        candidates = max(top_k, QUANTIZED_CANDIDATES)
+        return store.quantized.search(
+            store.embeddings, query_embedding, top_k, candidates, mask
+        )
+    return cosine_top_k(store.embeddings, query_embedding, top_k, mask)
+
+
+def score_query(
+    query_embedding: list[float],
+    top_k: int = 3,
+    nprobe: int = 0,
+    filters: Optional[dict] = None,
+) -> list[dict]:
+    """Ranks the resident index against a query embedding (CPU-bound).
     
     Args:
-        query: Search text
-        top_k: Number of results to return (default: 3)
+        query_embedding: Embedding of the search text
+        top_k: Number of results to return
+        nprobe: Clusters visited by the IVF index; 0 or no IVF index means a
+            quantized coarse pass with exact re-ranking if a quantized index
+            is built, exact search otherwise
+        filters: Metadata filter; only matching documents are scored
         
     Returns:
         List of dictionaries with {id, score, chunk}
     """
-    with open(SEARCH_FILENAME, "r", encoding="utf-8") as f:
-        index = json.load(f)
+    store = search_index.get()
+    mask = _filter_mask(store, filters)
+    mode = _vector_mode(store, nprobe, mask)
+
+    with SCORING_SECONDS.labels(mode=mode).time():
+        indices, scores = _vector_top_k(store, query_embedding, top_k, mode, nprobe, mask)
+    return _to_results(store, indices, scores)
+
+
+def score_lexical(query: str, top_k: int = 3, filters: Optional[dict] = None) -> list[dict]:
+    """Ranks the resident index against a query with BM25 (CPU-bound, no embedding).
 
-    query_embedding = get_embedding(query)
+    Args:
+        query: Search text
+        top_k: Number of results to return
+        filters: Metadata filter; only matching documents are returned
+
+    Returns:
+        List of dictionaries with {id, score, chunk}; documents sharing no
+        term with the query are never returned
+    """
+    store = search_index.get()
+    if store.bm25 is None:
+        raise ValueError("No BM25 index for this store; run: python -m search.bm25 <index>")
+
+    mask = _filter_mask(store, filters)
+    with SCORING_SECONDS.labels(mode="bm25").time():
+        indices, scores = store.bm25.search(query, top_k, mask)
+    return _to_results(store, indices, scores)
+
+
+def score_hybrid(
+    query: str,
+    query_embedding: list[float],
+    top_k: int = 3,
+    nprobe: int = 0,
+    fusion: str = "rrf",
+    alpha: float = 0.5,
+    filters: Optional[dict] = None,
+) -> list[dict]:
+    """Fuses the vector and BM25 rankings of a query (CPU-bound).
+
+    Args:
+        query: Search text
+        query_embedding: Embedding of the search text
+        top_k: Number of results to return
+        nprobe: Clusters visited by the IVF index; 0 or no IVF index means
+            the quantized or exact search of score_query
+        fusion: "rrf" (reciprocal rank fusion) or "weighted" (sum of min-max
+            normalized scores)
+        alpha: Weight of the vector ranking with "weighted" fusion; BM25 gets 1 - alpha
+        filters: Metadata filter applied to both rankings before scoring
+
+    Returns:
+        List of dictionaries with {id, score, chunk}, score being the fused score
+    """
+    store = search_index.get()
+    if store.bm25 is None:
+        raise ValueError("No BM25 index for this store; run: python -m search.bm25 <index>")
 
-    results = []
-    for doc in index:
-        similarity = numpy_cosine_similarity(
-            query_embedding, doc.get("embedding")
+    depth = max(top_k, HYBRID_CANDIDATES)
+    mask = _filter_mask(store, filters)
+    with SCORING_SECONDS.labels(mode="hybrid").time():
+        vector = _vector_top_k(
+            store, query_embedding, depth, _vector_mode(store, nprobe, mask), nprobe, mask
         )
-        results.append(
-            {
-                "id": doc.get("id"),
-                "score": float(similarity),
-                "chunk": doc.get("chunk"),
-            }
+        lexical = store.bm25.search(query, depth, mask)
+
+        rankings = [
+            list(zip(indices.tolist(), scores.tolist(), strict=True))
+            for indices, scores in (vector, lexical)
+        ]
+        if fusion == "weighted":
+            fused = weighted_score_fusion(rankings, [alpha, 1.0 - alpha])
+        else:
+            fused = reciprocal_rank_fusion([[index for index, _ in ranking] for ranking in rankings])
+    fused = fused[:top_k]
+    return _to_results(
+        store,
+        np.array([index for index, _ in fused], dtype=np.intp),
+        np.array([score for _, score in fused], dtype=np.float32),
+    )
+
+
+def rerank_results(query: str, results: list[dict], top_k: int = 3) -> list[dict]:
+    """Re-scores over-fetched results with the re-ranker and keeps the best top_k (CPU-bound).
+
+    Args:
+        query: Search text
+        results: First-stage results ({id, score, chunk})
+        top_k: Number of results to return
+
+    Returns:
+        List of dictionaries with {id, score, chunk}, score being the re-ranked score
+    """
+    # Without a configured re-ranker, an explicit request uses the built-in one
+    scorer = reranker or TermOverlapScorer()
+    with SCORING_SECONDS.labels(mode="rerank").time():
+        ranked = rerank_candidates(
+            query,
+            [result["chunk"] for result in results],
+            [result["score"] for result in results],
+            scorer,
+            top_k,
+            RERANK_ALPHA,
         )
+    return [{**results[position], "score": score} for position, score in ranked]
+
+
+def score_queries(
+    query_embeddings: list[list[float]],
+    top_k: int = 3,
+    nprobe: int = 0,
+    filters: Optional[dict] = None,
+) -> list[list[dict]]:
+    """Ranks the resident index against several query embeddings at once (CPU-bound).
+
+    Args:
+        query_embeddings: Embeddings of the search texts
+        top_k: Number of results to return per query
+        nprobe: Clusters visited by the IVF index; 0 or no IVF index means
+            the quantized or exact search of score_query
+        filters: Metadata filter shared by every query
+
+    Returns:
+        One list of {id, score, chunk} dictionaries per query
+    """
+    store = search_index.get()
+    mask = _filter_mask(store, filters)
+    mode = _vector_mode(store, nprobe, mask)
+
+    if mode != "exact":
+        with SCORING_SECONDS.labels(mode=f"{mode}_batch").time():
+            ranked = [
+                _vector_top_k(store, embedding, top_k, mode, nprobe, mask)
+                for embedding in query_embeddings
+            ]
+    else:
+        with SCORING_SECONDS.labels(mode="exact_batch").time():
+            ranked = cosine_top_k_batch(store.embeddings, query_embeddings, top_k, mask)
+    return [_to_results(store, indices, scores) for indices, scores in ranked]
+
 
-    results.sort(key=lambda x: x["score"], reverse=True)
-    returning_results = results[:top_k]
+@mcp.tool()
+async def azure_ai_search(
+    query: str,
+    top_k: int = 3,
+    nprobe: int = 0,
+    mode: str = "vector",
+    fusion: str = "rrf",
+    alpha: float = 0.5,
+    filters: Optional[dict[str, Any]] = None,
+    rerank: Optional[bool] = None,
+) -> list[dict]:
+    """Searches documents in an index that simulates Azure AI Search.
+
+    The embedding request is awaited and scoring runs in a worker thread
+    (numpy releases the GIL), so one server process serves many concurrent searches.
+
+    Args:
+        query: Search text
+        top_k: Number of results to return (default: 3)
+        nprobe: Clusters visited by the IVF index; 0 (default) or no IVF
+            index built means a scan of every document (of their quantized
+            codes, re-ranked exactly, if a quantized index is built)
+        mode: "vector" (embedding similarity, default), "lexical" (BM25
+            keyword match, no embedding call; best for exact identifiers such
+            as library names or error codes) or "hybrid" (both, fused)
+        fusion: How hybrid mode fuses the rankings: "rrf" (reciprocal rank
+            fusion, default) or "weighted" (normalized score sum)
+        alpha: Weight of the vector ranking with "weighted" fusion (0 to 1)
+        filters: Only search documents whose metadata matches, e.g.
+            {"language": "python", "tags": ["async", "http"]}; a list matches
+            any of its values and all fields must match
+        rerank: Over-fetch RERANK_CANDIDATES results and keep the top_k best
+            according to the re-ranker; defaults to whether RERANKER is set
 
-    for result in returning_results:
-        print(f"[{result['id']}] Score: {result['score']:.4f}")
+    Returns:
+        List of dictionaries with {id, score, chunk}
+    """
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"mode must be one of {', '.join(SEARCH_MODES)}")
+    if fusion not in FUSION_METHODS:
+        raise ValueError(f"fusion must be one of {', '.join(FUSION_METHODS)}")
+    if not 0.0 <= alpha <= 1.0:
+        raise ValueError("alpha must be between 0 and 1")
+
+    if rerank is None:
+        rerank = reranker is not None
+    depth = max(top_k, RERANK_CANDIDATES) if rerank else top_k
+
+    if mode == "lexical":
+        returning_results = await asyncio.to_thread(score_lexical, query, depth, filters)
+    else:
+        query_embedding = await aget_embedding(query)
+        if mode == "hybrid":
+            returning_results = await asyncio.to_thread(
+                score_hybrid, query, query_embedding, depth, nprobe, fusion, alpha, filters
+            )
+        else:
+            returning_results = await asyncio.to_thread(
+                score_query, query_embedding, depth, nprobe, filters
+            )
+    if rerank:
+        returning_results = await asyncio.to_thread(
+            rerank_results, query, returning_results, top_k
+        )
 
     return returning_results
 
+
+@mcp.tool()
+async def azure_ai_search_batch(
+    queries: list[str],
+    top_k: int = 3,
+    fuse: bool = False,
+    nprobe: int = 0,
+    filters: Optional[dict[str, Any]] = None,
+) -> dict:
+    """Searches several queries (e.g. rephrasings of one question) in one call.
+
+    Queries are embedded in a single API request and scored with a single
+    matrix-matrix product.
+
+    Args:
+        queries: Search texts
+        top_k: Number of results to return per query (default: 3)
+        fuse: Also return one ranking fused with reciprocal rank fusion
+        nprobe: Clusters visited by the IVF index; 0 (default) means exact search
+        filters: Metadata filter shared by every query (see azure_ai_search)
+
+    Returns:
+        Dictionary with "results" (one list of {id, score, chunk} per query)
+        and, if fuse is set, "fused" (top_k {id, score, chunk} by RRF score)
+    """
+    if not queries:
+        return {"results": []}
+
+    query_embeddings = await aget_embeddings(queries)
+    results = await asyncio.to_thread(score_queries, query_embeddings, top_k, nprobe, filters)
+    response: dict = {"results": results}
+
+    if fuse:
+        chunks = {doc["id"]: doc["chunk"] for ranking in results for doc in ranking}
+        fused = reciprocal_rank_fusion([[doc["id"] for doc in ranking] for ranking in results])
+        response["fused"] = [
+            {"id": doc_id, "score": score, "chunk": chunks[doc_id]}
+            for doc_id, score in fused[:top_k]
+        ]
+    return response
+
+
+async def _retrieve_for_cache(query: str, top_k: int) -> tuple[list[float], list[str], str]:
+    """Embedding, retrieved document ids and index fingerprint of a query."""
+    query_embedding = await aget_embedding(query)
+    results = await asyncio.to_thread(score_query, query_embedding, top_k)
+    return query_embedding, [result["id"] for result in results], search_index.get().fingerprint
+
+
+@mcp.tool()
+async def answer_cache_lookup(query: str, top_k: int = 3) -> dict:
+    """Looks up a previously produced answer to the same or a very similar question.
+
+    The answer is only returned if the documents retrieved for this query
+    are the ones it was produced from.
+
+    Args:
+        query: User question
+        top_k: Number of documents compared with the cached answer's
+
+    Returns:
+        {"hit": False} or {"hit": True, answer, query, similarity, match}
+    """
+    if answer_cache is None:
+        return {"hit": False}
+
+    query_embedding, doc_ids, fingerprint = await _retrieve_for_cache(query, top_k)
+    cached = await asyncio.to_thread(
+        answer_cache.lookup, query, query_embedding, doc_ids, fingerprint
+    )
+    CACHE_REQUESTS.labels(cache="answer", result="miss" if cached is None else "hit").inc()
+    if cached is None:
+        return {"hit": False}
+    return {"hit": True, **cached}
+
+
+@mcp.tool()
+async def answer_cache_store(query: str, answer: str, top_k: int = 3) -> dict:
+    """Stores the answer produced for a question.
+
+    Args:
+        query: User question
+        answer: Answer given by the agent
+        top_k: Number of retrieved documents the answer is tied to
+
+    Returns:
+        {"stored": bool}
+    """
+    if answer_cache is None:
+        return {"stored": False}
+
+    query_embedding, doc_ids, fingerprint = await _retrieve_for_cache(query, top_k)
+    await asyncio.to_thread(
+        answer_cache.put, query, query_embedding, answer, doc_ids, fingerprint
+    )
+    return {"stored": True}
+
+
+@mcp.tool()
+def search_stats() -> dict:
+    """Returns monitoring counters of the search server.
+
+    Returns:
+        Dictionary with the query embedding and answer cache counters
+    """
+    stats = {"query_embedding_cache": query_cache.stats()}
+    if answer_cache is not None:
+        stats["answer_cache"] = answer_cache.stats()
+    return stats
+
+@mcp.custom_route("/metrics", methods=["GET"])
+async def metrics_endpoint(request: Request) -> Response:
+    """Prometheus metrics (HTTP/SSE transports only)."""
+    return Response(generate_latest(), media_type=CONTENT_TYPE_LATEST)
+
 if __name__ == "__main__":
-    # Runs via stdio (ideal for local MCP clients)
-    mcp.run()
\ No newline at end of file
+    mcp_config = MCPConfig.from_env()
+    mcp_config.validate()
+
+    # Load (or build) the index once at startup so searches never pay for it
+    search_index.warm_up()
+
+    if mcp_config.transport == "stdio":
+        # Runs via stdio (ideal for local MCP clients)
+        mcp.run()
+    else:
+        # Long-running HTTP/SSE server shared by every worker (MCP_SERVER=http://host:port/mcp)
+        mcp.run(transport=mcp_config.transport, host=mcp_config.host, port=mcp_config.port)
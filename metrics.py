@@ -0,0 +1,12 @@
+"""Prometheus metrics settings shared by the API and the MCP server.
+
+Metrics are prometheus_client collectors in its default registry, served by
+the /metrics routes. Worker-side metrics go through the Temporal SDK meter
+instead (see worker.py), which exports them together with the SDK's own
+runtime metrics.
+"""
+
+# Seconds; covers cache hits (sub-millisecond) up to slow LLM calls
+LATENCY_BUCKETS = (
+    0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0,
+)
@@ -0,0 +1 @@
+"""Search engine components used by the MCP server."""
@@ -0,0 +1,202 @@
+"""Semantic cache of agent answers, keyed by query text and query embedding."""
+
+import json
+import re
+import sqlite3
+import threading
+import time
+from typing import Optional
+
+import numpy as np
+
+from search.scoring import normalize_rows
+
+
+def normalize_query(query: str) -> str:
+    """Case-, whitespace- and trailing-punctuation-insensitive form of a query."""
+    return re.sub(r"\s+", " ", query).strip().lower().rstrip("?!. ")
+
+
+class AnswerCache:
+    """SQLite store of answers looked up by exact query, then by nearest neighbour.
+
+    Each answer is stored with the ids of the documents retrieved for its
+    query and the fingerprint of the index it was produced from. A cached
+    answer is only returned when the documents retrieved for the new query
+    are the same, and entries of another index (a rebuilt one) are dropped.
+    Embeddings of the live entries are kept in memory for the neighbour search.
+    """
+
+    def __init__(self, path: str, ttl: float = 86400.0, threshold: float = 0.95):
+        self.path = path
+        self.ttl = ttl
+        self.threshold = threshold
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS answers ("
+            " normalized TEXT PRIMARY KEY,"
+            " query TEXT NOT NULL,"
+            " embedding BLOB NOT NULL,"
+            " answer TEXT NOT NULL,"
+            " doc_ids TEXT NOT NULL,"
+            " fingerprint TEXT NOT NULL,"
+            " created_at REAL NOT NULL)"
+        )
+        self._conn.commit()
+        self._fingerprint: Optional[str] = None
+        self._keys: list[str] = []
+        self._matrix: Optional[np.ndarray] = None
+        # (row count, max rowid) of the table when _matrix was loaded
+        self._matrix_version: Optional[tuple] = None
+        self.exact_hits = 0
+        self.semantic_hits = 0
+        self.rejected = 0
+        self.misses = 0
+        self.invalidated = 0
+
+    def _use_index(self, fingerprint: str) -> None:
+        """Drops entries produced from any other index. Caller holds the lock."""
+        if fingerprint == self._fingerprint:
+            return
+        cursor = self._conn.execute("DELETE FROM answers WHERE fingerprint != ?", [fingerprint])
+        self._conn.commit()
+        self.invalidated += cursor.rowcount
+        self._fingerprint = fingerprint
+        self._matrix = None
+
+    def _load_matrix(self) -> np.ndarray:
+        """Embeddings of the live entries, one row per key. Caller holds the lock.
+
+        Reloaded whenever rows were added or removed, by this or another process.
+        """
+        version = self._conn.execute("SELECT COUNT(*), MAX(rowid) FROM answers").fetchone()
+        if self._matrix is None or version != self._matrix_version:
+            self._matrix_version = version
+            rows = self._conn.execute(
+                "SELECT normalized, embedding FROM answers WHERE created_at >= ?",
+                [time.time() - self.ttl],
+            ).fetchall()
+            self._keys = [key for key, _ in rows]
+            vectors = [np.frombuffer(blob, dtype=np.float32) for _, blob in rows]
+            self._matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+        return self._matrix
+
+    def lookup(
+        self, query: str, embedding: list[float], doc_ids: list[str], fingerprint: str
+    ) -> Optional[dict]:
+        """Finds a cached answer for a query.
+
+        Args:
+            query: Query text
+            embedding: Embedding of the query
+            doc_ids: Ids of the documents retrieved for the query
+            fingerprint: Fingerprint of the index the documents come from
+
+        Returns:
+            {answer, query, similarity, match} with match "exact" or
+            "semantic", or None when there is no usable answer
+        """
+        normalized = normalize_query(query)
+        with self._lock:
+            self._use_index(fingerprint)
+            min_created_at = time.time() - self.ttl
+            row = self._conn.execute(
+                "SELECT query, answer, doc_ids FROM answers"
+                " WHERE normalized = ? AND created_at >= ?",
+                [normalized, min_created_at],
+            ).fetchone()
+            similarity = 1.0
+            match = "exact"
+
+            if row is None:
+                matrix = self._load_matrix()
+                if matrix.size == 0:
+                    self.misses += 1
+                    return None
+                query_vector = normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+                scores = matrix @ query_vector
+                best = int(np.argmax(scores))
+                similarity = float(scores[best])
+                if similarity >= self.threshold:
+                    row = self._conn.execute(
+                        "SELECT query, answer, doc_ids FROM answers"
+                        " WHERE normalized = ? AND created_at >= ?",
+                        [self._keys[best], min_created_at],
+                    ).fetchone()
+                if row is None:
+                    self.misses += 1
+                    return None
+                match = "semantic"
+
+            cached_query, answer, cached_doc_ids = row
+            if set(json.loads(cached_doc_ids)) != set(doc_ids):
+                self.rejected += 1
+                return None
+            if match == "exact":
+                self.exact_hits += 1
+            else:
+                self.semantic_hits += 1
+        return {"answer": answer, "query": cached_query, "similarity": similarity, "match": match}
+
+    def put(
+        self,
+        query: str,
+        embedding: list[float],
+        answer: str,
+        doc_ids: list[str],
+        fingerprint: str,
+    ) -> None:
+        """Stores the answer produced for a query."""
+        vector = normalize_rows(np.asarray([embedding], dtype=np.float32))[0]
+        with self._lock:
+            self._use_index(fingerprint)
+            self._conn.execute(
+                "DELETE FROM answers WHERE created_at < ?", [time.time() - self.ttl]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO answers"
+                " (normalized, query, embedding, answer, doc_ids, fingerprint, created_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?)",
+                [
+                    normalize_query(query),
+                    query,
+                    vector.tobytes(),
+                    answer,
+                    json.dumps(list(doc_ids)),
+                    fingerprint,
+                    time.time(),
+                ],
+            )
+            self._conn.commit()
+            self._matrix = None
+
+    def clear(self) -> None:
+        with self._lock:
+            cursor = self._conn.execute("DELETE FROM answers")
+            self._conn.commit()
+            self.invalidated += cursor.rowcount
+            self._matrix = None
+
+    def stats(self) -> dict:
+        with self._lock:
+            size = self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+        hits = self.exact_hits + self.semantic_hits
+        lookups = hits + self.rejected + self.misses
+        return {
+            "size": size,
+            "exact_hits": self.exact_hits,
+            "semantic_hits": self.semantic_hits,
+            "rejected": self.rejected,
+            "misses": self.misses,
+            "invalidated": self.invalidated,
+            "hit_rate": hits / lookups if lookups else 0.0,
+        }
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM answers").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
@@ -0,0 +1,249 @@
+"""BM25 inverted index over the document chunks (lexical search).
+
+Postings are stored CSR-style per term, each with its precomputed BM25
+weight, so a query only sums the weights of the postings of its terms and
+never touches documents that share no term with it. The index is built
+by the vector store writer from the chunks streamed through it; rebuild it
+explicitly (e.g. with other k1/b) with:
+
+    python -m search.bm25 database/search_index.json
+"""
+
+import argparse
+import re
+from array import array
+from collections import Counter
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Iterable, Optional
+
+import numpy as np
+
+from search.scoring import top_k_indices
+
+BM25_SUFFIX = ".bm25.npz"
+_TOKEN = re.compile(r"\w+")
+# Above n_docs / ratio matching postings, scores accumulate in a dense array
+DENSE_ACCUMULATION_RATIO = 16
+
+
+def bm25_path(source: str) -> Path:
+    """Returns the BM25 file that belongs to a JSON search index."""
+    base = Path(source).with_suffix("")
+    return base.with_name(base.name + BM25_SUFFIX)
+
+
+def tokenize(text: str) -> list[str]:
+    """Lowercased word tokens; identifiers such as error codes stay whole."""
+    return _TOKEN.findall((text or "").lower())
+
+
+@dataclass
+class BM25Index:
+    """Vocabulary plus postings (document, BM25 weight) grouped by term."""
+
+    terms: list[str]
+    offsets: np.ndarray
+    doc_indices: np.ndarray
+    weights: np.ndarray
+    n_docs: int
+    store_fingerprint: str = ""
+    _term_ids: dict = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._term_ids = {term: i for i, term in enumerate(self.terms)}
+
+    @property
+    def n_terms(self) -> int:
+        return len(self.terms)
+
+    @classmethod
+    def build(
+        cls,
+        chunks: Iterable[str],
+        k1: float = 1.2,
+        b: float = 0.75,
+        store_fingerprint: str = "",
+    ) -> "BM25Index":
+        """Tokenizes the chunks and precomputes the BM25 weight of every posting.
+
+        Args:
+            chunks: Document texts, in store order
+            k1: Term frequency saturation
+            b: Document length normalization
+            store_fingerprint: Fingerprint of the vector store being indexed
+
+        Returns:
+            The built BM25Index
+        """
+        builder = BM25Builder()
+        builder.add(chunks)
+        return builder.build(k1=k1, b=b, store_fingerprint=store_fingerprint)
+
+    def save(self, source: str) -> None:
+        """Persists the index next to the JSON search index."""
+        path = bm25_path(source)
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            terms=np.array(self.terms, dtype=str),
+            offsets=self.offsets,
+            doc_indices=self.doc_indices,
+            weights=self.weights,
+            n_docs=np.array(self.n_docs),
+            store_fingerprint=np.array(self.store_fingerprint),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, source: str) -> Optional["BM25Index"]:
+        """Loads the index of a JSON search index, or None if it was never built."""
+        path = bm25_path(source)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                terms=data["terms"].tolist(),
+                offsets=data["offsets"],
+                doc_indices=data["doc_indices"],
+                weights=data["weights"],
+                n_docs=int(data["n_docs"]),
+                store_fingerprint=str(data["store_fingerprint"]),
+            )
+
+    def search(
+        self, query: str, top_k: int, mask: Optional[np.ndarray] = None
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Ranks the documents sharing at least one term with the query.
+
+        Args:
+            query: Query text
+            top_k: Number of results to keep
+            mask: Optional boolean filter over the documents
+
+        Returns:
+            Tuple (indices, scores) ordered by decreasing BM25 score
+        """
+        ids = {self._term_ids[term] for term in tokenize(query) if term in self._term_ids}
+        if not ids:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        spans = [slice(self.offsets[i], self.offsets[i + 1]) for i in sorted(ids)]
+        n_postings = sum(span.stop - span.start for span in spans)
+
+        if n_postings * DENSE_ACCUMULATION_RATIO >= self.n_docs:
+            # Common terms: one pass per term over a dense score array
+            # (a document appears at most once in a term's postings)
+            scores = np.zeros(self.n_docs, dtype=np.float32)
+            for span in spans:
+                scores[self.doc_indices[span]] += self.weights[span]
+            candidates = np.flatnonzero(scores)
+            scores = scores[candidates]
+        else:
+            # Rare terms: sum per matching document only, never touching the corpus
+            docs = np.concatenate([self.doc_indices[span] for span in spans])
+            weights = np.concatenate([self.weights[span] for span in spans])
+            candidates, inverse = np.unique(docs, return_inverse=True)
+            scores = np.bincount(inverse, weights=weights).astype(np.float32)
+        if mask is not None:
+            keep = mask[candidates]
+            candidates, scores = candidates[keep], scores[keep]
+        best = top_k_indices(scores, top_k)
+        return candidates[best].astype(np.intp), scores[best]
+
+
+class BM25Builder:
+    """Collects the postings of chunks added batch by batch, then builds a BM25Index.
+
+    Only the vocabulary and the postings (document, term, frequency: 12
+    bytes each) are kept, not the texts, so the vector store writer indexes
+    chunks as they stream by. Memory still grows with the number of
+    postings, i.e. with the corpus, like the index itself.
+    """
+
+    def __init__(self) -> None:
+        self._term_ids: dict[str, int] = {}
+        self._posting_terms = array("i")
+        self._posting_docs = array("i")
+        self._posting_tfs = array("f")
+        self._doc_lengths = array("f")
+
+    def add(self, chunks: Iterable[str]) -> None:
+        """Adds the next documents, in store order."""
+        for chunk in chunks:
+            doc = len(self._doc_lengths)
+            tokens = tokenize(chunk)
+            self._doc_lengths.append(len(tokens))
+            for term, tf in Counter(tokens).items():
+                self._posting_terms.append(self._term_ids.setdefault(term, len(self._term_ids)))
+                self._posting_docs.append(doc)
+                self._posting_tfs.append(tf)
+
+    def build(
+        self, k1: float = 1.2, b: float = 0.75, store_fingerprint: str = ""
+    ) -> BM25Index:
+        """Precomputes the BM25 weight of every posting collected so far.
+
+        Args:
+            k1: Term frequency saturation
+            b: Document length normalization
+            store_fingerprint: Fingerprint of the vector store being indexed
+        """
+        n_docs = len(self._doc_lengths)
+        n_terms = len(self._term_ids)
+        terms_of_postings = np.frombuffer(self._posting_terms, dtype=np.int32)
+        docs = np.frombuffer(self._posting_docs, dtype=np.int32)
+        tfs = np.frombuffer(self._posting_tfs, dtype=np.float32)
+        lengths = np.frombuffer(self._doc_lengths, dtype=np.float32)
+
+        order = np.argsort(terms_of_postings, kind="stable")
+        df = np.bincount(terms_of_postings, minlength=n_terms)
+        offsets = np.zeros(n_terms + 1, dtype=np.int64)
+        np.cumsum(df, out=offsets[1:])
+
+        idf = np.log1p((n_docs - df + 0.5) / (df + 0.5)).astype(np.float32)
+        avg_length = float(lengths.mean()) if n_docs and lengths.mean() > 0 else 1.0
+        norm = k1 * (1.0 - b + b * lengths[docs] / avg_length)
+        weights = idf[terms_of_postings] * tfs * (k1 + 1.0) / (tfs + norm)
+
+        return BM25Index(
+            terms=list(self._term_ids),
+            offsets=offsets,
+            doc_indices=docs[order].astype(np.int32),
+            weights=weights[order].astype(np.float32),
+            n_docs=n_docs,
+            store_fingerprint=store_fingerprint,
+        )
+
+
+def build_bm25_index(source: str, k1: float = 1.2, b: float = 0.75) -> BM25Index:
+    """Builds and saves the BM25 index of the binary store of a search index.
+
+    Reads every chunk of the store into memory; the store writer builds the
+    index without holding the texts.
+    """
+    from search.vector_store import VectorStore
+
+    store = VectorStore.load(source)
+    index = BM25Index.build(store.chunks, k1=k1, b=b, store_fingerprint=store.fingerprint)
+    index.save(source)
+    return index
+
+
+def main() -> None:
+    """Builds the BM25 index of a search index."""
+    from search.vector_store import ResidentIndex
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="JSON search index (e.g. database/search_index.json)")
+    parser.add_argument("--k1", type=float, default=1.2, help="Term frequency saturation")
+    parser.add_argument("--b", type=float, default=0.75, help="Document length normalization")
+    args = parser.parse_args()
+
+    # Makes sure the binary store exists and is up to date
+    ResidentIndex(args.source).get()
+    index = build_bm25_index(args.source, k1=args.k1, b=args.b)
+    print(f"BM25 index with {index.n_terms} terms written to {bm25_path(args.source)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,113 @@
+"""Context packing: search results turned into a bounded, deduplicated context.
+
+Retrieved chunks are taken best first; chunks nearly identical to a better
+one (overlapping chunks of a document, copies of a page) are dropped, and
+chunks stop being added once a token budget is spent, the last one being
+truncated to fit. The kept chunks are numbered in that order ("ref"), which
+is how the model cites them, so prompt size (and LLM latency and cost)
+stays bounded whatever the search returns.
+
+Tokens are counted with tiktoken when it is installed; otherwise words and
+punctuation marks are counted, which slightly overestimates BPE tokens for
+English text.
+"""
+
+import re
+from functools import lru_cache
+from typing import Any, Optional
+
+from search.bm25 import tokenize
+
+_APPROXIMATE_TOKEN = re.compile(r"\w+|[^\w\s]")
+# Word n-grams compared by near-duplicate detection
+SHINGLE_SIZE = 3
+# A chunk cut below this many tokens isn't worth its citation
+MIN_TRUNCATED_TOKENS = 32
+
+
+@lru_cache(maxsize=None)
+def _encoding(name: str) -> Optional[Any]:
+    try:
+        import tiktoken
+
+        return tiktoken.get_encoding(name)
+    except Exception:
+        # Not installed, or its BPE file can't be downloaded
+        return None
+
+
+def count_tokens(text: str, encoding: str = "o200k_base") -> int:
+    """Number of tokens of text (estimated if tiktoken is unavailable)."""
+    codec = _encoding(encoding)
+    if codec is not None:
+        return len(codec.encode(text, disallowed_special=()))
+    return len(_APPROXIMATE_TOKEN.findall(text))
+
+
+def truncate_tokens(text: str, max_tokens: int, encoding: str = "o200k_base") -> str:
+    """Longest prefix of text having at most max_tokens tokens."""
+    codec = _encoding(encoding)
+    if codec is not None:
+        return codec.decode(codec.encode(text, disallowed_special=())[:max_tokens])
+    matches = _APPROXIMATE_TOKEN.finditer(text)
+    end = 0
+    for _, match in zip(range(max_tokens), matches, strict=False):
+        end = match.end()
+    return text[:end]
+
+
+def shingles(text: str, size: int = SHINGLE_SIZE) -> set[tuple[str, ...]]:
+    """Word n-grams of text (the words themselves for shorter texts)."""
+    words = tokenize(text)
+    if len(words) < size:
+        return {tuple(words)} if words else set()
+    return {tuple(words[i : i + size]) for i in range(len(words) - size + 1)}
+
+
+def jaccard(a: set, b: set) -> float:
+    if not a or not b:
+        return 0.0
+    return len(a & b) / len(a | b)
+
+
+def pack_context(
+    documents: list[dict],
+    token_budget: int,
+    dedup_threshold: float = 0.8,
+    encoding: str = "o200k_base",
+) -> list[dict]:
+    """Selects the search results handed to the model.
+
+    Args:
+        documents: Search results ({id, score, chunk, ...})
+        token_budget: Maximum number of chunk tokens kept in total
+        dedup_threshold: Chunks whose word 3-gram Jaccard similarity with a
+            better kept chunk reaches this are dropped
+        encoding: tiktoken encoding used to count tokens
+
+    Returns:
+        The kept results, best first, each with its citation number "ref"
+        (1-based) and its chunk possibly truncated to fit the budget
+    """
+    ordered = sorted(documents, key=lambda doc: doc.get("score", 0.0), reverse=True)
+    packed: list[dict] = []
+    kept_shingles: list[set] = []
+    remaining = token_budget
+    for doc in ordered:
+        chunk = doc["chunk"]
+        doc_shingles = shingles(chunk)
+        if any(jaccard(doc_shingles, kept) >= dedup_threshold for kept in kept_shingles):
+            continue
+        tokens = count_tokens(chunk, encoding)
+        if tokens > remaining:
+            if remaining < MIN_TRUNCATED_TOKENS:
+                # A shorter, lower ranked chunk may still fit
+                continue
+            chunk = truncate_tokens(chunk, remaining, encoding)
+            tokens = remaining
+        packed.append({**doc, "chunk": chunk, "ref": len(packed) + 1})
+        kept_shingles.append(doc_shingles)
+        remaining -= tokens
+        if remaining <= 0:
+            break
+    return packed
@@ -0,0 +1,102 @@
+"""Persistent embedding cache keyed by deployment and chunk content hash."""
+
+import hashlib
+import sqlite3
+import threading
+import time
+from typing import Iterable, Optional
+
+import numpy as np
+
+
+def text_hash(text: str) -> str:
+    """Returns the content hash used as cache key for a text."""
+    return hashlib.sha256(text.encode("utf-8")).hexdigest()
+
+
+class EmbeddingCache:
+    """SQLite store of float32 embeddings, keyed by (deployment, sha256(text)).
+
+    Embeddings depend on the model, so the deployment name is part of the key:
+    switching deployments never reuses vectors from another model. The file can
+    be shared by several processes; a connection is safe to use from threads.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS embeddings ("
+            " deployment TEXT NOT NULL,"
+            " text_hash TEXT NOT NULL,"
+            " vector BLOB NOT NULL,"
+            " created_at REAL NOT NULL,"
+            " PRIMARY KEY (deployment, text_hash))"
+        )
+        self._conn.commit()
+
+    def get_many(
+        self, deployment: str, texts: Iterable[str], max_age: Optional[float] = None
+    ) -> dict[str, list[float]]:
+        """Looks up several texts at once.
+
+        Args:
+            deployment: Embeddings deployment name
+            texts: Texts to look up
+            max_age: Ignore entries older than this many seconds
+
+        Returns:
+            Embeddings found, keyed by text (missing texts are absent)
+        """
+        by_hash: dict[str, list[str]] = {}
+        for text in texts:
+            by_hash.setdefault(text_hash(text), []).append(text)
+
+        found: dict[str, list[float]] = {}
+        hashes = list(by_hash)
+        min_created_at = time.time() - max_age if max_age is not None else 0.0
+        # Stay below SQLite's bound-parameter limit
+        for start in range(0, len(hashes), 500):
+            batch = hashes[start : start + 500]
+            with self._lock:
+                rows = self._conn.execute(
+                    "SELECT text_hash, vector FROM embeddings"
+                    " WHERE deployment = ? AND created_at >= ?"
+                    f" AND text_hash IN ({','.join('?' * len(batch))})",
+                    [deployment, min_created_at, *batch],
+                ).fetchall()
+            for key, vector in rows:
+                embedding = np.frombuffer(vector, dtype=np.float32).tolist()
+                for text in by_hash[key]:
+                    found[text] = embedding
+        return found
+
+    def get(
+        self, deployment: str, text: str, max_age: Optional[float] = None
+    ) -> Optional[list[float]]:
+        """Looks up a single text."""
+        return self.get_many(deployment, [text], max_age=max_age).get(text)
+
+    def put_many(self, deployment: str, items: Iterable[tuple[str, list[float]]]) -> None:
+        """Stores (text, embedding) pairs."""
+        now = time.time()
+        rows = [
+            (deployment, text_hash(text), np.asarray(embedding, dtype=np.float32).tobytes(), now)
+            for text, embedding in items
+        ]
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR REPLACE INTO embeddings (deployment, text_hash, vector, created_at)"
+                " VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            self._conn.commit()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM embeddings").fetchone()[0]
+
+    def close(self) -> None:
+        self._conn.close()
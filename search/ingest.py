@@ -0,0 +1,165 @@
+"""Streaming readers/writers for document files (JSON arrays or JSONL).
+
+Documents are processed one at a time, so memory stays bounded by the batch
+size instead of the size of the corpus.
+"""
+
+import json
+import os
+import stat
+import tempfile
+from itertools import islice
+from pathlib import Path
+from typing import Any, Iterable, Iterator, TextIO
+
+READ_CHUNK_SIZE = 1 << 20
+
+
+def iter_json_array(f: TextIO, chunk_size: int = READ_CHUNK_SIZE) -> Iterator[Any]:
+    """Yields the items of a top-level JSON array without loading the whole file.
+
+    Args:
+        f: Text file positioned at the start of the array
+        chunk_size: Characters read from the file at a time
+
+    Returns:
+        Iterator over the decoded items
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    pos = 0
+    eof = False
+
+    def read_more() -> None:
+        nonlocal buffer, pos, eof
+        chunk = f.read(chunk_size)
+        eof = not chunk
+        buffer, pos = buffer[pos:] + chunk, 0
+
+    def skip_whitespace() -> bool:
+        """Moves to the next significant character; False at end of input."""
+        nonlocal pos
+        while True:
+            while pos < len(buffer) and buffer[pos].isspace():
+                pos += 1
+            if pos < len(buffer):
+                return True
+            if eof:
+                return False
+            read_more()
+
+    if not skip_whitespace() or buffer[pos] != "[":
+        raise ValueError("Expected a JSON array")
+    pos += 1
+
+    first = True
+    while True:
+        if not skip_whitespace():
+            raise ValueError("Unterminated JSON array")
+        if buffer[pos] == "]":
+            return
+        if not first:
+            if buffer[pos] != ",":
+                raise ValueError(f"Expected ',' in JSON array, got {buffer[pos]!r}")
+            pos += 1
+            if not skip_whitespace():
+                raise ValueError("Unterminated JSON array")
+
+        while True:
+            try:
+                item, end = decoder.raw_decode(buffer, pos)
+            except json.JSONDecodeError:
+                if eof:
+                    raise
+                read_more()
+                continue
+            # A number at the end of the buffer may continue in the next chunk
+            if end == len(buffer) and not eof:
+                read_more()
+                continue
+            break
+
+        yield item
+        pos = end
+        first = False
+
+
+def iter_documents(path: str) -> Iterator[dict]:
+    """Streams documents from a JSON array file or a JSONL file (by extension)."""
+    with open(path, "r", encoding="utf-8") as f:
+        if Path(path).suffix == ".jsonl":
+            for line in f:
+                if line.strip():
+                    yield json.loads(line)
+        else:
+            yield from iter_json_array(f)
+
+
+def iter_batches(items: Iterable[Any], size: int) -> Iterator[list[Any]]:
+    """Groups an iterable into lists of at most `size` items."""
+    iterator = iter(items)
+    while batch := list(islice(iterator, size)):
+        yield batch
+
+
+class DocumentWriter:
+    """Writes documents incrementally as a JSON array or JSONL (by extension).
+
+    Documents go to a temporary file next to `path`, which replaces `path`
+    only when the writer is closed without error: until then, and after a
+    failed run, readers keep seeing the previous file.
+    """
+
+    def __init__(self, path: str):
+        self.path = path
+        self.jsonl = Path(path).suffix == ".jsonl"
+        self.count = 0
+        target = Path(path)
+        fd, self._tmp_path = tempfile.mkstemp(
+            dir=target.parent, prefix=f".{target.name}.", suffix=".tmp"
+        )
+        # mkstemp creates the file private to the user; keep the permissions of
+        # the file being replaced (reading the umask would change it process-wide)
+        try:
+            mode = stat.S_IMODE(os.stat(path).st_mode)
+        except FileNotFoundError:
+            mode = 0o644
+        os.chmod(self._tmp_path, mode)
+        self._f = os.fdopen(fd, "w", encoding="utf-8")
+        self._finished = False
+        if not self.jsonl:
+            self._f.write("[")
+
+    def write(self, document: dict) -> None:
+        if self.jsonl:
+            self._f.write(json.dumps(document) + "\n")
+        else:
+            self._f.write((", " if self.count else "") + json.dumps(document))
+        self.count += 1
+
+    def finish(self) -> str:
+        """Completes the temporary file, without swapping it in yet, and returns its path."""
+        if not self._finished:
+            if not self.jsonl:
+                self._f.write("]")
+            self._f.close()
+            self._finished = True
+        return self._tmp_path
+
+    def close(self) -> None:
+        """Completes the file and swaps it in place of `path`."""
+        os.replace(self.finish(), self.path)
+
+    def discard(self) -> None:
+        """Drops what was written, leaving `path` untouched."""
+        self._f.close()
+        Path(self._tmp_path).unlink(missing_ok=True)
+
+    def __enter__(self) -> "DocumentWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self.discard()
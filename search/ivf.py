@@ -0,0 +1,261 @@
+"""Inverted-file (IVF) approximate nearest neighbour index.
+
+Documents are clustered with spherical k-means; a query only scores the
+documents of its `nprobe` closest clusters. Build it offline with:
+
+    python -m search.ivf database/search_index.json --lists 1024
+
+and check the recall/latency trade-off against exact search with:
+
+    python -m search.ivf database/search_index.json --recall --nprobe 8 16 32
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from search.scoring import cosine_top_k, normalize_rows, top_k_indices
+
+IVF_SUFFIX = ".ivf.npz"
+_ASSIGN_BATCH = 65536
+
+
+def ivf_path(source: str) -> Path:
+    """Returns the IVF file that belongs to a JSON search index."""
+    base = Path(source).with_suffix("")
+    return base.with_name(base.name + IVF_SUFFIX)
+
+
+def _assign(embeddings: np.ndarray, centroids: np.ndarray) -> np.ndarray:
+    """Assigns every row to its most similar centroid, in bounded-memory batches."""
+    labels = np.empty(embeddings.shape[0], dtype=np.int32)
+    for start in range(0, embeddings.shape[0], _ASSIGN_BATCH):
+        batch = np.asarray(embeddings[start : start + _ASSIGN_BATCH], dtype=np.float32)
+        labels[start : start + len(batch)] = np.argmax(batch @ centroids.T, axis=1)
+    return labels
+
+
+def train_centroids(
+    embeddings: np.ndarray, n_lists: int, n_iter: int = 20, seed: int = 0
+) -> np.ndarray:
+    """Runs spherical k-means on (a sample of) normalized embeddings.
+
+    Args:
+        embeddings: (n, dim) matrix with unit-length rows
+        n_lists: Number of clusters
+        n_iter: Number of k-means iterations
+        seed: Random seed, so rebuilding the same corpus gives the same index
+
+    Returns:
+        (n_lists, dim) matrix of unit-length centroids
+    """
+    rng = np.random.default_rng(seed)
+    n = embeddings.shape[0]
+    sample_size = min(n, n_lists * 256)
+    sample = np.asarray(
+        embeddings[np.sort(rng.choice(n, size=sample_size, replace=False))],
+        dtype=np.float32,
+    )
+    centroids = sample[rng.choice(sample_size, size=n_lists, replace=False)].copy()
+
+    for _ in range(n_iter):
+        labels = _assign(sample, centroids)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        empty = ~np.bincount(labels, minlength=n_lists).astype(bool)
+        # Re-seed empty clusters so every list stays useful
+        sums[empty] = sample[rng.choice(sample_size, size=int(empty.sum()))]
+        centroids = normalize_rows(sums)
+    return centroids
+
+
+@dataclass
+class IVFIndex:
+    """Centroids plus documents grouped by cluster (CSR-style offsets)."""
+
+    centroids: np.ndarray
+    offsets: np.ndarray
+    doc_indices: np.ndarray
+    store_fingerprint: str = ""
+
+    @property
+    def n_lists(self) -> int:
+        return int(self.centroids.shape[0])
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        n_lists: Optional[int] = None,
+        n_iter: int = 20,
+        store_fingerprint: str = "",
+    ) -> "IVFIndex":
+        """Clusters normalized embeddings into an inverted file.
+
+        Args:
+            embeddings: (n, dim) matrix with unit-length rows
+            n_lists: Number of clusters (default: sqrt(n))
+            n_iter: Number of k-means iterations
+            store_fingerprint: Fingerprint of the vector store being indexed
+
+        Returns:
+            The built IVFIndex
+        """
+        n = embeddings.shape[0]
+        n_lists = min(n, n_lists or max(1, int(np.sqrt(n))))
+        centroids = train_centroids(embeddings, n_lists, n_iter=n_iter)
+        labels = _assign(embeddings, centroids)
+        doc_indices = np.argsort(labels, kind="stable").astype(np.int64)
+        offsets = np.zeros(n_lists + 1, dtype=np.int64)
+        np.cumsum(np.bincount(labels, minlength=n_lists), out=offsets[1:])
+        return cls(centroids, offsets, doc_indices, store_fingerprint)
+
+    def save(self, source: str) -> None:
+        """Persists the index next to the JSON search index."""
+        path = ivf_path(source)
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        np.savez(
+            tmp_path,
+            centroids=self.centroids,
+            offsets=self.offsets,
+            doc_indices=self.doc_indices,
+            store_fingerprint=np.array(self.store_fingerprint),
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, source: str) -> Optional["IVFIndex"]:
+        """Loads the index of a JSON search index, or None if it was never built."""
+        path = ivf_path(source)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                centroids=data["centroids"],
+                offsets=data["offsets"],
+                doc_indices=data["doc_indices"],
+                store_fingerprint=str(data["store_fingerprint"]),
+            )
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query_embedding,
+        top_k: int,
+        nprobe: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Scores only the documents in the `nprobe` clusters closest to the query.
+
+        Args:
+            embeddings: (n, dim) matrix with unit-length rows the index was built from
+            query_embedding: Query embedding
+            top_k: Number of results to keep
+            nprobe: Number of clusters to visit; higher is slower but more accurate
+            mask: Optional boolean filter over the documents, applied before scoring
+
+        Returns:
+            Tuple (indices, scores) ordered by decreasing similarity
+        """
+        query = normalize_rows(query_embedding)
+        lists = top_k_indices(self.centroids @ query, max(1, nprobe))
+        candidates = np.concatenate(
+            [self.doc_indices[self.offsets[i] : self.offsets[i + 1]] for i in lists]
+        )
+        if mask is not None:
+            candidates = candidates[mask[candidates]]
+        if candidates.size == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        candidates.sort()  # sequential reads from the memory-mapped matrix
+        scores = embeddings[candidates] @ query
+        best = top_k_indices(scores, top_k)
+        return candidates[best], scores[best]
+
+
+def recall_at_k(
+    index: IVFIndex,
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    nprobe: int,
+) -> float:
+    """Measures the fraction of exact top_k results the IVF search also returns.
+
+    Args:
+        index: IVF index built over embeddings
+        embeddings: (n, dim) matrix with unit-length rows
+        queries: (q, dim) matrix of query embeddings
+        top_k: Number of results per query
+        nprobe: Number of clusters to visit
+
+    Returns:
+        Mean recall@k over the queries, between 0 and 1
+    """
+    hits = 0
+    expected_total = 0
+    for query in queries:
+        exact, _ = cosine_top_k(embeddings, query, top_k)
+        approx, _ = index.search(embeddings, query, top_k, nprobe)
+        hits += len(set(exact.tolist()) & set(approx.tolist()))
+        expected_total += len(exact)
+    return hits / expected_total if expected_total else 1.0
+
+
+def main() -> None:
+    """Builds the IVF index of a search index, or reports its recall."""
+    from search.vector_store import ResidentIndex
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="JSON search index (e.g. database/search_index.json)")
+    parser.add_argument("--lists", type=int, default=None, help="Number of clusters")
+    parser.add_argument("--iterations", type=int, default=20, help="k-means iterations")
+    parser.add_argument("--recall", action="store_true", help="Report recall instead of building")
+    parser.add_argument("--nprobe", type=int, nargs="+", default=[1, 4, 16])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    store = ResidentIndex(args.source).get()
+
+    if not args.recall:
+        index = IVFIndex.build(
+            store.embeddings,
+            n_lists=args.lists,
+            n_iter=args.iterations,
+            store_fingerprint=store.fingerprint,
+        )
+        index.save(args.source)
+        print(f"IVF index with {index.n_lists} lists written to {ivf_path(args.source)}")
+        return
+
+    # The store only attaches an index built from its current embeddings
+    index = store.ivf
+    if index is None:
+        if ivf_path(args.source).exists():
+            raise SystemExit(
+                f"IVF index at {ivf_path(args.source)} is stale (built for another"
+                " version of the store); rebuild it by running without --recall"
+            )
+        raise SystemExit("IVF index not built yet; run without --recall first")
+
+    # Perturbed documents stand in for real queries
+    rng = np.random.default_rng(1)
+    sample = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+    queries = np.asarray(store.embeddings[np.sort(sample)])
+    queries = normalize_rows(queries + rng.normal(scale=0.01, size=queries.shape))
+
+    for nprobe in args.nprobe:
+        recall = recall_at_k(index, store.embeddings, queries, args.top_k, nprobe)
+        start = time.perf_counter()
+        for query in queries:
+            index.search(store.embeddings, query, args.top_k, nprobe)
+        elapsed = (time.perf_counter() - start) / len(queries)
+        print(f"nprobe={nprobe:<5} recall@{args.top_k}={recall:.3f}  {elapsed * 1000:.3f} ms/query")
+
+
+if __name__ == "__main__":
+    main()
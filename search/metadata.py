@@ -0,0 +1,177 @@
+"""Columnar per-document metadata (source, language, version, tags, ...) for filtering.
+
+Every field is stored as a dictionary-encoded column: the distinct values
+of the field, plus one (document, value code) entry per value a document
+has (several for list fields such as tags). A filter is evaluated on these
+integer arrays into a boolean mask over the store, which the search engines
+apply before scoring, so only matching documents are ever scored.
+"""
+
+import json
+from array import array
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Iterable, Optional
+
+import numpy as np
+
+METADATA_SUFFIX = ".metadata.npz"
+
+
+def metadata_path(source: str) -> Path:
+    """Returns the metadata file that belongs to a JSON search index."""
+    base = Path(source).with_suffix("")
+    return base.with_name(base.name + METADATA_SUFFIX)
+
+
+def _as_key(value: Any) -> str:
+    """Filter and stored values compare as strings, so 3.11 matches "3.11"."""
+    if isinstance(value, str):
+        return value
+    if isinstance(value, bool):
+        return "true" if value else "false"
+    if isinstance(value, (int, float)):
+        return str(value)
+    return json.dumps(value, sort_keys=True)
+
+
+def _as_values(value: Any) -> list:
+    if value is None:
+        return []
+    return list(value) if isinstance(value, (list, tuple, set)) else [value]
+
+
+@dataclass
+class MetadataColumn:
+    """Distinct values of a field and the (document, value code) entries using them."""
+
+    values: list[str]
+    docs: np.ndarray
+    codes: np.ndarray
+    multi: bool = False
+    _codes_by_value: dict = field(default_factory=dict, init=False, repr=False)
+
+    def __post_init__(self) -> None:
+        self._codes_by_value = {value: i for i, value in enumerate(self.values)}
+
+    def code(self, value: Any) -> Optional[int]:
+        return self._codes_by_value.get(_as_key(value))
+
+
+class MetadataBuilder:
+    """Accumulates per-document metadata dicts into columns, batch by batch."""
+
+    def __init__(self):
+        self.count = 0
+        self._fields: dict[str, tuple[dict, array, array]] = {}
+        self._multi: set[str] = set()
+
+    def add(self, rows: Iterable[Optional[dict]]) -> None:
+        """Adds the metadata of the next documents (None for a document without any)."""
+        for row in rows:
+            for name, value in (row or {}).items():
+                values, docs, codes = self._fields.setdefault(
+                    name, ({}, array("i"), array("i"))
+                )
+                if isinstance(value, (list, tuple, set)):
+                    self._multi.add(name)
+                for item in _as_values(value):
+                    docs.append(self.count)
+                    codes.append(values.setdefault(_as_key(item), len(values)))
+            self.count += 1
+
+    def build(self, store_fingerprint: str = "") -> "MetadataColumns":
+        columns = {
+            name: MetadataColumn(
+                values=list(values),
+                docs=np.frombuffer(docs, dtype=np.int32).copy(),
+                codes=np.frombuffer(codes, dtype=np.int32).copy(),
+                multi=name in self._multi,
+            )
+            for name, (values, docs, codes) in self._fields.items()
+        }
+        return MetadataColumns(columns, self.count, store_fingerprint)
+
+
+@dataclass
+class MetadataColumns:
+    """Metadata of every document of a store, one column per field."""
+
+    columns: dict[str, MetadataColumn]
+    n_docs: int
+    store_fingerprint: str = ""
+
+    @classmethod
+    def from_rows(
+        cls, rows: Iterable[Optional[dict]], store_fingerprint: str = ""
+    ) -> "MetadataColumns":
+        builder = MetadataBuilder()
+        builder.add(rows)
+        return builder.build(store_fingerprint)
+
+    def rows(self) -> list[dict]:
+        """Per-document metadata dicts (the inverse of from_rows, values as strings)."""
+        rows: list[dict] = [{} for _ in range(self.n_docs)]
+        for name, column in self.columns.items():
+            for doc, code in zip(column.docs.tolist(), column.codes.tolist(), strict=True):
+                if column.multi:
+                    rows[doc].setdefault(name, []).append(column.values[code])
+                else:
+                    rows[doc][name] = column.values[code]
+        return rows
+
+    def mask(self, filters: dict) -> np.ndarray:
+        """Documents matching every field of the filter.
+
+        Args:
+            filters: {field: value or list of values}; a document matches a
+                field if it has any of the values (for list fields such as
+                tags, any of its values), and the fields are combined with AND
+
+        Returns:
+            Boolean array with one entry per document
+        """
+        selected = np.ones(self.n_docs, dtype=bool)
+        for name, wanted in filters.items():
+            column = self.columns.get(name)
+            codes = [] if column is None else [column.code(value) for value in _as_values(wanted)]
+            codes = [code for code in codes if code is not None]
+            matches = np.zeros(self.n_docs, dtype=bool)
+            if codes:
+                matches[column.docs[np.isin(column.codes, codes)]] = True
+            selected &= matches
+        return selected
+
+    def save(self, path: Path) -> None:
+        """Writes the columns to `path` (atomically)."""
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        arrays = {
+            "fields": np.array(list(self.columns), dtype=str),
+            "multi": np.array([column.multi for column in self.columns.values()], dtype=bool),
+            "n_docs": np.array(self.n_docs),
+            "store_fingerprint": np.array(self.store_fingerprint),
+        }
+        for i, column in enumerate(self.columns.values()):
+            arrays[f"values_{i}"] = np.array(column.values, dtype=str)
+            arrays[f"docs_{i}"] = column.docs
+            arrays[f"codes_{i}"] = column.codes
+        np.savez(tmp_path, **arrays)
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, source: str) -> Optional["MetadataColumns"]:
+        """Loads the metadata of a JSON search index, or None if it has none."""
+        path = metadata_path(source)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            columns = {
+                name: MetadataColumn(
+                    values=data[f"values_{i}"].tolist(),
+                    docs=data[f"docs_{i}"],
+                    codes=data[f"codes_{i}"],
+                    multi=bool(data["multi"][i]),
+                )
+                for i, name in enumerate(data["fields"].tolist())
+            }
+            return cls(columns, int(data["n_docs"]), str(data["store_fingerprint"]))
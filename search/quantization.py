@@ -0,0 +1,350 @@
+"""Compressed copies of the embeddings for a coarse search pass, with exact re-ranking.
+
+The float32 matrix stays memory-mapped on disk; only the compressed codes
+are held in memory and scanned for every query. The best `candidates`
+documents of that coarse pass are then re-scored exactly against the
+float32 rows, so only those rows are paged in. Kinds:
+
+- float16: 2 bytes per dimension, scores almost identical to float32, but
+  slow to decode on CPUs without native half precision
+- int8: 1 byte per dimension plus one float32 scale per vector (recommended)
+- pq: product quantization, 1 byte per subvector (e.g. 32 bytes per vector)
+
+Build it offline (or with `python database/utils.py --quantize int8`) with:
+
+    python -m search.quantization database/search_index.json --kind int8
+
+and check recall against exact search with:
+
+    python -m search.quantization database/search_index.json --recall --candidates 20 100
+"""
+
+import argparse
+import time
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Optional
+
+import numpy as np
+
+from search.scoring import cosine_top_k, normalize_rows, top_k_indices
+
+QUANT_SUFFIX = ".quant.npz"
+KINDS = ("float16", "int8", "pq")
+# Rows encoded at a time by build(); bounds its float32 temporaries
+_SCAN_BATCH = 16384
+# Codes decoded at a time by a scan: a float32 buffer that stays in the CPU cache
+_DECODE_ELEMENTS = 1 << 19
+# Centroids per PQ subspace, so that a code fits in one byte
+_PQ_CENTROIDS = 256
+
+
+def quant_path(source: str) -> Path:
+    """Returns the quantized index file that belongs to a JSON search index."""
+    base = Path(source).with_suffix("")
+    return base.with_name(base.name + QUANT_SUFFIX)
+
+
+def _kmeans(sample: np.ndarray, k: int, n_iter: int, rng: np.random.Generator) -> np.ndarray:
+    """Euclidean k-means of a (small) sample; returns (k, dim) centroids."""
+    centroids = sample[rng.choice(len(sample), size=k, replace=len(sample) < k)].copy()
+    for _ in range(n_iter):
+        distances = (
+            (sample**2).sum(axis=1, keepdims=True)
+            - 2 * sample @ centroids.T
+            + (centroids**2).sum(axis=1)
+        )
+        labels = np.argmin(distances, axis=1)
+        counts = np.bincount(labels, minlength=k)
+        sums = np.zeros_like(centroids)
+        np.add.at(sums, labels, sample)
+        filled = counts > 0
+        centroids[filled] = sums[filled] / counts[filled, None]
+        # Re-seed empty clusters so every code stays useful
+        centroids[~filled] = sample[rng.choice(len(sample), size=int((~filled).sum()))]
+    return centroids
+
+
+def _pq_encode(vectors: np.ndarray, codebooks: np.ndarray) -> np.ndarray:
+    """Nearest centroid of every subvector; (n, m) uint8 codes."""
+    n_subvectors, _, sub_dim = codebooks.shape
+    codes = np.empty((len(vectors), n_subvectors), dtype=np.uint8)
+    for j, codebook in enumerate(codebooks):
+        sub = vectors[:, j * sub_dim : (j + 1) * sub_dim]
+        distances = -2 * sub @ codebook.T + (codebook**2).sum(axis=1)
+        codes[:, j] = np.argmin(distances, axis=1)
+    return codes
+
+
+@dataclass
+class QuantizedIndex:
+    """Compressed embeddings (codes) plus what is needed to score them."""
+
+    kind: str
+    codes: np.ndarray
+    # int8: one scale per vector
+    scales: Optional[np.ndarray] = None
+    # pq: (n_subvectors, 256, dim / n_subvectors) centroids
+    codebooks: Optional[np.ndarray] = None
+    store_fingerprint: str = ""
+
+    @property
+    def nbytes(self) -> int:
+        """Memory held by the index."""
+        extra = [array.nbytes for array in (self.scales, self.codebooks) if array is not None]
+        return int(self.codes.nbytes + sum(extra))
+
+    @classmethod
+    def build(
+        cls,
+        embeddings: np.ndarray,
+        kind: str = "int8",
+        n_subvectors: int = 32,
+        n_iter: int = 20,
+        store_fingerprint: str = "",
+        seed: int = 0,
+    ) -> "QuantizedIndex":
+        """Compresses normalized embeddings, reading them in bounded-memory batches.
+
+        Args:
+            embeddings: (n, dim) matrix with unit-length rows (may be memory-mapped)
+            kind: "float16", "int8" or "pq"
+            n_subvectors: PQ only; must divide dim
+            n_iter: PQ only; k-means iterations per subspace
+            store_fingerprint: Fingerprint of the vector store being indexed
+            seed: Random seed of the PQ training sample
+
+        Returns:
+            The built QuantizedIndex
+        """
+        if kind not in KINDS:
+            raise ValueError(f"kind must be one of {', '.join(KINDS)}")
+        n, dim = embeddings.shape
+        scales = codebooks = None
+
+        if kind == "pq":
+            if dim % n_subvectors:
+                raise ValueError(f"n_subvectors ({n_subvectors}) must divide dim ({dim})")
+            rng = np.random.default_rng(seed)
+            sample_size = min(n, _PQ_CENTROIDS * 64)
+            sample = np.asarray(
+                embeddings[np.sort(rng.choice(n, size=sample_size, replace=False))],
+                dtype=np.float32,
+            )
+            sub_dim = dim // n_subvectors
+            subspaces = [sample[:, j * sub_dim : (j + 1) * sub_dim] for j in range(n_subvectors)]
+            codebooks = np.stack(
+                [_kmeans(subspace, _PQ_CENTROIDS, n_iter, rng) for subspace in subspaces]
+            ).astype(np.float32)
+            codes = np.empty((n, n_subvectors), dtype=np.uint8)
+        elif kind == "int8":
+            codes = np.empty((n, dim), dtype=np.int8)
+            scales = np.empty(n, dtype=np.float32)
+        else:
+            codes = np.empty((n, dim), dtype=np.float16)
+
+        for start in range(0, n, _SCAN_BATCH):
+            batch = np.asarray(embeddings[start : start + _SCAN_BATCH], dtype=np.float32)
+            rows = slice(start, start + len(batch))
+            if kind == "pq":
+                codes[rows] = _pq_encode(batch, codebooks)
+            elif kind == "int8":
+                scale = np.abs(batch).max(axis=1) / 127.0
+                scale[scale == 0] = 1.0
+                codes[rows] = np.round(batch / scale[:, None]).astype(np.int8)
+                scales[rows] = scale
+            else:
+                codes[rows] = batch
+        return cls(kind, codes, scales, codebooks, store_fingerprint)
+
+    def save(self, source: str) -> None:
+        """Persists the index next to the JSON search index."""
+        path = quant_path(source)
+        tmp_path = path.with_name(path.name + ".tmp.npz")
+        arrays = {"scales": self.scales, "codebooks": self.codebooks}
+        np.savez(
+            tmp_path,
+            kind=np.array(self.kind),
+            codes=self.codes,
+            store_fingerprint=np.array(self.store_fingerprint),
+            **{name: array for name, array in arrays.items() if array is not None},
+        )
+        tmp_path.replace(path)
+
+    @classmethod
+    def load(cls, source: str) -> Optional["QuantizedIndex"]:
+        """Loads the index of a JSON search index, or None if it was never built."""
+        path = quant_path(source)
+        if not path.exists():
+            return None
+        with np.load(path) as data:
+            return cls(
+                kind=str(data["kind"]),
+                codes=data["codes"],
+                scales=data["scales"] if "scales" in data else None,
+                codebooks=data["codebooks"] if "codebooks" in data else None,
+                store_fingerprint=str(data["store_fingerprint"]),
+            )
+
+    def approximate_scores(
+        self, query: np.ndarray, rows: Optional[np.ndarray] = None
+    ) -> np.ndarray:
+        """Approximate dot products of a normalized query with every vector (or `rows`)."""
+        codes_all = self.codes if rows is None else self.codes[rows]
+        n = codes_all.shape[0]
+        scores = np.empty(n, dtype=np.float32)
+        if self.kind == "pq":
+            n_subvectors, _, sub_dim = self.codebooks.shape
+            # Asymmetric distance: one table lookup per subvector instead of a dot product
+            table = np.einsum("mkd,md->mk", self.codebooks, query.reshape(n_subvectors, sub_dim))
+            # Codes shifted into the flattened table (past uint16 beyond 256 subvectors)
+            offsets = np.arange(n_subvectors, dtype=np.intp) * _PQ_CENTROIDS
+            table = table.ravel()
+            for start in range(0, n, _SCAN_BATCH):
+                codes = codes_all[start : start + _SCAN_BATCH]
+                scores[start : start + len(codes)] = np.take(table, codes + offsets).sum(axis=1)
+            return scores
+
+        # Decoding into one small reused buffer is about twice as fast as
+        # casting large batches (no allocation, no trip to main memory)
+        batch_rows = max(1, _DECODE_ELEMENTS // self.codes.shape[1])
+        buffer = np.empty((batch_rows, self.codes.shape[1]), dtype=np.float32)
+        for start in range(0, n, batch_rows):
+            codes = codes_all[start : start + batch_rows]
+            decoded = buffer[: len(codes)]
+            np.copyto(decoded, codes)
+            np.matmul(decoded, query, out=scores[start : start + len(codes)])
+        if self.kind == "int8":
+            scores *= self.scales if rows is None else self.scales[rows]
+        return scores
+
+    def search(
+        self,
+        embeddings: np.ndarray,
+        query_embedding,
+        top_k: int,
+        candidates: int,
+        mask: Optional[np.ndarray] = None,
+    ) -> tuple[np.ndarray, np.ndarray]:
+        """Coarse pass over the codes, then exact re-ranking of the best candidates.
+
+        Args:
+            embeddings: (n, dim) float32 matrix with unit-length rows the index was built from
+            query_embedding: Query embedding
+            top_k: Number of results to keep
+            candidates: Documents re-ranked exactly; higher is slower but more accurate
+            mask: Optional boolean filter; only the codes of matching documents are scanned
+
+        Returns:
+            Tuple (indices, scores) ordered by decreasing exact similarity
+        """
+        if self.codes.shape[0] == 0:
+            return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+        query = normalize_rows(query_embedding)
+        rows = None if mask is None else np.flatnonzero(mask)
+        shortlist = top_k_indices(self.approximate_scores(query, rows), max(top_k, candidates))
+        if rows is not None:
+            shortlist = rows[shortlist]
+        shortlist.sort()  # sequential reads from the memory-mapped matrix
+        scores = np.asarray(embeddings[shortlist], dtype=np.float32) @ query
+        best = top_k_indices(scores, top_k)
+        return shortlist[best], scores[best]
+
+
+def recall_at_k(
+    index: QuantizedIndex,
+    embeddings: np.ndarray,
+    queries: np.ndarray,
+    top_k: int,
+    candidates: int,
+) -> float:
+    """Measures the fraction of exact top_k results the re-ranked search also returns.
+
+    Args:
+        index: Quantized index built over embeddings
+        embeddings: (n, dim) matrix with unit-length rows
+        queries: (q, dim) matrix of query embeddings
+        top_k: Number of results per query
+        candidates: Documents re-ranked exactly
+
+    Returns:
+        Mean recall@k over the queries, between 0 and 1
+    """
+    hits = 0
+    expected_total = 0
+    for query in queries:
+        exact, _ = cosine_top_k(embeddings, query, top_k)
+        approx, _ = index.search(embeddings, query, top_k, candidates)
+        hits += len(set(exact.tolist()) & set(approx.tolist()))
+        expected_total += len(exact)
+    return hits / expected_total if expected_total else 1.0
+
+
+def build_quantized_index(
+    source: str, kind: str = "int8", n_subvectors: int = 32
+) -> QuantizedIndex:
+    """Builds and saves the quantized index of the binary store of a search index."""
+    from search.vector_store import VectorStore
+
+    store = VectorStore.load(source)
+    index = QuantizedIndex.build(
+        store.embeddings, kind, n_subvectors=n_subvectors, store_fingerprint=store.fingerprint
+    )
+    index.save(source)
+    return index
+
+
+def main() -> None:
+    """Builds the quantized index of a search index, or reports its recall."""
+    from search.vector_store import ResidentIndex
+
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument("source", help="JSON search index (e.g. database/search_index.json)")
+    parser.add_argument("--kind", choices=KINDS, default="int8")
+    parser.add_argument("--subvectors", type=int, default=32, help="PQ subvectors")
+    parser.add_argument("--recall", action="store_true", help="Report recall instead of building")
+    parser.add_argument("--candidates", type=int, nargs="+", default=[20, 100])
+    parser.add_argument("--top-k", type=int, default=10)
+    parser.add_argument("--queries", type=int, default=100)
+    args = parser.parse_args()
+
+    store = ResidentIndex(args.source).get()
+
+    if not args.recall:
+        index = build_quantized_index(args.source, args.kind, args.subvectors)
+        print(
+            f"{index.kind} index ({index.nbytes / store.embeddings.nbytes:.1%} of float32)"
+            f" written to {quant_path(args.source)}"
+        )
+        return
+
+    # The store only attaches an index built from its current embeddings
+    index = store.quantized
+    if index is None:
+        if quant_path(args.source).exists():
+            raise SystemExit(
+                f"Quantized index at {quant_path(args.source)} is stale (built for another"
+                " version of the store); rebuild it by running without --recall"
+            )
+        raise SystemExit("Quantized index not built yet; run without --recall first")
+
+    # Perturbed documents stand in for real queries
+    rng = np.random.default_rng(1)
+    sample = rng.choice(len(store), size=min(args.queries, len(store)), replace=False)
+    queries = np.asarray(store.embeddings[np.sort(sample)])
+    queries = normalize_rows(queries + rng.normal(scale=0.01, size=queries.shape))
+
+    for candidates in args.candidates:
+        recall = recall_at_k(index, store.embeddings, queries, args.top_k, candidates)
+        start = time.perf_counter()
+        for query in queries:
+            index.search(store.embeddings, query, args.top_k, candidates)
+        elapsed = (time.perf_counter() - start) / len(queries)
+        print(
+            f"candidates={candidates:<5} recall@{args.top_k}={recall:.3f}"
+            f"  {elapsed * 1000:.3f} ms/query"
+        )
+
+
+if __name__ == "__main__":
+    main()
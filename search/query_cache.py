@@ -0,0 +1,115 @@
+"""In-process LRU/TTL cache for query embeddings, with an optional shared tier."""
+
+import asyncio
+import threading
+import time
+from collections import OrderedDict
+from typing import Optional
+
+from search.embedding_cache import EmbeddingCache
+
+
+class QueryEmbeddingCache:
+    """Bounded LRU cache of query embeddings whose entries expire after `ttl` seconds.
+
+    When a shared EmbeddingCache is given, local misses are looked up there
+    (and new embeddings written to it), so several MCP server processes
+    pointing at the same file share each other's hits.
+    """
+
+    def __init__(
+        self,
+        max_size: int = 1024,
+        ttl: float = 3600.0,
+        deployment: str = "",
+        shared: Optional[EmbeddingCache] = None,
+    ):
+        self.max_size = max_size
+        self.ttl = ttl
+        self.deployment = deployment
+        self.shared = shared
+        self._entries: "OrderedDict[str, tuple[float, list[float]]]" = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.shared_hits = 0
+        self.misses = 0
+
+    def get(self, query: str) -> Optional[list[float]]:
+        """Returns the cached embedding of a query, or None on a miss."""
+        embedding = self._get_local(query)
+        if embedding is None and self.shared is not None:
+            embedding = self._get_shared(query)
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+        return embedding
+
+    async def aget(self, query: str) -> Optional[list[float]]:
+        """Async get; the shared tier (SQLite) is read off the event loop."""
+        embedding = self._get_local(query)
+        if embedding is None and self.shared is not None:
+            embedding = await asyncio.to_thread(self._get_shared, query)
+        if embedding is None:
+            with self._lock:
+                self.misses += 1
+        return embedding
+
+    def put(self, query: str, embedding: list[float]) -> None:
+        """Caches the embedding of a query in every tier."""
+        self._store(query, embedding)
+        if self.shared is not None:
+            self.shared.put_many(self.deployment, [(query, embedding)])
+
+    async def aput_many(self, items: list[tuple[str, list[float]]]) -> None:
+        """Async put of (query, embedding) pairs; the shared tier is written off the event loop."""
+        for query, embedding in items:
+            self._store(query, embedding)
+        if self.shared is not None and items:
+            await asyncio.to_thread(self.shared.put_many, self.deployment, items)
+
+    def _get_local(self, query: str) -> Optional[list[float]]:
+        now = time.monotonic()
+        with self._lock:
+            entry = self._entries.get(query)
+            if entry is not None:
+                expires_at, embedding = entry
+                if expires_at > now:
+                    self._entries.move_to_end(query)
+                    self.hits += 1
+                    return embedding
+                del self._entries[query]
+        return None
+
+    def _get_shared(self, query: str) -> Optional[list[float]]:
+        embedding = self.shared.get(self.deployment, query, max_age=self.ttl)
+        if embedding is not None:
+            self._store(query, embedding)
+            with self._lock:
+                self.shared_hits += 1
+        return embedding
+
+    def _store(self, query: str, embedding: list[float]) -> None:
+        with self._lock:
+            self._entries[query] = (time.monotonic() + self.ttl, embedding)
+            self._entries.move_to_end(query)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def clear(self) -> None:
+        """Drops every local entry and resets the counters."""
+        with self._lock:
+            self._entries.clear()
+            self.hits = self.shared_hits = self.misses = 0
+
+    def stats(self) -> dict:
+        """Hit/miss counters for monitoring."""
+        with self._lock:
+            lookups = self.hits + self.shared_hits + self.misses
+            return {
+                "size": len(self._entries),
+                "max_size": self.max_size,
+                "hits": self.hits,
+                "shared_hits": self.shared_hits,
+                "misses": self.misses,
+                "hit_rate": (self.hits + self.shared_hits) / lookups if lookups else 0.0,
+            }
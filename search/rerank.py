@@ -0,0 +1,124 @@
+"""Second-stage re-ranking of over-fetched search candidates.
+
+The first stage (vector, lexical or hybrid search) over-fetches a few dozen
+candidates; a re-ranker re-scores only those with features too costly to
+compute over the whole corpus, and the best top_k are kept. Fewer but
+better chunks keep the prompts of the agent short.
+
+The built-in scorer, "terms", runs on the CPU without any model: it rewards
+candidates containing the query terms (weighted by how rare they are among
+the candidates) and its word pairs. Any other scorer is plugged in as
+"package.module:name", a callable (or a class instantiated once without
+arguments) taking (query, chunks) and returning one score per chunk, e.g. a
+cross-encoder:
+
+    class CrossEncoderScorer:
+        def __init__(self):
+            from sentence_transformers import CrossEncoder
+            self.model = CrossEncoder("cross-encoder/ms-marco-MiniLM-L-6-v2")
+
+        def __call__(self, query, chunks):
+            return self.model.predict([(query, chunk) for chunk in chunks])
+"""
+
+import importlib
+import math
+from typing import Callable, Optional, Sequence
+
+import numpy as np
+
+from search.bm25 import tokenize
+from search.scoring import weighted_score_fusion
+
+Scorer = Callable[[str, list[str]], Sequence[float]]
+
+# Share of the term score going to query word pairs found in the chunk
+BIGRAM_WEIGHT = 0.5
+
+
+def _bigrams(tokens: list[str]) -> set[tuple[str, str]]:
+    return set(zip(tokens, tokens[1:], strict=False))
+
+
+class TermOverlapScorer:
+    """Lightweight CPU scorer: idf-weighted query term coverage plus word pair matches."""
+
+    def __call__(self, query: str, chunks: list[str]) -> np.ndarray:
+        query_tokens = tokenize(query)
+        terms = list(dict.fromkeys(query_tokens))
+        scores = np.zeros(len(chunks), dtype=np.float32)
+        if not terms or not chunks:
+            return scores
+
+        chunk_tokens = [tokenize(chunk) for chunk in chunks]
+        chunk_terms = [set(tokens) for tokens in chunk_tokens]
+        # Terms found in every candidate don't tell them apart
+        n = len(chunks)
+        idf = {}
+        for term in terms:
+            df = sum(term in present for present in chunk_terms)
+            idf[term] = math.log1p((n - df + 0.5) / (df + 0.5))
+        total_idf = sum(idf.values()) or 1.0
+        query_bigrams = _bigrams(query_tokens)
+
+        for i, (tokens, present) in enumerate(zip(chunk_tokens, chunk_terms, strict=True)):
+            coverage = sum(idf[term] for term in terms if term in present) / total_idf
+            pairs = (
+                len(query_bigrams & _bigrams(tokens)) / len(query_bigrams) if query_bigrams else 0.0
+            )
+            scores[i] = coverage + BIGRAM_WEIGHT * pairs
+        return scores
+
+
+RERANKERS: dict[str, Callable[[], Scorer]] = {"terms": TermOverlapScorer}
+
+
+def load_reranker(spec: str) -> Optional[Scorer]:
+    """Scorer named by spec: "" (no re-ranking), a RERANKERS name or "module:name".
+
+    Raises:
+        ValueError: If spec names neither a built-in scorer nor a module attribute
+    """
+    if not spec:
+        return None
+    if spec in RERANKERS:
+        return RERANKERS[spec]()
+    module_name, sep, name = spec.partition(":")
+    if not sep:
+        raise ValueError(
+            f"Unknown re-ranker {spec!r}: use one of {', '.join(RERANKERS)} or module:name"
+        )
+    scorer = getattr(importlib.import_module(module_name), name)
+    return scorer() if isinstance(scorer, type) else scorer
+
+
+def rerank(
+    query: str,
+    chunks: list[str],
+    first_stage_scores: Sequence[float],
+    scorer: Scorer,
+    top_k: int,
+    alpha: float = 0.3,
+) -> list[tuple[int, float]]:
+    """Re-scores the candidates of a first-stage search and keeps the best top_k.
+
+    Args:
+        query: Search text
+        chunks: Texts of the candidates
+        first_stage_scores: Scores the candidates were retrieved with
+        scorer: Re-ranking scorer
+        top_k: Number of candidates to keep
+        alpha: Weight of the (min-max normalized) first-stage score; the
+            re-ranker's gets 1 - alpha
+
+    Returns:
+        List of (candidate position, combined score) tuples, best first
+    """
+    if not chunks:
+        return []
+    rescored = np.asarray(scorer(query, chunks), dtype=np.float32)
+    rankings = [
+        list(enumerate(float(score) for score in first_stage_scores)),
+        list(enumerate(rescored.tolist())),
+    ]
+    return weighted_score_fusion(rankings, [alpha, 1.0 - alpha])[:top_k]
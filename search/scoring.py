@@ -0,0 +1,170 @@
+"""Vectorized similarity scoring over a matrix of embeddings."""
+
+from typing import Optional
+
+import numpy as np
+
+# Filters selecting more than this fraction of the rows score every row and
+# mask the others out; more selective ones score only the selected rows
+_DENSE_MASK_FRACTION = 0.5
+
+
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    """Scales every row to unit length so a dot product equals cosine similarity.
+
+    Args:
+        matrix: 2-D array of embeddings (or a single 1-D embedding)
+
+    Returns:
+        float32 array of the same shape; all-zero rows are left as zeros
+    """
+    matrix = np.asarray(matrix, dtype=np.float32)
+    norms = np.linalg.norm(matrix, axis=-1, keepdims=True)
+    norms[norms == 0] = 1.0
+    return matrix / norms
+
+
+def top_k_indices(scores: np.ndarray, top_k: int) -> np.ndarray:
+    """Returns the indices of the top_k highest scores, best first.
+
+    Uses a partial selection (argpartition) so only the winners get sorted.
+
+    Args:
+        scores: 1-D array of scores
+        top_k: Number of indices to return
+
+    Returns:
+        Array with at most top_k indices into scores
+    """
+    top_k = min(top_k, scores.shape[0])
+    if top_k <= 0:
+        return np.empty(0, dtype=np.intp)
+    if top_k < scores.shape[0]:
+        candidates = np.argpartition(-scores, top_k - 1)[:top_k]
+    else:
+        candidates = np.arange(scores.shape[0])
+    return candidates[np.argsort(-scores[candidates], kind="stable")]
+
+
+def _selected_rows(mask: Optional[np.ndarray]) -> Optional[np.ndarray]:
+    """Rows to gather for a filter, or None when scoring every row is cheaper."""
+    if mask is None or mask.mean() > _DENSE_MASK_FRACTION:
+        return None
+    return np.flatnonzero(mask)
+
+
+def cosine_top_k(
+    normalized_embeddings: np.ndarray,
+    query_embedding,
+    top_k: int,
+    mask: Optional[np.ndarray] = None,
+) -> tuple[np.ndarray, np.ndarray]:
+    """Scores a query against row-normalized embeddings and keeps the top_k.
+
+    Args:
+        normalized_embeddings: (n, dim) matrix with unit-length rows
+        query_embedding: Query embedding (any length, normalized here once)
+        top_k: Number of results to keep
+        mask: Optional boolean filter over the rows; other rows are never returned
+
+    Returns:
+        Tuple (indices, scores) ordered by decreasing similarity
+    """
+    if normalized_embeddings.shape[0] == 0:
+        return np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32)
+    query = normalize_rows(query_embedding)
+    rows = _selected_rows(mask)
+    if rows is not None:
+        scores = np.asarray(normalized_embeddings[rows]) @ query
+        best = top_k_indices(scores, top_k)
+        return rows[best], scores[best]
+
+    scores = normalized_embeddings @ query
+    if mask is not None:
+        scores[~mask] = -np.inf
+        top_k = min(top_k, int(mask.sum()))
+    indices = top_k_indices(scores, top_k)
+    return indices, scores[indices]
+
+
+def cosine_top_k_batch(
+    normalized_embeddings: np.ndarray,
+    query_embeddings,
+    top_k: int,
+    mask: Optional[np.ndarray] = None,
+) -> list[tuple[np.ndarray, np.ndarray]]:
+    """Scores several queries with a single matrix-matrix product.
+
+    Args:
+        normalized_embeddings: (n, dim) matrix with unit-length rows
+        query_embeddings: (q, dim) query embeddings
+        top_k: Number of results to keep per query
+        mask: Optional boolean filter over the rows, shared by every query
+
+    Returns:
+        One (indices, scores) tuple per query, ordered by decreasing similarity
+    """
+    queries = normalize_rows(np.atleast_2d(np.asarray(query_embeddings, dtype=np.float32)))
+    if normalized_embeddings.shape[0] == 0:
+        empty = (np.empty(0, dtype=np.intp), np.empty(0, dtype=np.float32))
+        return [empty for _ in range(queries.shape[0])]
+    rows = _selected_rows(mask)
+    if rows is not None:
+        # Gathered once for the whole batch
+        scores = queries @ np.asarray(normalized_embeddings[rows]).T
+    else:
+        scores = queries @ normalized_embeddings.T
+        if mask is not None:
+            scores[:, ~mask] = -np.inf
+            top_k = min(top_k, int(mask.sum()))
+    results = []
+    for row in scores:
+        indices = top_k_indices(row, top_k)
+        results.append((indices if rows is None else rows[indices], row[indices]))
+    return results
+
+
+def reciprocal_rank_fusion(rankings: list[list], k: int = 60) -> list[tuple]:
+    """Fuses several ranked lists with reciprocal rank fusion (RRF).
+
+    Each item scores sum(1 / (k + rank)) over the lists it appears in.
+
+    Args:
+        rankings: Ranked lists of hashable ids, best first
+        k: Damping constant; 60 is the value from the original RRF paper
+
+    Returns:
+        List of (id, fused score) tuples, best first
+    """
+    fused: dict = {}
+    for ranking in rankings:
+        for rank, item in enumerate(ranking, start=1):
+            fused[item] = fused.get(item, 0.0) + 1.0 / (k + rank)
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
+
+
+def weighted_score_fusion(rankings: list[list[tuple]], weights: list[float]) -> list[tuple]:
+    """Fuses ranked lists by a weighted sum of their min-max normalized scores.
+
+    Scores of different scorers (e.g. cosine and BM25) live on different
+    scales, so each list is rescaled to [0, 1] first; an item missing from a
+    list contributes 0 for it.
+
+    Args:
+        rankings: Ranked lists of (id, score) tuples, best first
+        weights: Weight of each list
+
+    Returns:
+        List of (id, fused score) tuples, best first
+    """
+    fused: dict = {}
+    for ranking, weight in zip(rankings, weights, strict=True):
+        if not ranking:
+            continue
+        scores = [score for _, score in ranking]
+        low, high = min(scores), max(scores)
+        span = high - low
+        for item, score in ranking:
+            normalized = (score - low) / span if span > 0 else 1.0
+            fused[item] = fused.get(item, 0.0) + weight * normalized
+    return sorted(fused.items(), key=lambda entry: entry[1], reverse=True)
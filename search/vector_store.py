@@ -0,0 +1,499 @@
+"""Binary vector store - memory-mapped embeddings with an ids/chunks sidecar."""
+
+import hashlib
+import json
+import logging
+import os
+import shutil
+import tempfile
+import threading
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Iterable, Optional, Union
+
+import numpy as np
+
+from search.bm25 import BM25Builder, BM25Index, bm25_path
+from search.ingest import iter_batches, iter_documents
+from search.ivf import IVFIndex, ivf_path
+from search.metadata import MetadataBuilder, MetadataColumns, metadata_path
+from search.quantization import QuantizedIndex, quant_path
+from search.scoring import normalize_rows
+
+# 2: rows are stored L2-normalized, 3: content fingerprint in the sidecar,
+# 4: versioned data files listed by a manifest
+FORMAT_VERSION = 4
+MANIFEST_SUFFIX = ".store.json"
+VECTORS_SUFFIX = ".vectors.npy"
+META_SUFFIX = ".meta.json"
+# Attempts of VectorStore.load when a writer removes the files it just found
+LOAD_ATTEMPTS = 3
+
+logger = logging.getLogger(__name__)
+
+
+def manifest_path(source: str) -> Path:
+    """Returns the manifest naming the current version of the store of a JSON search index.
+
+    Args:
+        source: Path of the JSON search index (e.g. database/search_index.json)
+    """
+    base = Path(source).with_suffix("")
+    return base.with_name(base.name + MANIFEST_SUFFIX)
+
+
+def store_paths(source: str, version: str) -> tuple[Path, Path]:
+    """Returns the binary files of one version of the store of a JSON search index.
+
+    Args:
+        source: Path of the JSON search index (e.g. database/search_index.json)
+        version: Store version, as listed by the manifest
+
+    Returns:
+        Tuple with the vectors (.npy) path and the sidecar (.json) path
+    """
+    base = Path(source).with_suffix("")
+    return (
+        base.with_name(f"{base.name}.{version}{VECTORS_SUFFIX}"),
+        base.with_name(f"{base.name}.{version}{META_SUFFIX}"),
+    )
+
+
+def read_manifest(source: str) -> Optional[dict]:
+    """The manifest of the store of a JSON search index, or None if there is none."""
+    try:
+        with open(manifest_path(source), "r", encoding="utf-8") as f:
+            return json.load(f)
+    except FileNotFoundError:
+        return None
+
+
+@dataclass
+class VectorStore:
+    """Row-normalized float32 embeddings, aligned with ids and chunks."""
+
+    ids: list[Any]
+    chunks: list[str]
+    embeddings: np.ndarray
+    fingerprint: str = ""
+    # Optional ANN index, attached on load when it matches this store
+    ivf: Optional[IVFIndex] = None
+    # Optional lexical index over the chunks, attached the same way
+    bm25: Optional[BM25Index] = None
+    # Optional compressed copy of the embeddings for a coarse pass, attached the same way
+    quantized: Optional[QuantizedIndex] = None
+    # Per-document metadata columns used by search filters
+    metadata: Optional[MetadataColumns] = None
+
+    def __len__(self) -> int:
+        return len(self.ids)
+
+    @property
+    def dim(self) -> int:
+        return int(self.embeddings.shape[1]) if self.embeddings.ndim == 2 else 0
+
+    @classmethod
+    def from_documents(cls, documents: list[dict]) -> "VectorStore":
+        """Builds a store from documents shaped like search_index.json entries.
+
+        Args:
+            documents: List of dictionaries with {id, chunk, embedding} and
+                optionally metadata ({field: value or list of values})
+
+        Returns:
+            VectorStore holding the documents in memory, rows L2-normalized
+        """
+        ids = [doc.get("id") for doc in documents]
+        chunks = [doc.get("chunk") for doc in documents]
+        if documents:
+            embeddings = normalize_rows(
+                np.asarray([doc.get("embedding") for doc in documents], dtype=np.float32)
+            )
+        else:
+            embeddings = np.zeros((0, 0), dtype=np.float32)
+        embeddings = np.ascontiguousarray(embeddings)
+        fingerprint = hashlib.sha256(embeddings.tobytes())
+        fingerprint.update(json.dumps(ids).encode("utf-8"))
+        return cls(
+            ids=ids,
+            chunks=chunks,
+            embeddings=embeddings,
+            fingerprint=fingerprint.hexdigest(),
+            metadata=MetadataColumns.from_rows(
+                [doc.get("metadata") for doc in documents], fingerprint.hexdigest()
+            ),
+        )
+
+    def save(self, source: str) -> None:
+        """Persists the store next to the JSON index it was built from.
+
+        Args:
+            source: Path of the JSON search index
+        """
+        rows = self.metadata.rows() if self.metadata is not None else None
+        with VectorStoreWriter(source) as writer:
+            writer.append(self.ids, self.chunks, self.embeddings, normalized=True, metadata=rows)
+
+    @classmethod
+    def load(cls, source: str, mmap: bool = True) -> "VectorStore":
+        """Loads a persisted store.
+
+        Args:
+            source: Path of the JSON search index
+            mmap: Memory-map the vectors instead of reading them into memory
+
+        Returns:
+            VectorStore whose embeddings share the OS page cache when mmap is True
+        """
+        for attempt in range(LOAD_ATTEMPTS):
+            manifest = read_manifest(source)
+            if manifest is None:
+                raise FileNotFoundError(f"No vector store manifest {manifest_path(source)}")
+            if manifest.get("format_version") != FORMAT_VERSION:
+                raise ValueError(
+                    f"Unsupported vector store format {manifest.get('format_version')}"
+                    f" in {manifest_path(source)}"
+                )
+            vectors_path, meta_path = store_paths(source, manifest["version"])
+            try:
+                with open(meta_path, "r", encoding="utf-8") as f:
+                    meta = json.load(f)
+                embeddings = np.load(vectors_path, mmap_mode="r" if mmap else None)
+                break
+            except FileNotFoundError:
+                # Replaced by a newer version since the manifest was read
+                if attempt == LOAD_ATTEMPTS - 1:
+                    raise
+        if embeddings.shape[0] != meta["count"]:
+            raise ValueError(f"Vector store {vectors_path} does not match {meta_path}")
+        ivf = IVFIndex.load(source)
+        if ivf is not None and ivf.store_fingerprint != meta["fingerprint"]:
+            # Built for a previous version of the index; fall back to exact search
+            ivf = None
+        bm25 = BM25Index.load(source)
+        if bm25 is not None and bm25.store_fingerprint != meta["fingerprint"]:
+            bm25 = None
+        quantized = QuantizedIndex.load(source)
+        if quantized is not None and quantized.store_fingerprint != meta["fingerprint"]:
+            quantized = None
+        metadata = MetadataColumns.load(source)
+        if metadata is not None and metadata.store_fingerprint != meta["fingerprint"]:
+            metadata = None
+        return cls(
+            ids=meta["ids"],
+            chunks=meta["chunks"],
+            embeddings=embeddings,
+            fingerprint=meta["fingerprint"],
+            ivf=ivf,
+            bm25=bm25,
+            quantized=quantized,
+            metadata=metadata,
+        )
+
+
+class VectorStoreWriter:
+    """Streams batches of documents into the binary store files.
+
+    Vectors, ids and chunks are appended to temporary files as they arrive
+    (metadata to in-memory integer columns, chunk terms to BM25 postings);
+    close() assembles the final .npy
+    matrix, metadata columns and sidecar under names of their own version,
+    then renames the manifest pointing at them: readers see either the
+    previous store or the new one, never a mix.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self.manifest_path = manifest_path(source)
+        self.metadata_path = metadata_path(source)
+        self._metadata = MetadataBuilder()
+        self._bm25 = BM25Builder()
+        # Unique names: several writers (threads or processes) may build the same store
+        self._tmp_paths = {}
+        for name in ("vectors", "ids", "chunks", "npy", "meta", "manifest"):
+            fd, path = tempfile.mkstemp(
+                dir=self.manifest_path.parent, prefix=f".{self.manifest_path.name}.{name}."
+            )
+            os.close(fd)
+            self._tmp_paths[name] = Path(path)
+        self._vectors = open(self._tmp_paths["vectors"], "wb")
+        self._ids = open(self._tmp_paths["ids"], "w", encoding="utf-8")
+        self._chunks = open(self._tmp_paths["chunks"], "w", encoding="utf-8")
+        self._hash = hashlib.sha256()
+        self.count = 0
+        self.dim: Optional[int] = None
+        self._closed = False
+
+    def append(
+        self,
+        ids: list[Any],
+        chunks: list[str],
+        embeddings: Iterable,
+        normalized: bool = False,
+        metadata: Optional[list[Optional[dict]]] = None,
+    ) -> None:
+        """Adds a batch of documents.
+
+        Args:
+            ids: Document ids
+            chunks: Document texts
+            embeddings: One embedding per document
+            normalized: Embeddings are already unit-length (otherwise normalized here)
+            metadata: One metadata dict (or None) per document
+        """
+        if not ids:
+            return
+        matrix = np.asarray(embeddings, dtype=np.float32)
+        if not normalized:
+            matrix = normalize_rows(matrix)
+        matrix = np.ascontiguousarray(matrix)
+        if self.dim is None:
+            self.dim = int(matrix.shape[1])
+        elif matrix.shape[1] != self.dim:
+            raise ValueError(f"Embedding dimension {matrix.shape[1]} != {self.dim}")
+
+        data = matrix.astype("<f4", copy=False).tobytes()
+        self._vectors.write(data)
+        self._hash.update(data)
+        separator = ", " if self.count else ""
+        self._ids.write(separator + ", ".join(json.dumps(doc_id) for doc_id in ids))
+        self._chunks.write(separator + ", ".join(json.dumps(chunk) for chunk in chunks))
+        self._metadata.add(metadata if metadata is not None else [None] * len(ids))
+        self._bm25.add(chunks)
+        self.count += len(ids)
+
+    def close(self, source_signature: Optional[tuple[int, int]] = None) -> None:
+        """Writes the final files, swaps the manifest and removes the previous version.
+
+        Args:
+            source_signature: file_signature() of the JSON index the store was
+                built from (default: of `source` now); recorded in the
+                manifest, it tells whether the store is up to date
+        """
+        if self._closed:
+            return
+        self._closed = True
+        if source_signature is None:
+            source_signature = file_signature(Path(self.source))
+        for f in (self._vectors, self._ids, self._chunks):
+            f.close()
+        dim = self.dim or 0
+
+        with open(self._tmp_paths["npy"], "wb") as f:
+            np.lib.format.write_array_header_1_0(
+                f,
+                {
+                    "descr": np.lib.format.dtype_to_descr(np.dtype("<f4")),
+                    "fortran_order": False,
+                    "shape": (self.count, dim),
+                },
+            )
+            with open(self._tmp_paths["vectors"], "rb") as vectors:
+                shutil.copyfileobj(vectors, f)
+
+        # Same fingerprint as VectorStore.from_documents: vectors, then json.dumps(ids)
+        self._hash.update(b"[")
+        with open(self._tmp_paths["ids"], "rb") as ids:
+            for block in iter(lambda: ids.read(1 << 20), b""):
+                self._hash.update(block)
+        self._hash.update(b"]")
+
+        with open(self._tmp_paths["meta"], "w", encoding="utf-8") as f:
+            header = {
+                "format_version": FORMAT_VERSION,
+                "count": self.count,
+                "dim": dim,
+                "fingerprint": self._hash.hexdigest(),
+            }
+            f.write(json.dumps(header)[:-1] + ', "ids": [')
+            with open(self._tmp_paths["ids"], "r", encoding="utf-8") as ids:
+                shutil.copyfileobj(ids, f)
+            f.write('], "chunks": [')
+            with open(self._tmp_paths["chunks"], "r", encoding="utf-8") as chunks:
+                shutil.copyfileobj(chunks, f)
+            f.write("]}")
+
+        version = header["fingerprint"][:16]
+        vectors_path, meta_path = store_paths(self.source, version)
+        os.replace(self._tmp_paths["npy"], vectors_path)
+        os.replace(self._tmp_paths["meta"], meta_path)
+        self._metadata.build(header["fingerprint"]).save(self.metadata_path)
+        self._bm25.build(store_fingerprint=header["fingerprint"]).save(self.source)
+
+        manifest = {**header, "version": version, "source": source_signature}
+        with open(self._tmp_paths["manifest"], "w", encoding="utf-8") as f:
+            json.dump(manifest, f)
+        previous = read_manifest(self.source)
+        # The swap: readers follow the manifest to one complete version
+        os.replace(self._tmp_paths["manifest"], self.manifest_path)
+        if previous is not None and previous.get("version") not in (None, version):
+            # Readers that already resolved the old files retry (see VectorStore.load)
+            for path in store_paths(self.source, previous["version"]):
+                path.unlink(missing_ok=True)
+        self._cleanup()
+
+    def _cleanup(self) -> None:
+        for f in (self._vectors, self._ids, self._chunks):
+            f.close()
+        for path in self._tmp_paths.values():
+            if path.exists():
+                path.unlink()
+
+    def __enter__(self) -> "VectorStoreWriter":
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback) -> None:
+        if exc_type is None:
+            self.close()
+        else:
+            self._closed = True
+            self._cleanup()
+
+
+def build_vector_store(source: str, batch_size: int = 1024) -> VectorStore:
+    """Converts a JSON/JSONL search index into the binary store format.
+
+    The source is streamed: memory holds `batch_size` documents plus the
+    metadata columns and BM25 postings of the corpus (compact integer arrays,
+    not the texts), which are rebuilt along with it.
+
+    Args:
+        source: Path of the JSON (array) or JSONL search index
+        batch_size: Documents converted at a time
+
+    Returns:
+        The store that was written, memory-mapped
+    """
+    # Recorded as read: a source replaced during the build is converted again later
+    source_signature = file_signature(Path(source))
+    with VectorStoreWriter(source) as writer:
+        for batch in iter_batches(iter_documents(source), batch_size):
+            writer.append(
+                [doc.get("id") for doc in batch],
+                [doc.get("chunk") for doc in batch],
+                [doc.get("embedding") for doc in batch],
+                metadata=[doc.get("metadata") for doc in batch],
+            )
+        writer.close(source_signature=source_signature)
+    return VectorStore.load(source)
+
+
+def file_signature(path: Union[str, Path]) -> Optional[tuple[int, int]]:
+    """(mtime in ns, size) of a file, or None if it doesn't exist."""
+    try:
+        stat = os.stat(path)
+    except FileNotFoundError:
+        return None
+    return (stat.st_mtime_ns, stat.st_size)
+
+
+class ResidentIndex:
+    """Keeps a VectorStore loaded for the lifetime of the process.
+
+    The store is (re)loaded only when the files on disk change. If the JSON
+    index is newer than the one the binary store was built from (or there is
+    no store yet), the store is rebuilt from it: by warm_up() at startup, in
+    a background thread afterwards, while searches keep using the loaded
+    store.
+    """
+
+    def __init__(self, source: str):
+        self.source = source
+        self._store: Optional[VectorStore] = None
+        self._loaded_signature: Optional[tuple] = None
+        # Files the resident store was kept over (being rebuilt, or unloadable):
+        # not looked at again until they change
+        self._skipped_signature: Optional[tuple] = None
+        self._lock = threading.Lock()
+        self._rebuild: Optional[threading.Thread] = None
+
+    def _current_signature(self) -> tuple:
+        return (
+            file_signature(Path(self.source)),
+            file_signature(manifest_path(self.source)),
+            file_signature(ivf_path(self.source)),
+            file_signature(bm25_path(self.source)),
+            file_signature(quant_path(self.source)),
+            file_signature(metadata_path(self.source)),
+        )
+
+    def _needs_build(self) -> bool:
+        source_signature = file_signature(Path(self.source))
+        manifest = read_manifest(self.source)
+        if manifest is None or manifest.get("format_version") != FORMAT_VERSION:
+            return source_signature is not None
+        built_from = manifest.get("source")
+        if source_signature is None or built_from is None:
+            return False
+        return source_signature[0] > built_from[0]
+
+    def warm_up(self) -> VectorStore:
+        """Loads the store, first building it in the calling thread if needed.
+
+        Meant for startup, before searches are served; get() calls it only
+        while no store is resident.
+        """
+        with self._lock:
+            if self._store is not None:
+                return self._store
+            signature = self._current_signature()
+            if self._needs_build():
+                build_vector_store(self.source)
+                signature = self._current_signature()
+            self._store = VectorStore.load(self.source)
+            self._loaded_signature = signature
+            return self._store
+
+    def get(self) -> VectorStore:
+        """Returns the resident store, reloading it only if the files changed.
+
+        Once a store is resident, this never builds: a newer JSON index is
+        converted in a background thread, and files that can't be loaded
+        leave the resident store in place until they change again.
+        """
+        store = self._store
+        if store is None:
+            return self.warm_up()
+        signature = self._current_signature()
+        if signature in (self._loaded_signature, self._skipped_signature):
+            return store
+
+        with self._lock:
+            # Another thread may have reloaded the store while this one waited
+            signature = self._current_signature()
+            if signature in (self._loaded_signature, self._skipped_signature):
+                return self._store
+
+            if self._needs_build():
+                self._start_rebuild()
+                self._skipped_signature = signature
+                return self._store
+            try:
+                store = VectorStore.load(self.source)
+            except (OSError, ValueError) as e:
+                logger.warning("Keeping the loaded vector store of %s: %s", self.source, e)
+                self._skipped_signature = signature
+                return self._store
+            self._store = store
+            self._loaded_signature = signature
+            return store
+
+    def wait_for_rebuild(self, timeout: Optional[float] = None) -> None:
+        """Blocks until a background rebuild, if any, is done."""
+        rebuild = self._rebuild
+        if rebuild is not None:
+            rebuild.join(timeout)
+
+    def _start_rebuild(self) -> None:
+        """Rebuilds the binary store in a background thread (called with the lock held)."""
+        if self._rebuild is not None and self._rebuild.is_alive():
+            return
+
+        def rebuild() -> None:
+            try:
+                build_vector_store(self.source)
+            except Exception:
+                logger.exception("Rebuilding the vector store of %s failed", self.source)
+
+        self._rebuild = threading.Thread(target=rebuild, name="vector-store-rebuild", daemon=True)
+        self._rebuild.start()
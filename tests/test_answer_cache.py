@@ -0,0 +1,68 @@
+"""Tests for the semantic answer cache."""
+
+from unittest.mock import patch
+
+
+class TestAnswerCache:
+    """Tests for AnswerCache."""
+
+    def test_exact_and_semantic_hits(self, tmp_path):
+        """Tests lookups by normalized text and by nearest neighbour."""
+        from search.answer_cache import AnswerCache
+
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"), threshold=0.9)
+        cache.put("What is FastAPI?", [1.0, 0.0, 0.0], "A web framework", ["doc2"], "v1")
+
+        exact = cache.lookup("  what is fastapi ", [0.0, 1.0, 0.0], ["doc2"], "v1")
+        assert exact["answer"] == "A web framework"
+        assert exact["match"] == "exact"
+
+        semantic = cache.lookup("Tell me about FastAPI", [0.99, 0.1, 0.0], ["doc2"], "v1")
+        assert semantic["match"] == "semantic"
+        assert semantic["query"] == "What is FastAPI?"
+
+        assert cache.lookup("Unrelated", [0.0, 0.0, 1.0], ["doc2"], "v1") is None
+
+        stats = cache.stats()
+        assert (stats["exact_hits"], stats["semantic_hits"], stats["misses"]) == (1, 1, 1)
+        assert stats["hit_rate"] == 2 / 3
+
+    def test_requires_same_documents(self, tmp_path):
+        """Tests that an answer isn't reused when other documents are retrieved."""
+        from search.answer_cache import AnswerCache
+
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+        cache.put("What is FastAPI?", [1.0, 0.0], "A web framework", ["doc2", "doc1"], "v1")
+
+        assert cache.lookup("What is FastAPI?", [1.0, 0.0], ["doc1", "doc2"], "v1") is not None
+        assert cache.lookup("What is FastAPI?", [1.0, 0.0], ["doc3", "doc2"], "v1") is None
+        assert cache.stats()["rejected"] == 1
+
+    def test_ttl_and_index_rebuild(self, tmp_path):
+        """Tests that entries expire and are dropped when the index changes."""
+        from search.answer_cache import AnswerCache
+
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"), ttl=10)
+        with patch("search.answer_cache.time.time", return_value=0.0):
+            cache.put("question", [1.0, 0.0], "answer", ["doc1"], "v1")
+        with patch("search.answer_cache.time.time", return_value=11.0):
+            assert cache.lookup("question", [1.0, 0.0], ["doc1"], "v1") is None
+
+        cache.put("question", [1.0, 0.0], "answer", ["doc1"], "v1")
+        assert cache.lookup("question", [1.0, 0.0], ["doc1"], "v2") is None
+        assert len(cache) == 0
+        assert cache.stats()["invalidated"] == 1
+
+    def test_sees_entries_of_other_processes(self, tmp_path):
+        """Tests that entries written through another connection are searched."""
+        from search.answer_cache import AnswerCache
+
+        path = str(tmp_path / "answers.sqlite")
+        reader = AnswerCache(path, threshold=0.9)
+        writer = AnswerCache(path, threshold=0.9)
+        writer.put("What is FastAPI?", [1.0, 0.0], "A web framework", ["doc2"], "v1")
+        assert reader.lookup("Tell me about FastAPI", [0.99, 0.1], ["doc2"], "v1") is not None
+
+        writer.put("What is Python?", [0.0, 1.0], "A language", ["doc1"], "v1")
+        semantic = reader.lookup("Tell me about Python", [0.1, 0.99], ["doc1"], "v1")
+        assert semantic["answer"] == "A language"
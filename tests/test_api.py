@@ -0,0 +1,165 @@
+"""Tests for the REST API."""
+
+from unittest.mock import AsyncMock, MagicMock
+
+import pytest
+
+
+@pytest.fixture
+def client():
+    """API client with a mocked Temporal client (the lifespan is not run)."""
+    from fastapi.testclient import TestClient
+
+    from api.main import app
+
+    app.state.temporal_client = MagicMock()
+    return TestClient(app)
+
+
+class TestAskEndpoint:
+    """Tests for POST /ask."""
+
+    def test_answers_in_one_call(self, client):
+        """Tests that the prompt is sent as an update-with-start and its answer returned."""
+        from temporalio.common import WorkflowIDConflictPolicy
+
+        from api.main import app
+
+        temporal = app.state.temporal_client
+        temporal.execute_update_with_start_workflow = AsyncMock(
+            return_value={"answer": "42", "version": 2}
+        )
+
+        response = client.post("/ask", json={"prompt": "question", "workflow_id": "qna-1"})
+
+        assert response.status_code == 200
+        assert response.json() == {"workflow_id": "qna-1", "answer": "42", "version": 2}
+        call = temporal.execute_update_with_start_workflow.await_args
+        assert call.args[1].query == "question"
+        operation = call.kwargs["start_workflow_operation"]
+        assert operation._start_workflow_input.id == "qna-1"
+        assert operation._start_workflow_input.id_conflict_policy == (
+            WorkflowIDConflictPolicy.USE_EXISTING
+        )
+
+    def test_starts_sessions_on_the_workers_task_queue(self, client, monkeypatch):
+        """Tests that sessions start on TEMPORAL_TASK_QUEUE, the queue the workers poll."""
+        from api import main
+
+        monkeypatch.setattr(main.TEMPORAL_CONFIG, "task_queue", "custom-queue")
+        temporal = main.app.state.temporal_client
+        temporal.execute_update_with_start_workflow = AsyncMock(
+            return_value={"answer": "42", "version": 1}
+        )
+        temporal.start_workflow = AsyncMock(return_value=MagicMock(id="qna-2", run_id="r"))
+
+        client.post("/ask", json={"prompt": "question", "workflow_id": "qna-1"})
+        client.post("/workflows/start", json={"workflow_id": "qna-2"})
+
+        operation = temporal.execute_update_with_start_workflow.await_args.kwargs[
+            "start_workflow_operation"
+        ]
+        assert operation._start_workflow_input.task_queue == "custom-queue"
+        assert temporal.start_workflow.await_args.kwargs["task_queue"] == "custom-queue"
+
+    def test_retries_while_continuing_as_new(self, client, monkeypatch):
+        """Tests that a rejection during continue-as-new is retried and a closed chat is a 409."""
+        from temporalio.client import WorkflowUpdateFailedError
+        from temporalio.exceptions import ApplicationError
+
+        import api.main
+        from workflows.workflow import ASK_REJECTED_CHAT_ENDED, ASK_REJECTED_CONTINUING_AS_NEW
+
+        def rejected(error_type):
+            return WorkflowUpdateFailedError(ApplicationError("rejected", type=error_type))
+
+        monkeypatch.setattr(api.main, "ASK_RETRY_DELAY_SECONDS", 0)
+        temporal = api.main.app.state.temporal_client
+        temporal.execute_update_with_start_workflow = AsyncMock(
+            side_effect=[rejected(ASK_REJECTED_CONTINUING_AS_NEW), {"answer": "ok", "version": 1}]
+        )
+        assert client.post("/ask", json={"prompt": "q"}).json()["answer"] == "ok"
+
+        temporal.execute_update_with_start_workflow = AsyncMock(
+            side_effect=rejected(ASK_REJECTED_CHAT_ENDED)
+        )
+        assert client.post("/ask", json={"prompt": "q"}).status_code == 409
+
+
+class TestListWorkflows:
+    """Tests for GET /workflows."""
+
+    def test_visibility_query(self):
+        """Tests that filters become a visibility query and unsafe values are refused."""
+        from datetime import datetime, timezone
+
+        from fastapi import HTTPException
+
+        from api.main import build_visibility_query
+
+        query = build_visibility_query(
+            "QnAWorkflow",
+            "Running",
+            started_after=datetime(2024, 1, 1, tzinfo=timezone.utc),
+            search_attributes=["CustomerId=acme"],
+        )
+        assert query == (
+            "ExecutionStatus = 'Running' and WorkflowType = 'QnAWorkflow'"
+            " and StartTime >= '2024-01-01T00:00:00Z' and CustomerId = 'acme'"
+        )
+        assert build_visibility_query() == ""
+        with pytest.raises(HTTPException):
+            build_visibility_query(workflow_type="x' or 1=1")
+        with pytest.raises(HTTPException):
+            build_visibility_query(search_attributes=["no value"])
+
+    def test_returns_one_page(self, client):
+        """Tests that a single page is fetched and its token returned for the next one."""
+        import base64
+
+        from api.main import app
+
+        page = MagicMock()
+        page.fetch_next_page = AsyncMock()
+        page.current_page = [MagicMock(id="qna-1", run_id="r1", start_time=None)]
+        page.current_page[0].status.name = "RUNNING"
+        page.next_page_token = b"\x00next"
+        temporal = app.state.temporal_client
+        temporal.list_workflows.return_value = page
+
+        first = client.get("/workflows", params={"page_size": 1}).json()
+        token = first["next_page_token"]
+        client.get("/workflows", params={"page_size": 1, "page_token": token})
+
+        assert first["workflow_ids"] == ["qna-1"]
+        assert first["workflows"][0]["status"] == "RUNNING"
+        assert base64.urlsafe_b64decode(token) == b"\x00next"
+        assert temporal.list_workflows.call_args.kwargs == {
+            "page_size": 1,
+            "next_page_token": b"\x00next",
+        }
+        page.fetch_next_page.assert_awaited()
+        assert client.get("/workflows", params={"page_size": 5000}).status_code == 422
+
+    def test_count_only(self, client):
+        """Tests that count_only counts without listing."""
+        from api.main import app
+
+        temporal = app.state.temporal_client
+        temporal.count_workflows = AsyncMock(return_value=MagicMock(count=12345))
+
+        response = client.get("/workflows", params={"count_only": True, "status": ""})
+
+        assert response.json() == {"query": "WorkflowType = 'QnAWorkflow'", "count": 12345}
+        temporal.list_workflows.assert_not_called()
+
+
+class TestStreamEndpoint:
+    """Tests for GET /workflows/{workflow_id}/stream."""
+
+    def test_rejects_invalid_last_event_id(self, client):
+        """Tests that a malformed Last-Event-ID header is a client error."""
+        response = client.get("/workflows/qna-1/stream", headers={"Last-Event-ID": "abc"})
+
+        assert response.status_code == 400
+        assert "Last-Event-ID" in response.json()["detail"]
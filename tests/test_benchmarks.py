@@ -0,0 +1,45 @@
+"""Tests for the offline benchmark suite."""
+
+import pytest
+
+from benchmarks.search import FakeEmbedder, run_search_benchmark, synthetic_index
+
+
+class TestSearchBenchmark:
+    """Tests for the search benchmark."""
+
+    def test_fake_embedder_is_deterministic(self):
+        """Unknown texts always get the same embedding."""
+        embedder = FakeEmbedder(dim=8)
+
+        assert embedder.embed("hello") == FakeEmbedder(dim=8).embed("hello")
+        assert embedder.embed("hello") != embedder.embed("world")
+        assert len(embedder.embed("hello")) == 8
+
+    @pytest.mark.asyncio
+    async def test_reports_every_engine(self):
+        """A tiny run reports latency percentiles, throughput and IVF recall."""
+        import mcp_server
+
+        original_index = mcp_server.search_index
+        with synthetic_index(n_docs=200, dim=16, n_queries=10) as index:
+            assert len(index.store) == 200
+            assert mcp_server.search_index is not original_index
+            report = await run_search_benchmark(index, concurrency=2, nprobes=(2,))
+
+        assert mcp_server.search_index is original_index
+        engines = report["engines"]
+        assert set(engines) == {
+            "azure_ai_search",
+            "azure_ai_search_batch",
+            "azure_ai_search_lexical",
+            "azure_ai_search_hybrid",
+            "score_query_exact",
+            "score_query_ivf_nprobe_2",
+            "quantized_int8",
+        }
+        assert engines["azure_ai_search"]["calls"] == 10
+        assert engines["azure_ai_search"]["p50_ms"] <= engines["azure_ai_search"]["p99_ms"]
+        assert engines["score_query_exact"]["throughput_qps"] > 0
+        assert 0.0 <= engines["score_query_ivf_nprobe_2"]["recall_at_k"] <= 1.0
+        assert engines["quantized_int8"]["index_bytes"] < engines["quantized_int8"]["float32_bytes"]
@@ -0,0 +1,92 @@
+"""Tests for the BM25 lexical index."""
+
+import json
+
+import numpy as np
+
+
+class TestBM25Index:
+    """Tests for BM25Index."""
+
+    def test_ranks_exact_identifiers_first(self):
+        """Tests that rare query terms outweigh common ones."""
+        from search.bm25 import BM25Index
+
+        index = BM25Index.build(
+            [
+                "Install the package with pip",
+                "Error E1042 means the package cache is corrupted",
+                "The package manager resolves dependencies",
+            ]
+        )
+
+        indices, scores = index.search("what does E1042 mean for my package", top_k=3)
+
+        assert indices[0] == 1
+        assert len(indices) == 3
+        assert scores[0] > scores[1]
+
+    def test_no_shared_terms(self):
+        """Tests that documents sharing no term with the query are not returned."""
+        from search.bm25 import BM25Index
+
+        index = BM25Index.build(["alpha beta", "gamma delta"])
+
+        indices, _ = index.search("epsilon", top_k=2)
+        assert len(indices) == 0
+        assert list(index.search("Gamma", top_k=2)[0]) == [1]
+
+    def test_sparse_and_dense_accumulation_agree(self, monkeypatch):
+        """Tests that rare terms (sparse path) score like common ones (dense path)."""
+        import search.bm25
+        from search.bm25 import BM25Index
+
+        chunks = [f"filler text number{i}" for i in range(100)]
+        chunks[57] += " rare"
+        chunks[58] += " rare rare"
+        index = BM25Index.build(chunks)
+
+        sparse = index.search("rare number3", top_k=3)
+        monkeypatch.setattr(search.bm25, "DENSE_ACCUMULATION_RATIO", 1000)
+        dense = index.search("rare number3", top_k=3)
+
+        assert list(sparse[0]) == list(dense[0]) == [58, 3, 57]
+        np.testing.assert_allclose(sparse[1], dense[1], rtol=1e-6)
+
+    def test_built_with_the_store(self, tmp_path):
+        """Tests that building the store builds a matching BM25 index."""
+        from search.bm25 import BM25Index, bm25_path
+        from search.vector_store import VectorStore, build_vector_store
+
+        source = tmp_path / "search_index.json"
+        documents = [
+            {"id": "a", "chunk": "temporal workflows", "embedding": [1.0, 0.0]},
+            {"id": "b", "chunk": "fastapi endpoints", "embedding": [0.0, 1.0]},
+        ]
+        source.write_text(json.dumps(documents))
+        build_vector_store(str(source))
+
+        assert bm25_path(str(source)).exists()
+        store = VectorStore.load(str(source))
+        assert list(store.bm25.search("fastapi", top_k=1)[0]) == [1]
+
+        BM25Index.build(["stale"], store_fingerprint="other").save(str(source))
+        assert VectorStore.load(str(source)).bm25 is None
+
+    def test_streamed_batches_match_one_pass_build(self):
+        """Tests that postings collected batch by batch give the same index."""
+        from search.bm25 import BM25Builder, BM25Index
+
+        chunks = [f"doc {i} term{i % 7} shared words" for i in range(40)]
+        chunks[11] += " rare"
+        builder = BM25Builder()
+        for start in range(0, len(chunks), 3):
+            builder.add(chunks[start : start + 3])
+        streamed = builder.build(store_fingerprint="fp")
+        built = BM25Index.build(chunks, store_fingerprint="fp")
+
+        assert streamed.terms == built.terms
+        np.testing.assert_array_equal(streamed.offsets, built.offsets)
+        np.testing.assert_array_equal(streamed.doc_indices, built.doc_indices)
+        np.testing.assert_allclose(streamed.weights, built.weights)
+        assert list(streamed.search("rare", top_k=1)[0]) == [11]
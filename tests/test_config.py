@@ -40,3 +40,45 @@ class TestConfig:
 
         with pytest.raises(ValueError, match="AZURE_API_BASE"):
             config.validate()
+
+    @patch.dict(
+        os.environ,
+        {
+            "TEMPORAL_TASK_QUEUE": "agent",
+            "TEMPORAL_MODEL_TASK_QUEUE": "agent-llm",
+            "TEMPORAL_MODEL_TIMEOUT": "120",
+            "TEMPORAL_MAX_CONCURRENT_MODEL_ACTIVITIES": "8",
+        },
+    )
+    def test_temporal_worker_settings(self):
+        """Tests task queue fallbacks and worker tuning validation."""
+        from config import TemporalConfig
+
+        temporal = TemporalConfig.from_env()
+        assert temporal.model_queue == "agent-llm"
+        assert temporal.search_queue == "agent"
+        assert temporal.model_timeout == 120.0
+        assert temporal.max_concurrent_model_activities == 8
+        assert temporal.max_concurrent_activities is None
+        assert temporal.rag_mode == "agent"
+        assert temporal.answer_cache is False
+        temporal.validate()
+
+        temporal.tuner = "resource"
+        with pytest.raises(ValueError, match="TEMPORAL_TUNER=resource"):
+            temporal.validate()
+
+        temporal.tuner = "fixed"
+        temporal.rag_mode = "slow"
+        with pytest.raises(ValueError, match="TEMPORAL_RAG_MODE"):
+            temporal.validate()
+
+    @patch.dict(os.environ, {"CONTEXT_TOKEN_BUDGET": "500", "CONTEXT_DEDUP_THRESHOLD": "1.5"})
+    def test_context_settings(self):
+        """Tests context packing settings and their validation."""
+        from config import ContextConfig
+
+        context = ContextConfig.from_env()
+        assert context.token_budget == 500
+        with pytest.raises(ValueError, match="CONTEXT_DEDUP_THRESHOLD"):
+            context.validate()
@@ -0,0 +1,76 @@
+"""Tests for context packing."""
+
+
+class TestPackContext:
+    """Tests for search.context."""
+
+    def test_drops_near_duplicates_and_numbers_citations(self):
+        """Tests that overlapping chunks are dropped and refs follow the score order."""
+        from search.context import pack_context
+
+        base = "temporal workflows replay their event history to rebuild state after a crash"
+        documents = [
+            {"id": "b", "score": 0.5, "chunk": "activities run side effects such as API calls"},
+            {"id": "a", "score": 0.9, "chunk": base},
+            {"id": "a-copy", "score": 0.8, "chunk": base + " quickly"},
+        ]
+
+        packed = pack_context(documents, token_budget=1000, dedup_threshold=0.8)
+
+        assert [(doc["id"], doc["ref"]) for doc in packed] == [("a", 1), ("b", 2)]
+        assert packed[0]["chunk"] == base
+
+    def test_respects_the_token_budget(self):
+        """Tests that packing stops at the budget, truncating the last chunk that fits."""
+        from search.context import MIN_TRUNCATED_TOKENS, count_tokens, pack_context
+
+        chunks = [" ".join(f"word{doc}_{i}" for i in range(100)) for doc in range(3)]
+        documents = [
+            {"id": str(doc), "score": 1.0 - doc / 10, "chunk": chunk}
+            for doc, chunk in enumerate(chunks)
+        ]
+        budget = count_tokens(chunks[0]) + MIN_TRUNCATED_TOKENS + 10
+
+        packed = pack_context(documents, token_budget=budget)
+
+        assert [doc["id"] for doc in packed] == ["0", "1"]
+        assert packed[0]["chunk"] == chunks[0]
+        assert chunks[1].startswith(packed[1]["chunk"])
+        assert sum(count_tokens(doc["chunk"]) for doc in packed) <= budget
+
+    def test_skips_chunks_too_long_for_the_rest_of_the_budget(self):
+        """Tests that a lower ranked short chunk still fits after a long one is skipped."""
+        from search.context import count_tokens, pack_context
+
+        documents = [
+            {"id": "first", "score": 0.9, "chunk": "alpha beta gamma"},
+            {"id": "long", "score": 0.8, "chunk": "delta " * 500},
+            {"id": "short", "score": 0.7, "chunk": "epsilon zeta"},
+        ]
+
+        packed = pack_context(documents, token_budget=count_tokens("alpha beta gamma") + 5)
+
+        assert [doc["id"] for doc in packed] == ["first", "short"]
+
+    def test_approximate_token_count(self, monkeypatch):
+        """Tests the word/punctuation estimate used without tiktoken."""
+        import search.context
+
+        monkeypatch.setattr(search.context, "_encoding", lambda name: None)
+
+        assert search.context.count_tokens("Hello, world!") == 4
+        assert search.context.truncate_tokens("Hello, world!", 2) == "Hello,"
+
+    def test_activities_validate_the_context_config(self, monkeypatch):
+        """Tests that an invalid context configuration is rejected when loaded."""
+        import pytest
+
+        from activities.activities import get_context_config
+
+        monkeypatch.setenv("CONTEXT_TOKEN_BUDGET", "0")
+        get_context_config.cache_clear()
+        try:
+            with pytest.raises(ValueError, match="CONTEXT_TOKEN_BUDGET"):
+                get_context_config()
+        finally:
+            get_context_config.cache_clear()
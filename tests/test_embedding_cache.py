@@ -0,0 +1,27 @@
+"""Tests for the persistent embedding cache."""
+
+
+class TestEmbeddingCache:
+    """Tests for EmbeddingCache."""
+
+    def test_keyed_by_deployment_and_text(self, tmp_path):
+        """Tests that vectors are only reused for the same deployment and text."""
+        from search.embedding_cache import EmbeddingCache
+
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+        cache.put_many("small", [("hello", [0.5, 0.25]), ("world", [1.0, 0.0])])
+
+        assert cache.get_many("small", ["hello", "world", "new"]) == {
+            "hello": [0.5, 0.25],
+            "world": [1.0, 0.0],
+        }
+        assert cache.get("large", "hello") is None
+
+    def test_persists_across_instances(self, tmp_path):
+        """Tests that a new process sees previously stored vectors."""
+        from search.embedding_cache import EmbeddingCache
+
+        path = str(tmp_path / "cache.sqlite")
+        EmbeddingCache(path).put_many("small", [("hello", [0.5, 0.25])])
+
+        assert EmbeddingCache(path).get("small", "hello") == [0.5, 0.25]
@@ -0,0 +1,207 @@
+"""Tests for index embedding generation against a local fake endpoint."""
+
+import json
+import threading
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+import pytest
+
+
+class FakeEmbeddingsHandler(BaseHTTPRequestHandler):
+    """Azure-style embeddings endpoint that throttles the first request."""
+
+    def do_POST(self):
+        server = self.server
+        body = json.loads(self.rfile.read(int(self.headers["Content-Length"])))
+        with server.lock:
+            throttle = server.throttle_next
+            server.throttle_next = False
+            if not throttle:
+                server.requests.append(body["input"])
+
+        if throttle:
+            payload = json.dumps({"error": {"code": "429", "message": "Too many requests"}})
+            self.send_response(429)
+            self.send_header("Retry-After", "0")
+        else:
+            payload = json.dumps(
+                {
+                    "object": "list",
+                    "model": "fake",
+                    "data": [
+                        {"object": "embedding", "index": i, "embedding": [float(len(text)), 1.0]}
+                        for i, text in enumerate(body["input"])
+                    ],
+                    "usage": {"prompt_tokens": 0, "total_tokens": 0},
+                }
+            )
+            self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(payload)))
+        self.end_headers()
+        self.wfile.write(payload.encode("utf-8"))
+
+    def log_message(self, *args):
+        pass
+
+
+@pytest.fixture
+def fake_endpoint():
+    """Runs the fake embeddings endpoint on a free local port."""
+    server = ThreadingHTTPServer(("127.0.0.1", 0), FakeEmbeddingsHandler)
+    server.lock = threading.Lock()
+    server.requests = []
+    server.throttle_next = True
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    yield server
+    server.shutdown()
+
+
+@pytest.fixture
+def embeddings_client(fake_endpoint):
+    """Azure OpenAI client pointed at the fake endpoint."""
+    from openai import AsyncAzureOpenAI
+
+    host, port = fake_endpoint.server_address
+    return AsyncAzureOpenAI(
+        azure_endpoint=f"http://{host}:{port}",
+        api_key="test-key",
+        api_version="2024-02-01",
+        max_retries=0,
+    )
+
+
+class TestGenerateEmbeddings:
+    """Tests for database/utils.py."""
+
+    @pytest.fixture
+    def source(self, tmp_path):
+        documents = [{"id": i, "chunk": "x" * (i + 1)} for i in range(10)]
+        path = tmp_path / "index.json"
+        path.write_text(json.dumps(documents))
+        return path
+
+    @pytest.mark.asyncio
+    async def test_batches_and_retries(self, source, tmp_path, fake_endpoint, embeddings_client):
+        """Tests that chunks are embedded in batches and throttled calls are retried."""
+        from database.utils import generate_embeddings_async
+
+        output = tmp_path / "search_index.json"
+        await generate_embeddings_async(
+            source=str(source),
+            output=str(output),
+            batch_size=4,
+            concurrency=2,
+            client=embeddings_client,
+        )
+
+        documents = json.loads(output.read_text())
+        assert [doc["embedding"][0] for doc in documents] == [float(i + 1) for i in range(10)]
+        # 3 batches; the throttled attempt was retried
+        assert len(fake_endpoint.requests) == 3
+        assert not fake_endpoint.throttle_next
+        assert not (tmp_path / "search_index.json.checkpoint.sqlite").exists()
+        assert (tmp_path / "search_index.store.json").exists()
+
+    @pytest.mark.asyncio
+    async def test_resumes_from_checkpoint(self, source, tmp_path, fake_endpoint, embeddings_client):
+        """Tests that chunks embedded by a crashed run are not requested again."""
+        from database.utils import AZURE_EMBEDDINGS_DEPLOYMENT, generate_embeddings_async
+        from search.embedding_cache import EmbeddingCache
+
+        output = tmp_path / "search_index.json"
+        checkpoint = EmbeddingCache(str(tmp_path / "search_index.json.checkpoint.sqlite"))
+        checkpoint.put_many(
+            AZURE_EMBEDDINGS_DEPLOYMENT, [("x" * (i + 1), [-1.0, 1.0]) for i in range(8)]
+        )
+        checkpoint.close()
+
+        await generate_embeddings_async(
+            source=str(source), output=str(output), batch_size=4, client=embeddings_client
+        )
+
+        requested = [text for batch in fake_endpoint.requests for text in batch]
+        assert sorted(set(requested)) == ["x" * 9, "x" * 10]
+        documents = json.loads(output.read_text())
+        assert documents[0]["embedding"] == [-1.0, 1.0]
+        assert documents[9]["embedding"] == [10.0, 1.0]
+
+    @pytest.mark.asyncio
+    async def test_failed_run_keeps_previous_index(
+        self, source, tmp_path, fake_endpoint, embeddings_client
+    ):
+        """Tests that a run failing partway leaves the previous index in place."""
+        from database.utils import generate_embeddings_async
+        from search.vector_store import VectorStore
+
+        output = tmp_path / "search_index.json"
+        await generate_embeddings_async(
+            source=str(source), output=str(output), batch_size=4, client=embeddings_client
+        )
+        previous = output.read_text()
+
+        # Documents after the first batch have no chunk: the run fails midway
+        broken = [{"id": i, "chunk": "y" * (i + 1)} for i in range(4)] + [{"id": 4}]
+        source.write_text(json.dumps(broken))
+        with pytest.raises(KeyError):
+            await generate_embeddings_async(
+                source=str(source),
+                output=str(output),
+                batch_size=4,
+                concurrency=1,
+                client=embeddings_client,
+            )
+
+        assert output.read_text() == previous
+        assert len(VectorStore.load(str(output))) == 10
+        assert not [path for path in tmp_path.iterdir() if ".tmp" in path.name]
+
+    @pytest.mark.asyncio
+    async def test_streams_jsonl(self, tmp_path, fake_endpoint, embeddings_client):
+        """Tests JSONL input/output and that the binary store is written alongside."""
+        from database.utils import generate_embeddings_async
+        from search.vector_store import VectorStore
+
+        source = tmp_path / "index.jsonl"
+        source.write_text(
+            "".join(json.dumps({"id": f"d{i}", "chunk": "y" * (i + 1)}) + "\n" for i in range(5))
+        )
+        output = tmp_path / "search_index.jsonl"
+
+        await generate_embeddings_async(
+            source=str(source), output=str(output), batch_size=2, client=embeddings_client
+        )
+
+        lines = output.read_text().splitlines()
+        assert [json.loads(line)["id"] for line in lines] == [f"d{i}" for i in range(5)]
+        store = VectorStore.load(str(output))
+        assert store.ids == [f"d{i}" for i in range(5)]
+        assert store.embeddings.shape == (5, 2)
+
+    @pytest.mark.asyncio
+    async def test_cache_skips_unchanged_chunks(
+        self, source, tmp_path, fake_endpoint, embeddings_client
+    ):
+        """Tests that a re-index only embeds chunks whose text changed."""
+        from database.utils import generate_embeddings_async
+        from search.embedding_cache import EmbeddingCache
+
+        output = tmp_path / "search_index.json"
+        cache = EmbeddingCache(str(tmp_path / "cache.sqlite"))
+        await generate_embeddings_async(
+            source=str(source), output=str(output), client=embeddings_client, cache=cache
+        )
+        assert len(cache) == 10
+
+        documents = json.loads(source.read_text())
+        documents[3]["chunk"] = "edited chunk"
+        source.write_text(json.dumps(documents))
+        fake_endpoint.requests.clear()
+
+        await generate_embeddings_async(
+            source=str(source), output=str(output), client=embeddings_client, cache=cache
+        )
+
+        assert fake_endpoint.requests == [["edited chunk"]]
+        assert json.loads(output.read_text())[3]["embedding"] == [12.0, 1.0]
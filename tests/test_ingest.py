@@ -0,0 +1,78 @@
+"""Tests for streaming document ingestion."""
+
+import io
+import json
+
+import pytest
+
+
+class TestIngest:
+    """Tests for the search.ingest module."""
+
+    def test_iter_json_array_with_small_reads(self):
+        """Tests incremental parsing when items straddle read boundaries."""
+        from search.ingest import iter_json_array
+
+        items = [{"id": i, "chunk": "text " * i, "embedding": [0.5, -1.25e-3]} for i in range(20)]
+        items.append(12345)
+
+        parsed = list(iter_json_array(io.StringIO(json.dumps(items, indent=2)), chunk_size=7))
+
+        assert parsed == items
+
+    def test_iter_json_array_rejects_non_arrays(self):
+        """Tests that only a top-level array is accepted."""
+        from search.ingest import iter_json_array
+
+        with pytest.raises(ValueError):
+            list(iter_json_array(io.StringIO('{"id": 1}')))
+
+    def test_document_writer_roundtrip(self, tmp_path):
+        """Tests that written JSON and JSONL files stream back unchanged."""
+        from search.ingest import DocumentWriter, iter_documents
+
+        documents = [{"id": i, "chunk": f"doc {i}"} for i in range(3)]
+        for name in ("out.json", "out.jsonl"):
+            path = str(tmp_path / name)
+            with DocumentWriter(path) as writer:
+                for doc in documents:
+                    writer.write(doc)
+            assert list(iter_documents(path)) == documents
+
+    def test_document_writer_keeps_file_on_error(self, tmp_path):
+        """Tests that a failed write leaves the previous file untouched."""
+        from search.ingest import DocumentWriter, iter_documents
+
+        path = str(tmp_path / "out.json")
+        with DocumentWriter(path) as writer:
+            writer.write({"id": 1})
+
+        with pytest.raises(RuntimeError):
+            with DocumentWriter(path) as writer:
+                writer.write({"id": 2})
+                raise RuntimeError("crash")
+
+        assert list(iter_documents(path)) == [{"id": 1}]
+        assert [p.name for p in tmp_path.iterdir()] == ["out.json"]
+
+    def test_document_writer_keeps_permissions(self, tmp_path):
+        """Tests that the swapped-in file keeps the mode of the one it replaces."""
+        import os
+        import stat
+
+        from search.ingest import DocumentWriter
+
+        path = tmp_path / "out.json"
+        with DocumentWriter(str(path)) as writer:
+            writer.write({"id": 1})
+        assert stat.S_IMODE(path.stat().st_mode) == 0o644
+
+        path.chmod(0o640)
+        umask = os.umask(0o077)
+        try:
+            with DocumentWriter(str(path)) as writer:
+                writer.write({"id": 2})
+            assert os.umask(umask) == 0o077
+        finally:
+            os.umask(umask)
+        assert stat.S_IMODE(path.stat().st_mode) == 0o640
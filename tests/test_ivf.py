@@ -0,0 +1,67 @@
+"""Tests for the IVF approximate nearest neighbour index."""
+
+import json
+
+import numpy as np
+import pytest
+
+
+def _clustered_embeddings(n_clusters=8, per_cluster=50, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    points = np.repeat(centers, per_cluster, axis=0)
+    return points + rng.normal(scale=0.1, size=points.shape)
+
+
+class TestIVFIndex:
+    """Tests for IVFIndex."""
+
+    def test_recall_against_exact_search(self):
+        """Tests that probing every list is exact and few lists keep high recall."""
+        from search.ivf import IVFIndex, recall_at_k
+        from search.scoring import normalize_rows
+
+        embeddings = normalize_rows(_clustered_embeddings())
+        index = IVFIndex.build(embeddings, n_lists=8)
+        queries = embeddings[::25]
+
+        assert recall_at_k(index, embeddings, queries, top_k=10, nprobe=8) == 1.0
+        assert recall_at_k(index, embeddings, queries, top_k=10, nprobe=2) >= 0.9
+
+    def test_store_attaches_matching_index_only(self, tmp_path):
+        """Tests that an IVF index is only used with the store it was built for."""
+        from search.ivf import IVFIndex
+        from search.vector_store import VectorStore, build_vector_store
+
+        source = tmp_path / "search_index.json"
+        documents = [
+            {"id": i, "chunk": f"doc {i}", "embedding": row.tolist()}
+            for i, row in enumerate(_clustered_embeddings(per_cluster=5))
+        ]
+        source.write_text(json.dumps(documents))
+        store = build_vector_store(str(source))
+        IVFIndex.build(store.embeddings, store_fingerprint=store.fingerprint).save(str(source))
+
+        assert VectorStore.load(str(source)).ivf is not None
+
+        source.write_text(json.dumps(documents[:-1]))
+        build_vector_store(str(source))
+        assert VectorStore.load(str(source)).ivf is None
+
+    def test_recall_refuses_stale_index(self, tmp_path, monkeypatch):
+        """Tests that --recall asks for a rebuild instead of loading an index of another store."""
+        from search import ivf
+        from search.vector_store import build_vector_store
+
+        source = tmp_path / "search_index.json"
+        documents = [
+            {"id": i, "chunk": f"doc {i}", "embedding": row.tolist()}
+            for i, row in enumerate(_clustered_embeddings(per_cluster=5))
+        ]
+        source.write_text(json.dumps(documents))
+        store = build_vector_store(str(source))
+        ivf.IVFIndex.build(store.embeddings, store_fingerprint="other").save(str(source))
+
+        monkeypatch.setattr("sys.argv", ["ivf", str(source), "--recall"])
+        with pytest.raises(SystemExit, match="stale"):
+            ivf.main()
@@ -0,0 +1,64 @@
+"""Tests for the pooled MCP client."""
+
+import pytest
+
+
+@pytest.fixture
+def echo_server():
+    """In-memory MCP server with a single tool."""
+    from fastmcp import FastMCP
+
+    server = FastMCP("EchoMCP")
+
+    @server.tool()
+    def echo(text: str) -> str:
+        return text
+
+    return server
+
+
+class TestMCPClientPool:
+    """Tests for MCPClientPool."""
+
+    @pytest.mark.asyncio
+    async def test_sessions_are_reused(self, echo_server):
+        """Tests that a returned session is lent out again instead of reopened."""
+        from activities.mcp_pool import MCPClientPool
+
+        pool = MCPClientPool(echo_server, size=2)
+        try:
+            async with pool.session() as first:
+                resp = await first.call_tool("echo", {"text": "hi"})
+                assert resp.content[0].text == "hi"
+            async with pool.session() as second:
+                assert second is first
+        finally:
+            await pool.close()
+
+    @pytest.mark.asyncio
+    async def test_failed_session_is_recycled(self, echo_server):
+        """Tests that a session is discarded after a transport-level failure."""
+        from activities.mcp_pool import MCPClientPool
+
+        pool = MCPClientPool(echo_server, size=1)
+        try:
+            with pytest.raises(ConnectionError):
+                async with pool.session() as broken:
+                    raise ConnectionError("lost connection")
+            async with pool.session() as replacement:
+                assert replacement is not broken
+                resp = await replacement.call_tool("echo", {"text": "ok"})
+                assert resp.content[0].text == "ok"
+        finally:
+            await pool.close()
+
+    def test_process_pool_validates_config(self, monkeypatch):
+        """Tests that the process-wide pool isn't built from an invalid configuration."""
+        from activities import mcp_pool
+
+        monkeypatch.setattr(mcp_pool, "_pool", None)
+        monkeypatch.setenv("MCP_POOL_SIZE", "0")
+
+        with pytest.raises(ValueError, match="MCP_POOL_SIZE"):
+            mcp_pool.get_mcp_pool()
+        assert mcp_pool._pool is None
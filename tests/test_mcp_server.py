@@ -1,7 +1,7 @@
 """Tests for the MCP Server."""
 
 import json
-from unittest.mock import MagicMock, patch
+from unittest.mock import AsyncMock, MagicMock, patch
 
 import pytest
 
@@ -12,12 +12,27 @@ class TestMCPServer:
     @pytest.fixture
     def mock_openai_client(self):
         """Mock for OpenAI client."""
+        import mcp_server
+
+        mcp_server.query_cache.clear()
         with patch("mcp_server.openai_client_async_max") as mock:
             mock.embeddings.create.return_value = MagicMock(
                 data=[MagicMock(embedding=[0.1, 0.2, 0.3])]
             )
             yield mock
 
+    @pytest.fixture
+    def mock_async_openai_client(self):
+        """Mock for the async OpenAI client."""
+        import mcp_server
+
+        mcp_server.query_cache.clear()
+        with patch("mcp_server.async_openai_client") as mock:
+            mock.embeddings.create = AsyncMock(
+                return_value=MagicMock(data=[MagicMock(embedding=[0.1, 0.2, 0.3])])
+            )
+            yield mock
+
     @pytest.fixture
     def sample_index(self, tmp_path):
         """Creates a test index."""
@@ -45,6 +60,38 @@ class TestMCPServer:
         assert result == [0.1, 0.2, 0.3]
         mock_openai_client.embeddings.create.assert_called_once()
 
+    def test_get_embedding_is_cached(self, mock_openai_client):
+        """Tests that a repeated query does not call the API again."""
+        from mcp_server import get_embedding, query_cache
+
+        get_embedding("same question")
+        result = get_embedding("same question")
+
+        assert result == [0.1, 0.2, 0.3]
+        mock_openai_client.embeddings.create.assert_called_once()
+        assert query_cache.stats()["hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_batch_search_embeds_once(self, mock_async_openai_client, sample_index):
+        """Tests that a batch of queries uses one embeddings call and can be fused."""
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        mock_async_openai_client.embeddings.create.return_value = MagicMock(
+            data=[
+                MagicMock(index=0, embedding=[0.1, 0.2, 0.3]),
+                MagicMock(index=1, embedding=[0.15, 0.25, 0.35]),
+            ]
+        )
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            response = await mcp_server.azure_ai_search_batch(
+                ["python", "web framework"], top_k=1, fuse=True
+            )
+
+        mock_async_openai_client.embeddings.create.assert_awaited_once()
+        assert [r[0]["id"] for r in response["results"]] == ["doc1", "doc2"]
+        assert len(response["fused"]) == 1
+
     def test_cosine_similarity(self):
         """Tests cosine similarity calculation."""
         from mcp_server import numpy_cosine_similarity
@@ -57,3 +104,153 @@ class TestMCPServer:
         emb3 = [0.0, 1.0, 0.0]
         similarity2 = numpy_cosine_similarity(emb1, emb3)
         assert abs(similarity2 - 0.0) < 0.001
+
+    @pytest.mark.asyncio
+    async def test_azure_ai_search_uses_resident_index(
+        self, mock_async_openai_client, sample_index
+    ):
+        """Tests that search ranks documents from the resident index."""
+        from prometheus_client import generate_latest
+
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            results = await mcp_server.azure_ai_search("python", top_k=1)
+
+        assert len(results) == 1
+        assert results[0]["id"] == "doc1"
+        assert results[0]["chunk"] == "Python is a programming language"
+        mock_async_openai_client.embeddings.create.assert_awaited_once()
+
+        metrics = generate_latest().decode()
+        assert 'search_embedding_seconds_count{call="single"}' in metrics
+        assert 'search_scoring_seconds_count{mode="exact"}' in metrics
+
+    @pytest.mark.asyncio
+    async def test_concurrent_searches_share_cached_embedding(
+        self, mock_async_openai_client, sample_index
+    ):
+        """Tests that concurrent searches run on one event loop and reuse the cache."""
+        import asyncio
+
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            await mcp_server.azure_ai_search("python")
+            results = await asyncio.gather(
+                *(mcp_server.azure_ai_search("python", top_k=2) for _ in range(5))
+            )
+
+        assert all([r["id"] for r in result] == ["doc1", "doc2"] for result in results)
+        mock_async_openai_client.embeddings.create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_lexical_search_skips_embedding(self, mock_async_openai_client, sample_index):
+        """Tests that lexical mode ranks with BM25 without calling the embeddings API."""
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            results = await mcp_server.azure_ai_search("FastAPI", top_k=2, mode="lexical")
+
+        assert [r["id"] for r in results] == ["doc2"]
+        mock_async_openai_client.embeddings.create.assert_not_awaited()
+
+    @pytest.mark.asyncio
+    async def test_hybrid_search_fuses_rankings(self, mock_async_openai_client, sample_index):
+        """Tests that hybrid mode promotes the lexical match over the vector one."""
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            rrf = await mcp_server.azure_ai_search("web framework", top_k=2, mode="hybrid")
+            weighted = await mcp_server.azure_ai_search(
+                "web framework", top_k=2, mode="hybrid", fusion="weighted", alpha=0.2
+            )
+            with pytest.raises(ValueError):
+                await mcp_server.azure_ai_search("web framework", mode="fuzzy")
+
+        # The embedding is closest to doc1; BM25 only matches doc2
+        assert [r["id"] for r in rrf] == ["doc2", "doc1"]
+        assert weighted[0]["id"] == "doc2"
+        mock_async_openai_client.embeddings.create.assert_awaited_once()
+
+    @pytest.mark.asyncio
+    async def test_search_filters_on_metadata(self, mock_async_openai_client, tmp_path):
+        """Tests that filtered searches only return documents with matching metadata."""
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        index_file = tmp_path / "filtered_index.json"
+        index_file.write_text(
+            json.dumps(
+                [
+                    {
+                        "id": "doc1",
+                        "chunk": "Python web framework",
+                        "embedding": [0.1, 0.2, 0.3],
+                        "metadata": {"language": "python", "tags": ["web"]},
+                    },
+                    {
+                        "id": "doc2",
+                        "chunk": "Rust web framework",
+                        "embedding": [0.15, 0.25, 0.35],
+                        "metadata": {"language": "rust", "tags": ["web", "async"]},
+                    },
+                ]
+            )
+        )
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(str(index_file))):
+            vector = await mcp_server.azure_ai_search(
+                "framework", top_k=2, filters={"language": "rust"}
+            )
+            lexical = await mcp_server.azure_ai_search(
+                "framework", top_k=2, mode="lexical", filters={"tags": "web"}
+            )
+            hybrid = await mcp_server.azure_ai_search(
+                "framework", top_k=2, mode="hybrid", filters={"tags": ["async"]}
+            )
+            batch = await mcp_server.azure_ai_search_batch(
+                ["framework"], top_k=2, filters={"language": "go"}
+            )
+
+        assert [r["id"] for r in vector] == ["doc2"]
+        assert {r["id"] for r in lexical} == {"doc1", "doc2"}
+        assert [r["id"] for r in hybrid] == ["doc2"]
+        assert batch["results"] == [[]]
+
+    @pytest.mark.asyncio
+    async def test_rerank_over_fetches(self, mock_async_openai_client, sample_index):
+        """Tests that re-ranking scores the over-fetched candidates and keeps top_k."""
+        import mcp_server
+        from search.vector_store import ResidentIndex
+
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)):
+            plain = await mcp_server.azure_ai_search("web framework", top_k=1)
+            reranked = await mcp_server.azure_ai_search("web framework", top_k=1, rerank=True)
+
+        # The embedding is closest to doc1, only doc2 contains the query terms
+        assert [r["id"] for r in plain] == ["doc1"]
+        assert [r["id"] for r in reranked] == ["doc2"]
+
+    @pytest.mark.asyncio
+    async def test_answer_cache_tools(self, mock_async_openai_client, sample_index, tmp_path):
+        """Tests that a stored answer is served for the same question on the same index."""
+        import mcp_server
+        from search.answer_cache import AnswerCache
+        from search.vector_store import ResidentIndex
+
+        cache = AnswerCache(str(tmp_path / "answers.sqlite"))
+        with patch.object(mcp_server, "search_index", ResidentIndex(sample_index)), \
+                patch.object(mcp_server, "answer_cache", cache):
+            assert await mcp_server.answer_cache_lookup("What is Python?") == {"hit": False}
+            await mcp_server.answer_cache_store("What is Python?", "A language")
+            cached = await mcp_server.answer_cache_lookup("what is python")
+            stats = mcp_server.search_stats()
+
+        assert cached["hit"] is True
+        assert cached["answer"] == "A language"
+        assert stats["answer_cache"]["exact_hits"] == 1
@@ -0,0 +1,120 @@
+"""Tests for metadata columns and filtered search."""
+
+import json
+
+import numpy as np
+
+
+class TestMetadataColumns:
+    """Tests for MetadataColumns."""
+
+    ROWS = [
+        {"source": "docs", "language": "python", "version": 3.11, "tags": ["async", "http"]},
+        {"source": "blog", "language": "python", "version": "3.12", "tags": ["http"]},
+        {"source": "docs", "language": "rust"},
+        None,
+    ]
+
+    def test_mask(self):
+        """Tests AND across fields, OR within a list of values and tag membership."""
+        from search.metadata import MetadataColumns
+
+        columns = MetadataColumns.from_rows(self.ROWS)
+
+        assert columns.mask({}).tolist() == [True, True, True, True]
+        assert columns.mask({"language": "python"}).tolist() == [True, True, False, False]
+        assert columns.mask({"source": "docs", "language": "python"}).tolist() == [
+            True, False, False, False
+        ]
+        assert columns.mask({"version": ["3.11", 3.12]}).tolist() == [True, True, False, False]
+        assert columns.mask({"tags": "async"}).tolist() == [True, False, False, False]
+        assert columns.mask({"tags": ["async", "http"]}).tolist() == [True, True, False, False]
+
+    def test_unknown_field_or_value_matches_nothing(self):
+        """Tests that a filter on missing metadata selects no document."""
+        from search.metadata import MetadataColumns
+
+        columns = MetadataColumns.from_rows(self.ROWS)
+
+        assert not columns.mask({"author": "someone"}).any()
+        assert not columns.mask({"language": "go"}).any()
+
+    def test_rows_roundtrip(self, tmp_path):
+        """Tests that saved columns load back to the same metadata."""
+        from search.metadata import MetadataColumns
+
+        path = tmp_path / "index.metadata.npz"
+        MetadataColumns.from_rows(self.ROWS, "abc").save(path)
+        loaded = MetadataColumns.load(str(tmp_path / "index.json"))
+
+        assert loaded.store_fingerprint == "abc"
+        assert loaded.rows() == [
+            {"source": "docs", "language": "python", "version": "3.11", "tags": ["async", "http"]},
+            {"source": "blog", "language": "python", "version": "3.12", "tags": ["http"]},
+            {"source": "docs", "language": "rust"},
+            {},
+        ]
+
+    def test_built_with_the_store(self, tmp_path):
+        """Tests that the metadata of index.json documents is attached to the store."""
+        from search.vector_store import VectorStore, build_vector_store
+
+        source = tmp_path / "index.json"
+        documents = [
+            {"id": f"doc{i}", "chunk": "text", "embedding": [1.0, float(i)], "metadata": row}
+            for i, row in enumerate(self.ROWS)
+        ]
+        source.write_text(json.dumps(documents))
+        build_vector_store(str(source))
+        store = VectorStore.load(str(source))
+
+        assert store.metadata is not None
+        assert store.metadata.mask({"language": "rust"}).tolist() == [False, False, True, False]
+
+
+class TestFilteredEngines:
+    """Tests that every engine only returns documents of the filter."""
+
+    def test_engines_respect_mask(self):
+        """Tests exact, batch, IVF, quantized and BM25 search under a mask."""
+        from search.bm25 import BM25Index
+        from search.ivf import IVFIndex
+        from search.quantization import QuantizedIndex
+        from search.scoring import cosine_top_k, cosine_top_k_batch, normalize_rows
+
+        rng = np.random.default_rng(0)
+        embeddings = normalize_rows(rng.standard_normal((400, 16)).astype(np.float32))
+        query = embeddings[7]
+        # Selective (gathered rows) and broad (masked scores) filters
+        for mask in (np.arange(400) % 10 == 3, np.arange(400) % 10 != 7):
+            allowed = set(np.flatnonzero(mask).tolist())
+
+            indices, scores = cosine_top_k(embeddings, query, 5, mask)
+            assert set(indices.tolist()) <= allowed and len(indices) == 5
+            assert list(scores) == sorted(scores, reverse=True)
+
+            for indices, _ in cosine_top_k_batch(embeddings, embeddings[:3], 5, mask):
+                assert set(indices.tolist()) <= allowed and len(indices) == 5
+
+            ivf = IVFIndex.build(embeddings, n_lists=8)
+            indices, _ = ivf.search(embeddings, query, 5, nprobe=8, mask=mask)
+            assert set(indices.tolist()) <= allowed
+
+            quantized = QuantizedIndex.build(embeddings, kind="int8")
+            indices, _ = quantized.search(embeddings, query, 5, candidates=20, mask=mask)
+            assert set(indices.tolist()) <= allowed and len(indices) == 5
+
+            bm25 = BM25Index.build([f"word doc{i}" for i in range(400)])
+            indices, _ = bm25.search("word", 400, mask)
+            assert set(indices.tolist()) == allowed
+
+    def test_mask_smaller_than_top_k(self):
+        """Tests that a filter matching fewer documents than top_k returns only those."""
+        from search.scoring import cosine_top_k, normalize_rows
+
+        embeddings = normalize_rows(np.eye(4, dtype=np.float32))
+        mask = np.array([False, True, True, True])
+
+        indices, _ = cosine_top_k(embeddings, [1.0, 0.0, 0.0, 0.0], 10, mask)
+
+        assert sorted(indices.tolist()) == [1, 2, 3]
@@ -0,0 +1,110 @@
+"""Tests for the quantized embeddings index."""
+
+import json
+from unittest.mock import patch
+
+import numpy as np
+import pytest
+
+
+def _clustered_embeddings(n_clusters=8, per_cluster=50, dim=16, seed=0):
+    rng = np.random.default_rng(seed)
+    centers = rng.normal(size=(n_clusters, dim))
+    points = np.repeat(centers, per_cluster, axis=0)
+    return points + rng.normal(scale=0.1, size=points.shape)
+
+
+class TestQuantizedIndex:
+    """Tests for QuantizedIndex."""
+
+    @pytest.mark.parametrize(
+        "kind, max_bytes_ratio, min_recall",
+        [("float16", 0.5, 1.0), ("int8", 0.3, 1.0), ("pq", 0.3, 0.9)],
+    )
+    def test_rerank_recall_and_size(self, kind, max_bytes_ratio, min_recall):
+        """Tests that the codes are smaller than float32 and re-ranking keeps recall."""
+        from search.quantization import QuantizedIndex, recall_at_k
+        from search.scoring import normalize_rows
+
+        embeddings = normalize_rows(_clustered_embeddings())
+        index = QuantizedIndex.build(embeddings, kind, n_subvectors=8, n_iter=10)
+        queries = embeddings[::25]
+
+        assert index.codes.nbytes <= max_bytes_ratio * embeddings.nbytes
+        assert recall_at_k(index, embeddings, queries, top_k=10, candidates=50) >= min_recall
+        indices, scores = index.search(embeddings, queries[0], top_k=3, candidates=50)
+        assert indices[0] == 0
+        np.testing.assert_allclose(scores, embeddings[indices] @ queries[0], rtol=1e-5)
+
+    def test_pq_needs_dividing_subvectors(self):
+        """Tests that the PQ subvectors must split the dimension evenly."""
+        from search.quantization import QuantizedIndex
+
+        with pytest.raises(ValueError):
+            QuantizedIndex.build(np.ones((10, 16), dtype=np.float32), "pq", n_subvectors=5)
+
+    def test_pq_scores_with_many_subvectors(self):
+        """Tests that table lookups stay exact past 256 subvectors."""
+        from search.quantization import QuantizedIndex
+        from search.scoring import normalize_rows
+
+        embeddings = normalize_rows(_clustered_embeddings(per_cluster=40, dim=520))
+        index = QuantizedIndex.build(embeddings, "pq", n_subvectors=260, n_iter=2)
+        query = embeddings[0]
+
+        sub_dim = embeddings.shape[1] // 260
+        decoded = index.codebooks[np.arange(260), index.codes].reshape(len(embeddings), -1)
+        assert decoded.shape[1] == 260 * sub_dim
+        np.testing.assert_allclose(
+            index.approximate_scores(query), decoded @ query, rtol=1e-4, atol=1e-5
+        )
+
+    def test_store_attaches_matching_index_and_search_uses_it(self, tmp_path):
+        """Tests that a saved index is used by score_query only for its own store."""
+        from prometheus_client import generate_latest
+
+        import mcp_server
+        from search.quantization import QuantizedIndex, build_quantized_index
+        from search.vector_store import ResidentIndex, VectorStore, build_vector_store
+
+        source = tmp_path / "search_index.json"
+        documents = [
+            {"id": i, "chunk": f"doc {i}", "embedding": row.tolist()}
+            for i, row in enumerate(_clustered_embeddings(per_cluster=5))
+        ]
+        source.write_text(json.dumps(documents))
+        build_vector_store(str(source))
+        build_quantized_index(str(source), "int8")
+
+        store = VectorStore.load(str(source))
+        assert store.quantized is not None and store.quantized.kind == "int8"
+        with patch.object(mcp_server, "search_index", ResidentIndex(str(source))):
+            results = mcp_server.score_query(documents[7]["embedding"], top_k=1)
+        assert results[0]["id"] == 7
+        metrics = generate_latest().decode()
+        assert 'search_scoring_seconds_count{mode="quantized"}' in metrics
+
+        QuantizedIndex.build(store.embeddings[:3], "int8", store_fingerprint="other").save(
+            str(source)
+        )
+        assert VectorStore.load(str(source)).quantized is None
+
+    def test_recall_refuses_stale_index(self, tmp_path, monkeypatch):
+        """Tests that --recall asks for a rebuild instead of loading an index of another store."""
+        from search import quantization
+        from search.vector_store import build_vector_store
+
+        source = tmp_path / "search_index.json"
+        documents = [
+            {"id": i, "chunk": f"doc {i}", "embedding": row.tolist()}
+            for i, row in enumerate(_clustered_embeddings(per_cluster=5))
+        ]
+        source.write_text(json.dumps(documents))
+        store = build_vector_store(str(source))
+        quantization.QuantizedIndex.build(
+            store.embeddings, "int8", store_fingerprint="other"
+        ).save(str(source))
+
+        monkeypatch.setattr("sys.argv", ["quantization", str(source), "--recall"])
+        with pytest.raises(SystemExit, match="stale"):
+            quantization.main()
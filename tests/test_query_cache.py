@@ -0,0 +1,75 @@
+"""Tests for the query embedding cache."""
+
+from unittest.mock import patch
+
+import pytest
+
+
+class TestQueryEmbeddingCache:
+    """Tests for QueryEmbeddingCache."""
+
+    def test_lru_eviction_and_ttl(self):
+        """Tests size-bounded eviction and expiry of local entries."""
+        from search.query_cache import QueryEmbeddingCache
+
+        cache = QueryEmbeddingCache(max_size=2, ttl=10)
+        with patch("search.query_cache.time.monotonic", return_value=0.0):
+            cache.put("a", [1.0])
+            cache.put("b", [2.0])
+            assert cache.get("a") == [1.0]
+            cache.put("c", [3.0])  # evicts "b", the least recently used
+            assert cache.get("b") is None
+
+        with patch("search.query_cache.time.monotonic", return_value=11.0):
+            assert cache.get("a") is None
+
+        assert cache.stats()["hits"] == 1
+        assert cache.stats()["misses"] == 2
+
+    def test_shared_tier_between_processes(self, tmp_path):
+        """Tests that a miss in one cache is served by another cache's shared tier."""
+        from search.embedding_cache import EmbeddingCache
+        from search.query_cache import QueryEmbeddingCache
+
+        path = str(tmp_path / "shared.sqlite")
+        first = QueryEmbeddingCache(deployment="emb", shared=EmbeddingCache(path))
+        second = QueryEmbeddingCache(deployment="emb", shared=EmbeddingCache(path))
+
+        first.put("question", [0.5, 0.25])
+
+        assert second.get("question") == [0.5, 0.25]
+        assert second.stats()["shared_hits"] == 1
+
+    @pytest.mark.asyncio
+    async def test_async_shared_tier_runs_off_the_event_loop(self, tmp_path):
+        """Tests that the async methods read and write the shared tier in worker threads."""
+        import threading
+
+        from search.embedding_cache import EmbeddingCache
+        from search.query_cache import QueryEmbeddingCache
+
+        shared = EmbeddingCache(str(tmp_path / "shared.sqlite"))
+        threads = []
+        put_many, get = shared.put_many, shared.get
+
+        def record(method):
+            def wrapper(*args, **kwargs):
+                threads.append(threading.current_thread())
+                return method(*args, **kwargs)
+
+            return wrapper
+
+        with patch.object(shared, "put_many", record(put_many)), \
+                patch.object(shared, "get", record(get)):
+            await QueryEmbeddingCache(deployment="emb", shared=shared).aput_many(
+                [("question", [0.5, 0.25])]
+            )
+            cache = QueryEmbeddingCache(deployment="emb", shared=shared)
+            assert await cache.aget("question") == [0.5, 0.25]
+            assert await cache.aget("question") == [0.5, 0.25]
+            assert await cache.aget("other") is None
+
+        assert len(threads) == 3
+        assert threading.main_thread() not in threads
+        assert (cache.stats()["hits"], cache.stats()["shared_hits"]) == (1, 1)
+        assert cache.stats()["misses"] == 1
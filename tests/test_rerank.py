@@ -0,0 +1,60 @@
+"""Tests for the second-stage re-ranker."""
+
+import sys
+import types
+
+
+class TestRerank:
+    """Tests for search.rerank."""
+
+    def test_term_scorer_prefers_rare_terms_and_phrases(self):
+        """Tests that chunks with the discriminative query terms in order score highest."""
+        from search.rerank import TermOverlapScorer
+
+        chunks = [
+            "python tutorial for beginners",
+            "python connection pool timeout settings",
+            "python timeout in the pool of connection",
+        ]
+
+        scores = TermOverlapScorer()("python connection pool timeout", chunks)
+
+        assert scores.argmax() == 1
+        assert scores[1] > scores[2] > scores[0]
+        assert TermOverlapScorer()("", chunks).tolist() == [0.0, 0.0, 0.0]
+
+    def test_rerank_combines_scores(self):
+        """Tests that re-ranking keeps top_k and can overturn the first-stage order."""
+        from search.rerank import rerank
+
+        def scorer(query, chunks):
+            return [1.0 if "answer" in chunk else 0.0 for chunk in chunks]
+
+        ranked = rerank(
+            "q", ["close", "closer", "the answer"], [0.9, 0.8, 0.7], scorer, top_k=2, alpha=0.3
+        )
+
+        assert [position for position, _ in ranked] == [2, 0]
+        assert rerank("q", [], [], scorer, top_k=2) == []
+
+    def test_load_reranker(self, monkeypatch):
+        """Tests built-in names, plugged-in callables and classes."""
+        import pytest
+
+        from search.rerank import TermOverlapScorer, load_reranker
+
+        class Scorer:
+            def __call__(self, query, chunks):
+                return [0.0] * len(chunks)
+
+        module = types.ModuleType("custom_scorers")
+        module.Scorer = Scorer
+        module.function = len
+        monkeypatch.setitem(sys.modules, "custom_scorers", module)
+
+        assert load_reranker("") is None
+        assert isinstance(load_reranker("terms"), TermOverlapScorer)
+        assert isinstance(load_reranker("custom_scorers:Scorer"), Scorer)
+        assert load_reranker("custom_scorers:function") is len
+        with pytest.raises(ValueError):
+            load_reranker("cross-encoder")
@@ -0,0 +1,68 @@
+"""Tests for vectorized scoring."""
+
+import numpy as np
+import pytest
+
+
+class TestScoring:
+    """Tests for the search.scoring module."""
+
+    def test_cosine_top_k_matches_reference(self):
+        """Tests the vectorized top-k against the per-document reference."""
+        from mcp_server import numpy_cosine_similarity
+        from search.scoring import cosine_top_k, normalize_rows
+
+        rng = np.random.default_rng(0)
+        embeddings = rng.normal(size=(200, 16))
+        query = rng.normal(size=16)
+
+        indices, scores = cosine_top_k(normalize_rows(embeddings), query, top_k=5)
+
+        reference = [numpy_cosine_similarity(query, row) for row in embeddings]
+        expected = np.argsort(reference)[::-1][:5]
+        assert indices.tolist() == expected.tolist()
+        np.testing.assert_allclose(scores, np.asarray(reference)[expected], rtol=1e-5)
+
+    def test_top_k_larger_than_corpus(self):
+        """Tests that top_k is clamped to the number of documents."""
+        from search.scoring import cosine_top_k, normalize_rows
+
+        embeddings = normalize_rows([[1.0, 0.0], [0.0, 1.0], [0.0, 0.0]])
+        indices, scores = cosine_top_k(embeddings, [1.0, 0.1], top_k=10)
+
+        assert indices.tolist() == [0, 1, 2]
+        assert scores[-1] == 0.0
+
+    def test_batch_matches_single_query(self):
+        """Tests that the matrix-matrix path ranks like one query at a time."""
+        from search.scoring import cosine_top_k, cosine_top_k_batch, normalize_rows
+
+        rng = np.random.default_rng(1)
+        embeddings = normalize_rows(rng.normal(size=(100, 8)))
+        queries = rng.normal(size=(4, 8))
+
+        batch = cosine_top_k_batch(embeddings, queries, top_k=3)
+
+        for query, (indices, scores) in zip(queries, batch, strict=True):
+            expected_indices, expected_scores = cosine_top_k(embeddings, query, top_k=3)
+            assert indices.tolist() == expected_indices.tolist()
+            np.testing.assert_allclose(scores, expected_scores, rtol=1e-5)
+
+    def test_reciprocal_rank_fusion(self):
+        """Tests that items ranked well by several lists come first."""
+        from search.scoring import reciprocal_rank_fusion
+
+        fused = reciprocal_rank_fusion([["a", "b", "c"], ["b", "a"], ["b", "d"]])
+
+        assert [item for item, _ in fused] == ["b", "a", "d", "c"]
+
+    def test_weighted_score_fusion(self):
+        """Tests that scores on different scales are normalized before weighting."""
+        from search.scoring import weighted_score_fusion
+
+        fused = weighted_score_fusion(
+            [[("a", 0.9), ("b", 0.8)], [("b", 12.0), ("c", 2.0)]], [0.4, 0.6]
+        )
+
+        assert [item for item, _ in fused] == ["b", "a", "c"]
+        assert fused[0][1] == pytest.approx(0.6)
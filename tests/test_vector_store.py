@@ -0,0 +1,139 @@
+"""Tests for the binary vector store."""
+
+import json
+import os
+
+import numpy as np
+import pytest
+
+
+class TestVectorStore:
+    """Tests for VectorStore and ResidentIndex."""
+
+    @pytest.fixture
+    def index_file(self, tmp_path, sample_documents):
+        """Writes the sample documents as a JSON search index."""
+        path = tmp_path / "search_index.json"
+        path.write_text(json.dumps(sample_documents))
+        return path
+
+    def test_save_and_load_roundtrip(self, index_file, sample_documents):
+        """Tests that a built store is memory-mapped back with normalized rows."""
+        from search.scoring import normalize_rows
+        from search.vector_store import VectorStore, build_vector_store
+
+        build_vector_store(str(index_file))
+        store = VectorStore.load(str(index_file))
+
+        assert isinstance(store.embeddings, np.memmap)
+        assert store.embeddings.dtype == np.float32
+        assert store.ids == [doc["id"] for doc in sample_documents]
+        assert store.chunks == [doc["chunk"] for doc in sample_documents]
+        np.testing.assert_allclose(
+            store.embeddings,
+            normalize_rows([doc["embedding"] for doc in sample_documents]),
+            rtol=1e-6,
+        )
+
+    def test_resident_index_reloads_only_on_change(self, index_file, sample_documents):
+        """Tests that the resident index is reused until the JSON index changes."""
+        from search.vector_store import ResidentIndex
+
+        index = ResidentIndex(str(index_file))
+        first = index.get()
+        assert index.get() is first
+
+        updated = sample_documents + [
+            {"id": "4", "chunk": "New document", "embedding": [0.4, 0.5, 0.6, 0.7]}
+        ]
+        index_file.write_text(json.dumps(updated))
+        stat = index_file.stat()
+        os.utime(index_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        # Rebuilt in the background; searches meanwhile get the loaded store
+        assert index.get() is first
+        index.wait_for_rebuild()
+        reloaded = index.get()
+        assert reloaded is not first
+        assert reloaded.ids[-1] == "4"
+
+    def test_concurrent_gets_after_change(self, index_file, sample_documents):
+        """Tests that concurrent searches during a rebuild all get a usable store."""
+        from concurrent.futures import ThreadPoolExecutor
+
+        from search.vector_store import ResidentIndex
+
+        index = ResidentIndex(str(index_file))
+        index.get()
+        updated = sample_documents * 50
+        index_file.write_text(json.dumps(updated))
+        stat = index_file.stat()
+        os.utime(index_file, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+
+        with ThreadPoolExecutor(max_workers=8) as pool:
+            stores = list(pool.map(lambda _: index.get(), range(32)))
+        index.wait_for_rebuild()
+
+        assert all(len(store) in (3, 150) for store in stores)
+        assert len(index.get()) == 150
+        assert not [path for path in index_file.parent.iterdir() if path.name.startswith(".")]
+
+    def test_resident_store_kept_when_files_cannot_be_loaded(self, index_file):
+        """Tests that get() keeps serving the resident store instead of building."""
+        from unittest.mock import patch
+
+        from search.vector_store import ResidentIndex, manifest_path
+
+        index = ResidentIndex(str(index_file))
+        first = index.warm_up()
+        manifest = manifest_path(str(index_file))
+        good = manifest.read_text()
+        manifest.write_text(json.dumps({**json.loads(good), "version": "missing"}))
+
+        with patch("search.vector_store.build_vector_store") as build:
+            assert index.get() is first
+            assert index.get() is first
+        build.assert_not_called()
+        assert index._rebuild is None
+
+        manifest.write_text(good)
+        stat = manifest.stat()
+        os.utime(manifest, ns=(stat.st_atime_ns, stat.st_mtime_ns + 10**9))
+        reloaded = index.get()
+        assert reloaded is not first
+        assert reloaded.ids == first.ids
+
+    def test_ingest_swap_does_not_trigger_rebuild(self, index_file, sample_documents):
+        """Tests that a store written before its JSON index counts as up to date."""
+        from search.ingest import DocumentWriter
+        from search.vector_store import ResidentIndex, VectorStoreWriter, file_signature
+
+        index = ResidentIndex(str(index_file))
+        first = index.warm_up()
+        updated = sample_documents + [{**sample_documents[0], "id": "4"}]
+        with VectorStoreWriter(str(index_file)) as store, \
+                DocumentWriter(str(index_file)) as out:
+            for doc in updated:
+                out.write(doc)
+            store.append(
+                [doc["id"] for doc in updated],
+                [doc["chunk"] for doc in updated],
+                [doc["embedding"] for doc in updated],
+            )
+            store.close(source_signature=file_signature(out.finish()))
+            # New store, previous JSON index
+            assert index.get().ids[-1] == "4"
+
+        assert index.get().ids[-1] == "4"
+        assert index.get() is not first
+        assert index._rebuild is None
+
+    def test_streamed_store_matches_in_memory_store(self, index_file, sample_documents):
+        """Tests that building in small batches gives the same store and fingerprint."""
+        from search.vector_store import VectorStore, build_vector_store
+
+        streamed = build_vector_store(str(index_file), batch_size=2)
+        in_memory = VectorStore.from_documents(sample_documents)
+
+        assert streamed.fingerprint == in_memory.fingerprint
+        np.testing.assert_array_equal(streamed.embeddings, in_memory.embeddings)
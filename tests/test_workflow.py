@@ -0,0 +1,94 @@
+"""Tests for the QnA workflow state handling."""
+
+
+class TestQnAWorkflowState:
+    """Tests for history compaction in QnAWorkflow."""
+
+    def test_history_is_bounded_and_summarized(self, monkeypatch):
+        """Tests that old messages are folded into a size-capped summary."""
+        from unittest.mock import MagicMock
+
+        import workflows.workflow
+        from workflows.workflow import (
+            MAX_CONTEXT_MESSAGES,
+            MAX_HISTORY_MESSAGES,
+            MAX_SUMMARY_CHARS,
+            QnAWorkflow,
+        )
+
+        # The workflow stream registers handlers, which needs a running workflow
+        monkeypatch.setattr(workflows.workflow, "WorkflowStream", MagicMock())
+        wf = QnAWorkflow()
+        for i in range(200):
+            wf.conversation_history.append({"actor": "user", "content": f"question {i} " * 50})
+            wf.compact_history()
+
+        assert len(wf.conversation_history) == MAX_HISTORY_MESSAGES
+        assert wf.conversation_history[-1]["content"].startswith("question 199")
+        assert len(wf.summary) <= MAX_SUMMARY_CHARS
+        assert "question 179" in wf.summary
+
+        agent_input = wf.build_agent_input()
+        assert agent_input[0]["role"] == "system"
+        assert len(agent_input) == MAX_CONTEXT_MESSAGES + 1
+
+    def test_messages_bump_state_version(self, monkeypatch):
+        """Tests that status changes are reported with a new version for long polls."""
+        from unittest.mock import MagicMock
+
+        import workflows.workflow
+        from workflows.workflow import QnAWorkflow
+
+        monkeypatch.setattr(workflows.workflow, "WorkflowStream", MagicMock())
+        monkeypatch.setattr(workflows.workflow.workflow, "logger", MagicMock())
+        wf = QnAWorkflow()
+        before = wf.get_latest_process_info()["version"]
+
+        wf.add_message("user", "question")
+
+        info = wf.get_latest_process_info()
+        assert info["version"] == before + 1
+        assert info["latest_message"] == {"actor": "user", "content": "question"}
+
+    def test_ask_prompts_are_pending(self, monkeypatch):
+        """Tests that queued ask prompts are tracked so continue-as-new waits for them."""
+        from unittest.mock import MagicMock
+
+        import workflows.workflow
+        from workflows.workflow import QnAInput, QnAWorkflow
+
+        monkeypatch.setattr(workflows.workflow, "WorkflowStream", MagicMock())
+        wf = QnAWorkflow()
+        wf.prompt_queue.append(QnAInput(query="signalled"))
+        assert not wf.asks_pending()
+
+        wf.prompt_queue.append(QnAInput(query="asked", ask_id="a1"))
+        assert wf.asks_pending()
+
+    def test_fast_mode_prompt_and_queries(self, monkeypatch):
+        """Tests that fast mode sends the built prompt and searches follow-ups in context."""
+        from unittest.mock import MagicMock
+
+        import workflows.workflow
+        from workflows.workflow import QnAWorkflow
+
+        monkeypatch.setattr(workflows.workflow, "WorkflowStream", MagicMock())
+        monkeypatch.setattr(workflows.workflow.workflow, "logger", MagicMock())
+        wf = QnAWorkflow()
+        wf.add_message("user", "How do I parse JSON in Python?")
+        assert wf.search_queries("How do I parse JSON in Python?") == [
+            "How do I parse JSON in Python?"
+        ]
+
+        wf.add_message("agent", "Use the json module.")
+        wf.add_message("user", "And in Rust?")
+        assert wf.search_queries("And in Rust?") == [
+            "And in Rust?",
+            "How do I parse JSON in Python? And in Rust?",
+        ]
+
+        prompt = wf.construct_prompt([{"id": "doc1", "chunk": "serde_json"}], "And in Rust?")
+        agent_input = wf.build_agent_input(prompt)
+        assert agent_input[-1] == {"role": "user", "content": prompt}
+        assert "[1] (doc1) - serde_json" in prompt
+        assert agent_input[:-1] == wf.build_agent_input()[:-1]
@@ -1,8 +1,10 @@
 """Temporal Worker - Executes workflows and activities."""
 
+import argparse
 import asyncio
-import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import timedelta
+from typing import Any, Optional
 
 from dotenv import load_dotenv
 from temporalio.client import Client
@@ -11,42 +13,160 @@ from temporalio.contrib.openai_agents import (
     ModelActivityParameters,
     OpenAIAgentsPlugin,
 )
-from temporalio.worker import Worker
+from temporalio.runtime import PrometheusConfig, Runtime, TelemetryConfig
+from temporalio.worker import Worker, WorkerTuner
 
-from activities.activities import mcp_search_activity
-from workflows.workflow import QnAWorkflow
+from activities.activities import (
+    answer_cache_lookup_activity,
+    answer_cache_store_activity,
+    get_context_config,
+    mcp_batch_search_activity,
+    mcp_search_activity,
+)
+from activities.mcp_pool import get_mcp_pool
+from activities.model_metrics import InstrumentedModelProvider
+from config import TemporalConfig
+from workflows.workflow import MODEL_EVENTS_TOPIC, QnAWorkflow
 
 load_dotenv()
 
-ADDRESS = os.getenv("TEMPORAL_ADDRESS", "localhost:7233")
-NAMESPACE = os.getenv("TEMPORAL_NAMESPACE", "default")
-TASK_QUEUE = os.getenv("TEMPORAL_TASK_QUEUE", "agent-mcp-queue")
+# Roles a worker process can take; each one polls its own task queue
+ROLES = ("workflow", "model", "search")
+
+SEARCH_ACTIVITIES = [
+    mcp_search_activity,
+    mcp_batch_search_activity,
+    answer_cache_lookup_activity,
+    answer_cache_store_activity,
+]
 
 
-async def main() -> None:
-    """Initialize and run the Temporal worker."""
-    plugin = OpenAIAgentsPlugin(
+def build_plugin(temporal: TemporalConfig) -> OpenAIAgentsPlugin:
+    """Agents plugin; model calls go to the model task queue and stream their events."""
+    return OpenAIAgentsPlugin(
         model_params=ModelActivityParameters(
-            start_to_close_timeout=timedelta(seconds=30)
+            task_queue=temporal.model_queue,
+            start_to_close_timeout=timedelta(seconds=temporal.model_timeout),
+            # Model calls stream; each event is published to the workflow stream
+            streaming_topic=MODEL_EVENTS_TOPIC,
         ),
-        model_provider=LitellmProvider(),
+        # Records LLM time-to-first-token and total time on the activity metric meter
+        model_provider=InstrumentedModelProvider(LitellmProvider()),
+    )
+
+
+def build_runtime(temporal: TemporalConfig) -> Optional[Runtime]:
+    """SDK runtime exporting Prometheus metrics, if a bind address is configured.
+
+    Besides the custom metrics recorded by the activities, the SDK exports its
+    own, e.g. temporal_workflow_task_schedule_to_start_latency and
+    temporal_activity_schedule_to_start_latency (task queue wait).
+    """
+    if not temporal.metrics_bind_address:
+        return None
+    return Runtime(
+        telemetry=TelemetryConfig(
+            metrics=PrometheusConfig(
+                bind_address=temporal.metrics_bind_address,
+                durations_as_seconds=True,
+            )
+        )
     )
 
+
+def plan_workers(temporal: TemporalConfig, roles: list[str]) -> dict[str, set[str]]:
+    """Groups the roles run by this process by task queue (one Worker per queue)."""
+    queues = {
+        "workflow": temporal.task_queue,
+        "model": temporal.model_queue,
+        "search": temporal.search_queue,
+    }
+    plan: dict[str, set[str]] = {}
+    for role in roles:
+        plan.setdefault(queues[role], set()).add(role)
+    return plan
+
+
+def worker_options(
+    temporal: TemporalConfig, roles: set[str], executor: Optional[ThreadPoolExecutor]
+) -> dict[str, Any]:
+    """Concurrency settings of the Worker serving the given roles."""
+    options: dict[str, Any] = {
+        "max_concurrent_workflow_task_polls": temporal.max_concurrent_workflow_task_polls,
+        "max_concurrent_activity_task_polls": temporal.max_concurrent_activity_task_polls,
+        "activity_executor": executor,
+    }
+    if temporal.tuner == "resource":
+        options["tuner"] = WorkerTuner.create_resource_based(
+            target_memory_usage=temporal.tuner_target_memory,
+            target_cpu_usage=temporal.tuner_target_cpu,
+        )
+    else:
+        options["max_concurrent_workflow_tasks"] = temporal.max_concurrent_workflow_tasks
+        # A queue serving only model calls gets its own limit
+        options["max_concurrent_activities"] = (
+            temporal.max_concurrent_model_activities
+            if roles == {"model"}
+            else temporal.max_concurrent_activities
+        )
+    return {name: value for name, value in options.items() if value is not None}
+
+
+async def main(roles: list[str]) -> None:
+    """Initialize and run the Temporal workers of this process."""
+    temporal = TemporalConfig.from_env()
+    temporal.validate()
+
     client = await Client.connect(
-        ADDRESS,
-        namespace=NAMESPACE,
-        plugins=[plugin],
+        temporal.address,
+        namespace=temporal.namespace,
+        plugins=[build_plugin(temporal)],
+        runtime=build_runtime(temporal),
     )
-    
-    worker = Worker(
-        client,
-        task_queue=TASK_QUEUE,
-        workflows=[QnAWorkflow],
-        activities=[mcp_search_activity],
+
+    executor = (
+        ThreadPoolExecutor(max_workers=temporal.activity_executor_workers)
+        if temporal.activity_executor_workers
+        else None
     )
-    
-    print(f"🚀 Worker started. Task queue: {TASK_QUEUE}")
-    await worker.run()
+    workers = []
+    for task_queue, queue_roles in plan_workers(temporal, roles).items():
+        # Model activities are registered on every worker by the plugin
+        workers.append(
+            Worker(
+                client,
+                task_queue=task_queue,
+                workflows=[QnAWorkflow] if "workflow" in queue_roles else [],
+                activities=SEARCH_ACTIVITIES if "search" in queue_roles else [],
+                **worker_options(temporal, queue_roles, executor),
+            )
+        )
+        print(f"🚀 Worker started. Task queue: {task_queue} ({', '.join(sorted(queue_roles))})")
+
+    mcp_pool = None
+    if "search" in roles:
+        # Configuration errors stop the worker here rather than fail every search
+        get_context_config()
+        mcp_pool = get_mcp_pool()
+    if mcp_pool is not None:
+        await mcp_pool.warm_up()
+
+    try:
+        await asyncio.gather(*(worker.run() for worker in workers))
+    finally:
+        if mcp_pool is not None:
+            await mcp_pool.close()
+        if executor is not None:
+            executor.shutdown(wait=False)
 
 if __name__ == "__main__":
-    asyncio.run(main())
\ No newline at end of file
+    parser = argparse.ArgumentParser(description="Run Temporal workers")
+    parser.add_argument(
+        "--roles",
+        nargs="+",
+        choices=ROLES,
+        default=list(ROLES),
+        help="Roles run by this process (default: all)",
+    )
+    args = parser.parse_args()
+    asyncio.run(main(args.roles))
@@ -2,51 +2,137 @@
 
 from __future__ import annotations
 
+import asyncio
 from collections import deque
-from dataclasses import dataclass
+from dataclasses import dataclass, field
 from datetime import timedelta
-from typing import Any, Deque
+from typing import Deque, Optional
 
 from agents import Agent, Runner
 from temporalio import workflow
+from temporalio.common import RetryPolicy
 from temporalio.contrib import openai_agents
+from temporalio.contrib.workflow_streams import WorkflowStream, WorkflowStreamState
+from temporalio.exceptions import ActivityError, ApplicationError
+
+from activities.activities import (
+    answer_cache_lookup_activity,
+    answer_cache_store_activity,
+    mcp_batch_search_activity,
+    mcp_search_activity,
+)
 
-from activities.activities import mcp_search_activity
 
 @dataclass
 class QnAInput:
     query: str
     top_k: int = 3
+    # Workflow time the prompt was received, set by the new_task signal handler
+    received_at: Optional[float] = None
+    # Set by the ask update, which waits for the answer of this prompt
+    ask_id: Optional[str] = None
+    # RAG_MODES entry overriding the session's mode for this prompt
+    mode: Optional[str] = None
 
-from collections import deque
-from datetime import timedelta
-from typing import Any, Deque, Dict, List, Optional, TypedDict, Union
+# Continue-as-new once a run's event history grows past this many events
+MAX_HISTORY_EVENTS = 2000
+# Messages kept verbatim in workflow state; older ones are folded into the summary
+MAX_HISTORY_MESSAGES = 20
+MAX_SUMMARY_CHARS = 4000
+SUMMARY_LINE_CHARS = 200
+# Most recent messages sent to the agent along with the summary
+MAX_CONTEXT_MESSAGES = 6
+
+# Workflow stream topics: raw model events published by the streaming model
+# activity (see worker.py) and the final answer of each turn
+MODEL_EVENTS_TOPIC = "events"
+ANSWERS_TOPIC = "answers"
+
+# The answer cache is an optimization: a failing cache is skipped, not retried at length
+ANSWER_CACHE_RETRY_POLICY = RetryPolicy(maximum_attempts=2)
+
+# "agent": the model calls the search tools, so an answer takes at least two
+# model calls; "fast": the workflow searches up front and calls the model once
+RAG_MODES = ("agent", "fast")
+SEARCH_TIMEOUT = timedelta(seconds=60)
+
+# Upper bound of one wait_for_status long poll
+MAX_STATUS_WAIT_SECONDS = 60.0
+
+# ApplicationError types of rejected ask updates; api/main.py retries the first
+ASK_REJECTED_CONTINUING_AS_NEW = "ContinuingAsNew"
+ASK_REJECTED_CHAT_ENDED = "ChatEnded"
+
+
+@dataclass
+class QnASessionState:
+    """Session state carried from one run to the next on continue-as-new."""
+
+    conversation_history: list[dict] = field(default_factory=list)
+    summary: str = ""
+    pending_prompts: list[QnAInput] = field(default_factory=list)
+    stream_state: Optional[WorkflowStreamState] = None
+    state_version: int = 0
+    # Task queue of the search activities (see worker.py); None means the workflow's own
+    search_task_queue: Optional[str] = None
+    # Default RAG_MODES entry of the session's prompts
+    rag_mode: str = "agent"
+    # Whether answers are looked up in and stored to the answer cache
+    answer_cache: bool = False
 
-from temporalio import workflow
-from temporalio.common import RetryPolicy
-from temporalio.contrib import openai_agents
 
 @workflow.defn
 class QnAWorkflow:
     """Workflow that manages tool execution with user confirmation and conversation history."""
 
-    def __init__(self) -> None:
+    @workflow.init
+    def __init__(self, state: Optional[QnASessionState] = None) -> None:
+        # Token stream read by api/main.py; only the latest turns are kept in it
+        self.stream = WorkflowStream(state.stream_state if state else None)
+        self.turn_offset = 0
         self.conversation_history = []
+        self.summary = ""
         self.prompt_queue: Deque[QnAInput] = deque()
         self.current_prompt: QnAInput = None
         self.chat_ended = False
         self.current_state = []
+        # Bumped on every change visible through get_latest_process_info
+        self.state_version = 0
+        self.continuing_as_new = False
+        self.search_task_queue: Optional[str] = None
+        self.rag_mode = "agent"
+        self.answer_cache = False
+        # Answers of ask updates not yet returned, by ask_id
+        self.ask_answers: dict[str, str] = {}
 
         self.system_prompt = (
             "You are an assistant specialized in synthesis. "
             "To have a better context to answer a user question about software development/programming, use the 'mcp_search_activity' tool to search for relevant documents. "
+            "To search several rephrasings of the question, call 'mcp_batch_search_activity' once with all of them instead of calling 'mcp_search_activity' repeatedly. "
             "Respond only based on the CONTEXT returned by it, citing excerpts using [n] when relevant."
             "If no external information is needed, just say so."
         )
+        # Fast mode: the context is already in the prompt (see construct_prompt)
+        self.fast_system_prompt = (
+            "You are an assistant specialized in synthesis. "
+            "Answer questions about software development/programming based only on the CONTEXT "
+            "given with the question, citing excerpts using [n] when relevant. "
+            "If the CONTEXT is not relevant to the question, say so."
+        )
 
     # see ../api/main.py#temporal_client.start_workflow() for how the input parameters are set
     @workflow.run
-    async def run(self) -> str:
+    async def run(self, state: Optional[QnASessionState] = None) -> str:
+        if state is not None:
+            self.conversation_history = list(state.conversation_history)
+            self.summary = state.summary
+            self.state_version = state.state_version
+            self.search_task_queue = state.search_task_queue
+            self.rag_mode = state.rag_mode
+            self.answer_cache = state.answer_cache
+            # Prompts carried over go before any that arrived since
+            self.prompt_queue.extendleft(reversed(state.pending_prompts))
+        self.turn_offset = self.stream_offset()
 
         agent = Agent(
             name="QnA Agent",
@@ -55,20 +141,61 @@ class QnAWorkflow:
             tools=[
                 openai_agents.workflow.activity_as_tool(
                     mcp_search_activity,
-                    start_to_close_timeout=timedelta(seconds=60)
-                )
+                    task_queue=self.search_task_queue,
+                    start_to_close_timeout=SEARCH_TIMEOUT
+                ),
+                openai_agents.workflow.activity_as_tool(
+                    mcp_batch_search_activity,
+                    task_queue=self.search_task_queue,
+                    start_to_close_timeout=SEARCH_TIMEOUT
+                ),
             ],
         )
+        # No tools: exactly one model call per answer
+        fast_agent = Agent(
+            name="QnA Fast Agent",
+            model="azure/gpt-4o",
+            instructions=self.fast_system_prompt,
+        )
         while True:
             await workflow.wait_condition(
-                lambda: bool(self.prompt_queue) or self.chat_ended
+                lambda: bool(self.prompt_queue)
+                or self.chat_ended
+                or self.should_continue_as_new()
             )
 
             if self.chat_ended:
                 break
 
+            # Prompts of ask updates are answered first: continue-as-new
+            # waits for every update handler to finish
+            if self.should_continue_as_new() and not self.asks_pending():
+                workflow.logger.info("workflow step: continuing as new to bound history")
+                # Releases wait_for_status pollers so the run can hand over
+                self.continuing_as_new = True
+                await self.stream.continue_as_new(
+                    lambda stream_state: [
+                        QnASessionState(
+                            conversation_history=self.conversation_history,
+                            summary=self.summary,
+                            pending_prompts=list(self.prompt_queue),
+                            stream_state=stream_state,
+                            state_version=self.state_version,
+                            search_task_queue=self.search_task_queue,
+                            rag_mode=self.rag_mode,
+                            answer_cache=self.answer_cache,
+                        )
+                    ]
+                )
+
             if self.prompt_queue:
                 task = self.prompt_queue.popleft()
+                if task.received_at is not None:
+                    workflow.metric_meter().create_histogram_float(
+                        "qna_prompt_queue_wait_seconds",
+                        "Time prompts wait in the workflow before being processed",
+                        "s",
+                    ).record(workflow.time() - task.received_at)
                 workflow.logger.info(
                     f"workflow step: processing message on the prompt queue, message is {task.query}"
                 )
@@ -81,14 +208,69 @@ class QnAWorkflow:
                     "content": task.query,
                     "state": "prompt"
                 })
+                self.state_version += 1
 
-                result = await Runner.run(starting_agent=agent,input=task.query)
-                answer = result.final_output
+                # Drop the stream events of all but the previous turn
+                self.stream.truncate(self.turn_offset)
+                self.turn_offset = self.stream_offset()
 
-                self.add_message("agent", answer)
+                # Only questions without earlier context have answers reusable across sessions
+                cacheable = (
+                    self.answer_cache
+                    and len(self.conversation_history) == 1
+                    and not self.summary
+                )
+                fast = (task.mode if task.mode in RAG_MODES else self.rag_mode) == "fast"
+                cached = None
+                if cacheable:
+                    try:
+                        cached = await workflow.execute_activity(
+                            answer_cache_lookup_activity,
+                            args=[task.query, task.top_k],
+                            task_queue=self.search_task_queue,
+                            start_to_close_timeout=timedelta(seconds=30),
+                            retry_policy=ANSWER_CACHE_RETRY_POLICY,
+                        )
+                    except ActivityError:
+                        workflow.logger.warning("workflow step: answer cache lookup failed")
 
-                break
+                if cached and cached["hit"]:
+                    workflow.logger.info(f"workflow step: answer served from cache ({cached['match']})")
+                    answer = cached["answer"]
+                else:
+                    if fast:
+                        # Searched only on a cache miss, before the single model call
+                        documents = await self.retrieve(task)
+                        agent_input = self.build_agent_input(
+                            self.construct_prompt(documents, task.query)
+                        )
+                    else:
+                        agent_input = self.build_agent_input()
+                    # The model activity publishes its events to MODEL_EVENTS_TOPIC as they arrive
+                    result = Runner.run_streamed(
+                        starting_agent=fast_agent if fast else agent, input=agent_input
+                    )
+                    async for _ in result.stream_events():
+                        pass
+                    answer = result.final_output
+                    if cacheable:
+                        try:
+                            await workflow.execute_activity(
+                                answer_cache_store_activity,
+                                args=[task.query, answer, task.top_k],
+                                task_queue=self.search_task_queue,
+                                start_to_close_timeout=timedelta(seconds=30),
+                                retry_policy=ANSWER_CACHE_RETRY_POLICY,
+                            )
+                        except ActivityError:
+                            workflow.logger.warning("workflow step: answer cache store failed")
+
+                self.add_message("agent", answer)
+                self.stream.topic(ANSWERS_TOPIC).publish({"content": answer})
+                if task.ask_id is not None:
+                    self.ask_answers[task.ask_id] = answer
 
+        await workflow.wait_condition(workflow.all_handlers_finished)
         return str(self.conversation_history)
 
     @workflow.signal
@@ -98,14 +280,49 @@ class QnAWorkflow:
         if self.chat_ended:
             workflow.logger.info(f"Message dropped due to chat closed: {task.query}")
             return
+        task.received_at = workflow.time()
         self.prompt_queue.append(task)
 
+    @workflow.update
+    async def ask(self, task: QnAInput) -> dict:
+        """Queues a prompt like new_task and returns its answer once it is produced.
+
+        Sent with update-with-start by api/main.py (POST /ask), so a single
+        call starts or reuses the session and gets the answer, without polling.
+        """
+        workflow.logger.info(f"update received: ask, prompt is {task.query}")
+        task.ask_id = str(workflow.uuid4())
+        task.received_at = workflow.time()
+        self.prompt_queue.append(task)
+        await workflow.wait_condition(
+            lambda: task.ask_id in self.ask_answers or self.chat_ended
+        )
+        if task.ask_id not in self.ask_answers:
+            raise ApplicationError(
+                "Chat ended before the prompt was answered", type=ASK_REJECTED_CHAT_ENDED
+            )
+        return {
+            "answer": self.ask_answers.pop(task.ask_id),
+            "version": self.state_version,
+        }
+
+    @ask.validator
+    def validate_ask(self, task: QnAInput) -> None:
+        # Rejected updates leave no trace in the history
+        if self.chat_ended:
+            raise ApplicationError("Chat has ended", type=ASK_REJECTED_CHAT_ENDED)
+        if self.continuing_as_new:
+            raise ApplicationError(
+                "Session is continuing as new", type=ASK_REJECTED_CONTINUING_AS_NEW
+            )
+
     # Signal that comes from api/main.py via a post to /end-chat
     @workflow.signal
     async def end_chat(self) -> None:
         """Signal handler for ending the chat session."""
         workflow.logger.info("signal received: end_chat")
         self.chat_ended = True
+        self.state_version += 1
 
     @workflow.query
     def get_conversation_history(self):
@@ -115,7 +332,78 @@ class QnAWorkflow:
     @workflow.query
     def get_latest_process_info(self):
         latest = self.conversation_history[-1] if self.conversation_history else None
-        return {"latest_message": latest, "current_state": self.current_state}
+        return {
+            "latest_message": latest,
+            "current_state": self.current_state,
+            "version": self.state_version,
+        }
+
+    @workflow.update
+    async def wait_for_status(self, known_version: int, timeout_seconds: float = 30.0) -> dict:
+        """Long poll: returns the latest process info once its version differs from known_version.
+
+        Returns the unchanged info after timeout_seconds (capped at
+        MAX_STATUS_WAIT_SECONDS), when the chat ends, or before continue-as-new.
+        """
+        try:
+            await workflow.wait_condition(
+                lambda: self.state_version != known_version
+                or self.chat_ended
+                or self.continuing_as_new,
+                timeout=timedelta(seconds=min(timeout_seconds, MAX_STATUS_WAIT_SECONDS)),
+            )
+        except asyncio.TimeoutError:
+            pass
+        return self.get_latest_process_info()
+
+    async def retrieve(self, task: QnAInput) -> list[dict]:
+        """Fast mode retrieval: searches the question without asking the model first.
+
+        Follow-up questions are also searched together with the previous
+        question (both rankings fused in one batch search), so that "and in
+        Rust?" still finds documents about the earlier topic.
+        """
+        queries = self.search_queries(task.query)
+        try:
+            if len(queries) == 1:
+                return await workflow.execute_activity(
+                    mcp_search_activity,
+                    args=[task.query, task.top_k],
+                    task_queue=self.search_task_queue,
+                    start_to_close_timeout=SEARCH_TIMEOUT,
+                )
+            response = await workflow.execute_activity(
+                mcp_batch_search_activity,
+                args=[queries, task.top_k, True],
+                task_queue=self.search_task_queue,
+                start_to_close_timeout=SEARCH_TIMEOUT,
+            )
+            return response["fused"]
+        except ActivityError:
+            workflow.logger.warning("workflow step: search failed, answering without context")
+            return []
+
+    def search_queries(self, query: str) -> list[str]:
+        """The question, plus the question in the context of the previous one if any."""
+        previous = [m["content"] for m in self.conversation_history[:-1] if m["actor"] == "user"]
+        if not previous:
+            return [query]
+        return [query, f"{previous[-1]} {query}"]
+
+    def stream_offset(self) -> int:
+        """Global offset of the next item published to the workflow stream."""
+        state = self.stream.get_state()
+        return state.base_offset + len(state.log)
+
+    def asks_pending(self) -> bool:
+        return any(task.ask_id is not None for task in self.prompt_queue)
+
+    def should_continue_as_new(self) -> bool:
+        info = workflow.info()
+        return (
+            info.is_continue_as_new_suggested()
+            or info.get_current_history_length() > MAX_HISTORY_EVENTS
+        )
 
     def add_message(self, actor: str, message: str) -> None:
         workflow.logger.debug(f"Adding {actor} message: {message[:100]}...")
@@ -123,20 +411,61 @@ class QnAWorkflow:
         self.conversation_history.append(
             {"actor": actor, "content": message}
         )
+        self.state_version += 1
+        self.compact_history()
+
+    def compact_history(self) -> None:
+        """Folds the oldest messages into a bounded summary so state stays small."""
+        overflow = len(self.conversation_history) - MAX_HISTORY_MESSAGES
+        if overflow <= 0:
+            return
+
+        folded = self.conversation_history[:overflow]
+        del self.conversation_history[:overflow]
+        lines = [
+            f'{m["actor"]}: {m["content"][:SUMMARY_LINE_CHARS]}' for m in folded
+        ]
+        summary = "\n".join([self.summary, *lines]) if self.summary else "\n".join(lines)
+        self.summary = summary[-MAX_SUMMARY_CHARS:]
+
+    def build_agent_input(self, prompt: Optional[str] = None) -> list[dict]:
+        """Agent input: summary of older turns plus the most recent messages.
+
+        Args:
+            prompt: Replaces the latest (user) message, e.g. with the question
+                and its retrieved context
+        """
+        items = []
+        if self.summary:
+            items.append(
+                {
+                    "role": "system",
+                    "content": f"Summary of the earlier conversation:\n{self.summary}",
+                }
+            )
+        for m in self.conversation_history[-MAX_CONTEXT_MESSAGES:]:
+            role = "user" if m["actor"] == "user" else "assistant"
+            items.append({"role": role, "content": m["content"]})
+        if prompt is not None and items:
+            items[-1] = {"role": "user", "content": prompt}
+        return items
 
     def construct_prompt(self, documents: list[dict], user_prompt: str) -> str:
         """Constructs prompt with context from found documents.
         
         Args:
-            documents: List of relevant documents
+            documents: Relevant documents, already packed to the context token
+                budget by the search activity, best first
             user_prompt: Original user question
             
         Returns:
             Formatted prompt with context and instructions
         """
-        context_text = ""
-        for doc in documents:
-            context_text += f'[{doc["id"]}] - {doc["chunk"]}\n'
+        # Documents are cited by their number in the context ("ref" set by packing)
+        context_text = "".join(
+            f'[{doc.get("ref", n)}] ({doc["id"]}) - {doc["chunk"]}\n'
+            for n, doc in enumerate(documents, start=1)
+        )
 
         prompt = (
             f"User question: {user_prompt}\n\n"